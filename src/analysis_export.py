@@ -0,0 +1,183 @@
+"""
+Streaming analysis exports (JSON Lines, Parquet, Arrow IPC) for loading runs into analytics tools.
+
+One export writes separate typed tables next to each other: <base>.summary.<ext>, <base>.moments.<ext>,
+<base>.stages.<ext> and, when per-sample scores were recorded, <base>.scores.<ext>. Every row carries
+the run_id, so tables from many runs can be concatenated and joined. Rows come from generators and are
+written in batches of EXPORT_BATCH_ROWS, so large runs are never held as one list or table in memory.
+Parquet and Arrow need the optional pyarrow package; JSON Lines has no extra dependencies.
+"""
+import os
+import json
+import time
+import uuid
+from itertools import islice
+
+from config import EXPORT_BATCH_ROWS
+from run_metrics import RunMetrics
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Table schemas: (column, type). Types: "string", "int64", "float64"
+SUMMARY_SCHEMA = [
+    ("run_id", "string"), ("exported_at", "string"), ("audio_file", "string"),
+    ("bpm", "float64"), ("beat_duration_s", "float64"), ("audio_offset_s", "float64"), ("audio_duration_s", "float64"),
+    ("selected_style", "string"), ("audio_analysis_s", "float64"), ("video_analysis_s", "float64"),
+    ("total_processing_s", "float64"), ("total_clips_found", "int64"), ("simulated_total_clips_s", "float64"),
+    ("video_file_count", "int64"), ("video_error_count", "int64"), ("video_errors", "string"),
+    ("audio_preset", "string"), ("video_preset", "string"),
+]
+MOMENT_SCHEMA = [
+    ("run_id", "string"), ("source_file", "string"), ("label", "string"),
+    ("start_s", "float64"), ("end_s", "float64"), ("duration_s", "float64"),
+    ("quality", "float64"), ("sharpness", "float64"), ("motion", "float64"), ("brightness", "float64"),
+]
+STAGE_SCHEMA = [ # One row per file and stage; wall/media durations repeat per row for easy grouping
+    ("run_id", "string"), ("file", "string"), ("kind", "string"), ("stage", "string"), ("seconds", "float64"),
+    ("wall_time_s", "float64"), ("media_duration_s", "float64"),
+]
+SCORE_SCHEMA = [
+    ("run_id", "string"), ("source_file", "string"), ("time_s", "float64"), ("label", "string"), ("score", "float64"),
+]
+SHOT_SCHEMA = [
+    ("run_id", "string"), ("source_file", "string"), ("cut_s", "float64"),
+]
+
+def _coerce(value, column_type):
+    if value is None:
+        return None
+    if column_type == "float64":
+        return float(value)
+    if column_type == "int64":
+        return int(value)
+    return str(value)
+
+def _typed_rows(schema, rows):
+    types = [t for _, t in schema]
+    for row in rows:
+        yield tuple(_coerce(v, t) for v, t in zip(row, types))
+
+def _batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def write_jsonl_table(file_path, schema, rows):
+    """Writes rows (tuples in schema order) as JSON Lines. Returns the number of rows."""
+    names = [name for name, _ in schema]
+    count = 0
+    with open(file_path, "w", encoding="utf-8") as f:
+        for batch in _batches(_typed_rows(schema, rows), EXPORT_BATCH_ROWS):
+            f.write("".join(json.dumps(dict(zip(names, row))) + "\n" for row in batch))
+            count += len(batch)
+    return count
+
+def _arrow_schema(schema):
+    types = {"string": pa.string(), "int64": pa.int64(), "float64": pa.float64()}
+    return pa.schema([(name, types[t]) for name, t in schema])
+
+def write_arrow_table(file_path, schema, rows, file_format="parquet"):
+    """Writes rows (tuples in schema order) as Parquet or Arrow IPC, one record batch at a time. Returns the number of rows."""
+    if pa is None:
+        raise RuntimeError("Parquet/Arrow export needs the 'pyarrow' package (pip install pyarrow).")
+    arrow_schema = _arrow_schema(schema)
+    if file_format == "parquet":
+        writer = pq.ParquetWriter(file_path, arrow_schema)
+        write = lambda batch: writer.write_table(pa.Table.from_batches([batch], schema=arrow_schema))
+    else:
+        writer = pa.ipc.new_file(file_path, arrow_schema)
+        write = writer.write_batch
+    count = 0
+    try:
+        for batch in _batches(_typed_rows(schema, rows), EXPORT_BATCH_ROWS):
+            columns = zip(*batch)
+            write(pa.record_batch([pa.array(column, type=field.type) for column, field in zip(columns, arrow_schema)], schema=arrow_schema))
+            count += len(batch)
+    finally:
+        writer.close()
+    return count
+
+ANALYSIS_EXPORT_FORMATS = {
+    ".jsonl": "jsonl",
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+}
+
+def _write_table(file_path, schema, rows, file_format):
+    if file_format == "jsonl":
+        return write_jsonl_table(file_path, schema, rows)
+    return write_arrow_table(file_path, schema, rows, file_format)
+
+
+def _summary_row(run_id, summary):
+    row = dict(summary, run_id=run_id, exported_at=time.strftime("%Y-%m-%dT%H:%M:%S"))
+    return tuple(row.get(name) for name, _ in SUMMARY_SCHEMA)
+
+def _moment_rows(run_id, moments, moment_features):
+    for start, end, label, source_file in moments:
+        features = moment_features.get((source_file, start, end)) or {}
+        yield (run_id, source_file, label, start, end, end - start, features.get("quality"),
+               features.get("sharpness"), features.get("motion"), features.get("brightness"))
+
+def _stage_rows(run_id, metrics_list):
+    for metrics in metrics_list:
+        m = metrics.to_dict() if isinstance(metrics, RunMetrics) else metrics
+        for stage, seconds in m.get("stages_s", {}).items():
+            yield (run_id, m.get("name"), m.get("kind"), stage, seconds, m.get("wall_time_s"), m.get("media_duration_s"))
+
+def _score_rows(run_id, sample_scores):
+    for source_file, time_s, label, score in sample_scores:
+        yield (run_id, source_file, time_s, label, score)
+
+def _shot_rows(run_id, shot_boundaries):
+    for source_file, cuts in shot_boundaries.items():
+        for cut_s in cuts:
+            yield (run_id, source_file, cut_s)
+
+def export_analysis(file_path, summary, moments, metrics_list, sample_scores=None, shot_boundaries=None, moment_features=None):
+    """
+    Writes the analysis tables next to file_path, the format is picked from its extension (see ANALYSIS_EXPORT_FORMATS).
+
+    Args:
+        summary (dict): Values for SUMMARY_SCHEMA columns (missing columns are null).
+        moments (iterable): (start_s, end_s, label, source_file) tuples, consumed once.
+        metrics_list (list): RunMetrics (or their dicts) of the audio and video files.
+        sample_scores (iterable, optional): (source_file, time_s, label, score) tuples; no scores table if None.
+        shot_boundaries (dict, optional): source_file -> camera cut times in seconds; no shots table if None.
+        moment_features (dict, optional): (source_file, start_s, end_s) -> visual features and quality of a moment
+            (see frame_features.py), filled into the moment rows (null if missing).
+
+    Returns:
+        dict: table name -> (file path, row count)
+    """
+    base, ext = os.path.splitext(file_path)
+    file_format = ANALYSIS_EXPORT_FORMATS.get(ext.lower())
+    if file_format is None:
+        raise ValueError(f"Unsupported analysis export format '{ext}'. Use one of: {', '.join(ANALYSIS_EXPORT_FORMATS)}")
+    if file_format != "jsonl" and pa is None:
+        raise RuntimeError("Parquet/Arrow export needs the 'pyarrow' package (pip install pyarrow).")
+    run_id = summary.get("run_id") or uuid.uuid4().hex
+    tables = [
+        ("summary", SUMMARY_SCHEMA, [_summary_row(run_id, summary)]),
+        ("moments", MOMENT_SCHEMA, _moment_rows(run_id, moments, moment_features or {})),
+        ("stages", STAGE_SCHEMA, _stage_rows(run_id, metrics_list)),
+    ]
+    if sample_scores is not None:
+        tables.append(("scores", SCORE_SCHEMA, _score_rows(run_id, sample_scores)))
+    if shot_boundaries is not None:
+        tables.append(("shots", SHOT_SCHEMA, _shot_rows(run_id, shot_boundaries)))
+    written = {}
+    for name, schema, rows in tables:
+        table_path = f"{base}.{name}{ext}"
+        written[name] = (table_path, _write_table(table_path, schema, rows, file_format))
+        print(f"Exported {written[name][1]} {name} row(s) to {table_path}")
+    return written
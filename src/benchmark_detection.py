@@ -0,0 +1,298 @@
+"""
+Accuracy-aware detection benchmark.
+
+Runs _detect_scenes_mediapipe / detect_video_moments over locally annotated videos under
+several configurations and reports wall time, decode/inference counters and segment
+IoU/recall against ground truth. Results are written as JSON so runs can be compared across commits.
+
+Each configuration decodes with --decoder (see config.DECODE_BACKENDS) unless it sets its own
+"decode_backend". The subprocess backends pipe frames at inference_width; presets without one
+(Standard, Precise) pipe full-resolution rawvideo, so their ffmpeg timings include that copy.
+
+Manifest format (JSON):
+    {
+        "beat_duration_sec": 0.5,                     # optional, used by the 'moments' stage filter
+        "videos": [
+            {"path": "clips/party.mp4",               # relative to the manifest file
+             "segments": [{"start": 1.0, "end": 4.5, "label": "People"}, ...]}
+        ]
+    }
+
+Usage:
+    python benchmark_detection.py manifest.json --configs Draft Standard --output results.json
+    python benchmark_detection.py manifest.json --config-file my_configs.json --stage moments
+    python benchmark_detection.py manifest.json --configs Draft --decoder ffmpeg
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from config import ANALYSIS_PRESETS, DECODE_BACKENDS, DEFAULT_DECODE_BACKEND
+from media_processing import _detect_scenes_mediapipe, detect_video_moments, get_analysis_preset
+from mediapipe_utils import load_object_detector
+from run_metrics import RunMetrics
+
+SEGMENT_MATCH_IOU = 0.5 # A ground-truth segment counts as found if a detection overlaps it with at least this IoU
+
+
+def normalize_label(label):
+    """Maps scene labels ('People Scene') and moment labels ('People') onto the same name."""
+    label = (label or "").strip()
+    if label.endswith(" Scene"):
+        label = label[:-len(" Scene")]
+    return label
+
+
+def _union_intervals(intervals):
+    """Merges overlapping (start, end) intervals. Returns a sorted list of disjoint intervals."""
+    merged = []
+    for start, end in sorted(intervals):
+        if end <= start: continue
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(i) for i in merged]
+
+
+def _total_length(intervals):
+    return sum(end - start for start, end in intervals)
+
+
+def _intersection_length(a, b):
+    """Total overlap between two sorted lists of disjoint intervals."""
+    total = 0.0
+    i = j = 0
+    while i < len(a) and j < len(b):
+        start = max(a[i][0], b[j][0])
+        end = min(a[i][1], b[j][1])
+        if end > start: total += end - start
+        if a[i][1] < b[j][1]: i += 1
+        else: j += 1
+    return total
+
+
+def _segment_iou(a, b):
+    overlap = max(0.0, min(a[1], b[1]) - max(a[0], b[0]))
+    union = (a[1] - a[0]) + (b[1] - b[0]) - overlap
+    return overlap / union if union > 0 else 0.0
+
+
+def score_segments(detected, ground_truth, match_iou=SEGMENT_MATCH_IOU):
+    """
+    Compares detected segments against ground truth, per label and overall.
+
+    Args:
+        detected: [(start, end, label, ...)] as returned by the detectors.
+        ground_truth: [{"start": float, "end": float, "label": str}]
+
+    Returns:
+        dict with time-based IoU/recall/precision and segment recall per label plus "_all".
+    """
+    det_by_label = defaultdict(list)
+    gt_by_label = defaultdict(list)
+    for seg in detected:
+        det_by_label[normalize_label(seg[2])].append((float(seg[0]), float(seg[1])))
+    for seg in ground_truth:
+        gt_by_label[normalize_label(seg["label"])].append((float(seg["start"]), float(seg["end"])))
+    det_by_label["_all"] = [s for label, segs in list(det_by_label.items()) for s in segs]
+    gt_by_label["_all"] = [s for label, segs in list(gt_by_label.items()) for s in segs]
+
+    scores = {}
+    for label in sorted(set(det_by_label) | set(gt_by_label)):
+        det_raw = det_by_label.get(label, [])
+        gt_raw = gt_by_label.get(label, [])
+        det = _union_intervals(det_raw)
+        gt = _union_intervals(gt_raw)
+        inter = _intersection_length(det, gt)
+        det_len = _total_length(det)
+        gt_len = _total_length(gt)
+        matched = sum(1 for g in gt_raw if any(_segment_iou(g, d) >= match_iou for d in det_raw))
+        scores[label] = _finalize_scores({
+            "overlap_s": inter, "detected_s": det_len, "gt_s": gt_len,
+            "matched_segments": matched, "gt_segments": len(gt_raw), "detected_segments": len(det_raw),
+        })
+    return scores
+
+
+def _finalize_scores(raw):
+    """Adds the derived ratios to a dict of raw overlap totals."""
+    union = raw["detected_s"] + raw["gt_s"] - raw["overlap_s"]
+    return dict(raw,
+        time_iou=raw["overlap_s"] / union if union > 0 else None,
+        time_recall=raw["overlap_s"] / raw["gt_s"] if raw["gt_s"] > 0 else None,
+        time_precision=raw["overlap_s"] / raw["detected_s"] if raw["detected_s"] > 0 else None,
+        segment_recall=raw["matched_segments"] / raw["gt_segments"] if raw["gt_segments"] else None,
+    )
+
+
+def load_manifest(manifest_path):
+    """Loads the annotation manifest and resolves video paths relative to it."""
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    for video in manifest.get("videos", []):
+        if not os.path.isabs(video["path"]):
+            video["path"] = os.path.join(base_dir, video["path"])
+    return manifest
+
+
+def load_configs(preset_names=None, config_file=None):
+    """
+    Builds the list of configurations to benchmark.
+    A config file holds a JSON list of {"name": ..., "base": <preset name>, <preset keys to override>,
+    "decode_backend": <optional, overrides --decoder>}.
+    Raises ValueError for an entry that is not an object, has no name or names an unknown decode backend.
+    """
+    configs = []
+    for name in preset_names or []:
+        configs.append({"name": name, **get_analysis_preset(name)})
+    if config_file:
+        with open(config_file, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        if not isinstance(entries, list):
+            raise ValueError(f"{config_file}: expected a JSON list of configurations")
+        for i, entry in enumerate(entries):
+            if not isinstance(entry, dict):
+                raise ValueError(f"{config_file}: configuration #{i} is not an object: {entry!r}")
+            if not isinstance(entry.get("name"), str) or not entry["name"].strip():
+                raise ValueError(f"{config_file}: configuration #{i} needs a non-empty \"name\": {json.dumps(entry)}")
+            if entry.get("decode_backend", DEFAULT_DECODE_BACKEND) not in DECODE_BACKENDS:
+                raise ValueError(f"{config_file}: configuration #{i} has an unknown \"decode_backend\" "
+                                 f"{entry['decode_backend']!r} (use one of: {', '.join(DECODE_BACKENDS)})")
+            entry = dict(entry)
+            base = get_analysis_preset(entry.pop("base", None))
+            configs.append({**base, **entry})
+    if not configs:
+        configs = [{"name": name, **preset} for name, preset in ANALYSIS_PRESETS.items()]
+    return configs
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except Exception:
+        return None
+
+
+def run_config(config, manifest, stage="scenes", decode_backend=DEFAULT_DECODE_BACKEND):
+    """Runs one configuration over every manifest video (config "decode_backend" overrides decode_backend). Returns a result dict."""
+    decode_backend = config.get("decode_backend", decode_backend)
+    preset = {k: v for k, v in config.items() if k != "decode_backend"} # 'name' labels the run in the log
+    if decode_backend != "opencv" and not preset["inference_width"]:
+        print(f"  Note: '{config['name']}' has no inference_width, {decode_backend} pipes full-resolution frames")
+    beat_duration_sec = manifest.get("beat_duration_sec", 0.5)
+    detector = load_object_detector(model_filename=preset["model_filename"])
+    if detector is None:
+        raise RuntimeError(f"Could not load detector '{preset['model_filename']}' for config '{config['name']}'.")
+
+    videos = []
+    totals = {"wall_time_s": 0.0, "frames_decoded": 0, "inference_calls": 0}
+    for video in manifest.get("videos", []):
+        path = video["path"]
+        metrics = RunMetrics(os.path.basename(path))
+        start_time = time.perf_counter()
+        if stage == "moments":
+            people, other = detect_video_moments(path, beat_duration_sec, preset=preset, metrics=metrics,
+                                                 decode_backend=decode_backend)
+            detected = people + other
+        else:
+            detected = _detect_scenes_mediapipe(
+                path, detector,
+                frame_check_interval_sec=preset["frame_check_interval_sec"],
+                inference_width=preset["inference_width"],
+                metrics=metrics,
+                decode_backend=decode_backend
+            )
+        wall_time_s = time.perf_counter() - start_time
+        metrics.finish()
+        frames_decoded = metrics.counters["frames_decoded"]
+        inference_calls = metrics.counters["frames_classified"]
+        gt = video.get("segments", [])
+        videos.append({
+            "path": path,
+            "wall_time_s": wall_time_s,
+            "frames_decoded": frames_decoded,
+            "inference_calls": inference_calls,
+            "stages_s": dict(metrics.stages),
+            "detected_segments": [list(s[:3]) for s in detected],
+            "scores": score_segments(detected, gt),
+        })
+        totals["wall_time_s"] += wall_time_s
+        totals["frames_decoded"] += frames_decoded
+        totals["inference_calls"] += inference_calls
+        print(f"  {config['name']}: {os.path.basename(path)} in {wall_time_s:.2f}s "
+              f"({frames_decoded} decoded, {inference_calls} inferences)")
+
+    # Aggregate scores: files are scored separately, then raw totals are pooled
+    raw_keys = ("overlap_s", "detected_s", "gt_s", "matched_segments", "gt_segments", "detected_segments")
+    pooled = defaultdict(lambda: dict.fromkeys(raw_keys, 0))
+    for video in videos:
+        for label, sc in video["scores"].items():
+            for key in raw_keys:
+                pooled[label][key] += sc[key]
+    overall = {label: _finalize_scores(raw) for label, raw in pooled.items()}
+
+    return {"config": config, "stage": stage, "decode_backend": decode_backend, "totals": totals, "scores": overall, "videos": videos}
+
+
+def _run_benchmark(args):
+    """Runs every configuration and prints the summary table. Returns the results dict."""
+    manifest = load_manifest(args.manifest)
+    configs = load_configs(args.configs, args.config_file)
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_revision": _git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "manifest": os.path.abspath(args.manifest),
+        "runs": [],
+    }
+    for config in configs:
+        print(f"Benchmarking config '{config['name']}' ({args.stage}, {config.get('decode_backend', args.decoder)} decoder)...")
+        results["runs"].append(run_config(config, manifest, stage=args.stage, decode_backend=args.decoder))
+
+    for run in results["runs"]:
+        all_scores = run["scores"].get("_all", {})
+        iou = all_scores.get("time_iou")
+        recall = all_scores.get("segment_recall")
+        print(f"{run['config']['name']:>12}: {run['totals']['wall_time_s']:.2f}s, "
+              f"{run['totals']['inference_calls']} inferences, "
+              f"IoU {iou if iou is None else round(iou, 3)}, segment recall {recall if recall is None else round(recall, 3)}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark detection speed against annotated ground truth.")
+    parser.add_argument("manifest", help="Annotation manifest JSON")
+    parser.add_argument("--configs", nargs="*", choices=list(ANALYSIS_PRESETS), help="Presets to benchmark (default: all)")
+    parser.add_argument("--config-file", help="JSON list of custom configurations")
+    parser.add_argument("--stage", choices=["scenes", "moments"], default="scenes",
+                        help="'scenes' runs _detect_scenes_mediapipe, 'moments' runs detect_video_moments")
+    parser.add_argument("--decoder", choices=DECODE_BACKENDS, default=DEFAULT_DECODE_BACKEND,
+                        help="Video decode backend for configs without their own \"decode_backend\"")
+    parser.add_argument("--output", help="Write JSON results to this path (default: stdout, progress then goes to stderr)")
+    args = parser.parse_args(argv)
+    # Keep stdout clean for the JSON when it is the output (also catches the analysis' own progress prints)
+    progress_output = contextlib.redirect_stdout(sys.stderr) if not args.output else contextlib.nullcontext()
+    with progress_output:
+        results = _run_benchmark(args)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"Results written to {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
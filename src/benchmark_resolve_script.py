@@ -0,0 +1,118 @@
+"""
+Offline benchmark / regression harness for generated Resolve scripts.
+
+Plans clips from synthetic moments, writes the script + edit decision list with
+resolve_script_generator.write_script_files, then executes the script against the
+mock Resolve API (mock_resolve.py) and reports wall time and API call counts.
+It also checks that the timeline the script built matches the planned clip list.
+
+Usage:
+    python benchmark_resolve_script.py --clips 100 1000 --pool-items 0 5000 --latency-ms 1
+    python benchmark_resolve_script.py --preexisting --output resolve_bench.json
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from benchmark_throughput import synthetic_moments, machine_info
+from clip_planning import plan_clips, order_clips_by_source
+from mock_resolve import build_mock_app, run_generated_script
+from resolve_script_generator import write_script_files
+
+
+def check_timeline(project, planned_clips):
+    """Compares the mock timeline against the planned clips. Returns a dict of problems (empty if it matches)."""
+    timeline = project.current_timeline
+    if timeline is None:
+        return {"timeline": "not created"}
+    problems = {}
+    video = timeline.tracks["video"][0] if timeline.tracks.get("video") else []
+    if len(video) != len(planned_clips):
+        problems["video_clip_count"] = {"expected": len(planned_clips), "actual": len(video)}
+    expected_frames = sum(c["duration_frames"] for c in planned_clips)
+    actual_frames = sum(item.end - item.start for item in video)
+    if actual_frames != expected_frames:
+        problems["video_frames"] = {"expected": expected_frames, "actual": actual_frames}
+    if not any(timeline.tracks.get("audio", [])):
+        problems["audio"] = "no audio track"
+    return problems
+
+
+def run_case(work_dir, num_clips, pool_items, latency_s, preexisting, style="Standard", beat_duration_s=0.5, fps=24.0):
+    """Generates one script and runs it against a fresh mock session. Returns a result dict."""
+    moments = synthetic_moments(num_clips)
+    planned, total_s = plan_clips(moments, style, beat_duration_s, fps, seed=0)
+    ordered = order_clips_by_source(planned, random.Random(0))
+    video_files = sorted({f"/footage/{m[3]}" for m in moments})
+    audio_path = "/footage/song.wav"
+    script_path = os.path.join(work_dir, f"resolve_script_{num_clips}_{pool_items}.py")
+
+    start = time.perf_counter()
+    write_script_files(script_path, 120.0, beat_duration_s, ordered, video_files, audio_path, 1.5, None, style, fps)
+    generate_s = time.perf_counter() - start
+
+    app, api, project = build_mock_app(
+        latency_s=latency_s, fps=fps, pool_items=pool_items,
+        preexisting_paths=video_files + [audio_path] if preexisting else None,
+    )
+    result = run_generated_script(script_path, app, api)
+    problems = check_timeline(project, ordered)
+    if result["error"]:
+        problems["error"] = result["error"]
+    return {
+        "clips": len(ordered),
+        "planned_duration_s": total_s,
+        "pool_items": pool_items,
+        "preexisting_media": preexisting,
+        "latency_ms": latency_s * 1000.0,
+        "generate_s": generate_s,
+        "script_wall_time_s": result["wall_time_s"],
+        "total_api_calls": result["total_api_calls"],
+        "api_calls": result["api_calls"],
+        "problems": problems,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run generated Resolve scripts against a mock Resolve API.")
+    parser.add_argument("--clips", type=int, nargs="+", default=[100, 1000], help="Number of synthetic moments")
+    parser.add_argument("--pool-items", type=int, nargs="+", default=[0, 2000], help="Unrelated items already in the media pool")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated latency per API call")
+    parser.add_argument("--preexisting", action="store_true", help="Put the footage in the pool beforehand (ImportMedia returns nothing)")
+    parser.add_argument("--output", help="Write JSON results to this path (default: stdout)")
+    parser.add_argument("--keep-scripts", action="store_true", help="Keep the generated scripts")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="recap_resolve_bench_")
+    results = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "machine": machine_info(), "cases": []}
+    failed = False
+    try:
+        for num_clips in args.clips:
+            for pool_items in args.pool_items:
+                case = run_case(work_dir, num_clips, pool_items, args.latency_ms / 1000.0, args.preexisting)
+                results["cases"].append(case)
+                failed = failed or bool(case["problems"])
+                print(f"  {num_clips} moments, pool {pool_items}: {case['script_wall_time_s'] * 1000:.1f} ms, "
+                      f"{case['total_api_calls']} API calls{' - PROBLEMS: ' + json.dumps(case['problems']) if case['problems'] else ''}")
+    finally:
+        if args.keep_scripts:
+            print(f"Generated scripts kept in {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"Results written to {args.output}")
+    else:
+        print(output)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
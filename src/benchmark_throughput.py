@@ -0,0 +1,382 @@
+"""
+Throughput benchmark suite with synthetic media.
+
+Generates synthetic videos (cv2.VideoWriter, varying resolution/fps/length) and a synthetic
+click-track with known BPM and leading silence, then times each pipeline stage:
+audio analysis, decode, frame classification, segment merging, clip planning,
+target-duration fitting and Resolve script (+ edit decision list sidecar) writing. No real footage or network access is needed
+(the classification stage is skipped if the MediaPipe model file is not already present).
+
+Usage:
+    python benchmark_throughput.py --output bench.json
+    python benchmark_throughput.py --quick
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import wave
+
+import cv2
+import numpy as np
+
+from config import MODEL_FILENAME, MEDIAPIPE_MERGE_THRESHOLD_FACTOR, MEDIAPIPE_FRAME_CHECK_INTERVAL_SEC, ANALYSIS_PRESETS, DEFAULT_ANALYSIS_PRESET
+from ffmpeg_decoder import FfmpegFrameReader, ffmpeg_available, output_size
+from thread_budget import split_thread_budget, apply_thread_budget, format_thread_budget, save_thread_split
+from profiling import profiled, profiling_enabled, set_profiling, profile_dir_for_report, profile_output_dir
+from media_processing import get_bpm_and_offset, _merge_segments
+from video_probe import sample_step_frames
+from clip_planning import plan_clips, order_clips_by_source, fit_clips_to_target
+from resolve_script_generator import write_script_files
+
+# (width, height, fps, seconds)
+VIDEO_CASES = [
+    (640, 360, 24.0, 20),
+    (1280, 720, 30.0, 20),
+    (1920, 1080, 30.0, 10),
+]
+QUICK_VIDEO_CASES = [(640, 360, 24.0, 5)]
+THREAD_SWEEP_CASE = (1280, 720, 30.0, 10) # Video per file in the thread budget sweep
+THREAD_SWEEP_FILES = 8
+CLICK_TRACK_BPM = 120.0
+CLICK_TRACK_SILENCE_SEC = 1.5
+CLICK_TRACK_SECONDS = 30.0
+MOMENT_COUNTS = [100, 1000, 10000]
+QUICK_MOMENT_COUNTS = [100, 1000]
+
+
+def machine_info():
+    """Collects machine/library info so numbers from different boxes can be told apart."""
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "opencv_threads": cv2.getNumThreads(),
+    }
+
+
+def generate_synthetic_video(path, width, height, fps, seconds, seed=0):
+    """Writes a video with a moving rectangle over noise. Returns the number of frames written."""
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise IOError(f"Could not open VideoWriter for {path}")
+    num_frames = int(round(fps * seconds))
+    background = rng.integers(0, 64, size=(height, width, 3), dtype=np.uint8)
+    box_w, box_h = max(8, width // 6), max(8, height // 4)
+    try:
+        for i in range(num_frames):
+            frame = background.copy()
+            x = int((width - box_w) * (0.5 + 0.5 * np.sin(i / fps)))
+            y = int((height - box_h) * (0.5 + 0.5 * np.cos(i / (2 * fps))))
+            cv2.rectangle(frame, (x, y), (x + box_w, y + box_h), (40, 160, 220), -1)
+            writer.write(frame)
+    finally:
+        writer.release()
+    return num_frames
+
+
+def generate_click_track(path, bpm=CLICK_TRACK_BPM, leading_silence_sec=CLICK_TRACK_SILENCE_SEC,
+                         seconds=CLICK_TRACK_SECONDS, sample_rate=22050):
+    """Writes a mono 16-bit WAV click-track with a known BPM and leading silence."""
+    total_samples = int(seconds * sample_rate)
+    audio = np.zeros(total_samples, dtype=np.float32)
+    click_len = int(0.02 * sample_rate)
+    t = np.arange(click_len) / sample_rate
+    click = (np.sin(2 * np.pi * 1000.0 * t) * np.exp(-t * 200.0)).astype(np.float32)
+    beat_interval = 60.0 / bpm
+    beat_time = leading_silence_sec
+    while beat_time < seconds:
+        start = int(beat_time * sample_rate)
+        end = min(total_samples, start + click_len)
+        audio[start:end] += click[:end - start]
+        beat_time += beat_interval
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+
+
+def synthetic_moments(count, num_files=5, seed=0):
+    """Builds moment tuples (start, end, label, fname) spread across a few fake files."""
+    rng = random.Random(seed)
+    labels = ["People", "Vehicle Scene", "Animal Scene", "Indoor Scene"]
+    moments = []
+    cursor = [0.0] * num_files
+    for i in range(count):
+        f = i % num_files
+        start = cursor[f] + rng.uniform(0.0, 2.0)
+        end = start + rng.uniform(1.0, 12.0)
+        cursor[f] = end
+        moments.append((start, end, rng.choice(labels), f"synthetic_{f}.mp4"))
+    return moments
+
+
+def time_stage(func, repeat=3):
+    """Runs func `repeat` times. Returns (timing dict, last result)."""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return {"best_s": min(timings), "median_s": statistics.median(timings), "runs": len(timings)}, result
+
+
+def bench_audio(work_dir, repeat):
+    path = os.path.join(work_dir, "click_track.wav")
+    generate_click_track(path)
+    timing, result = time_stage(lambda: get_bpm_and_offset(path), repeat)
+    tempo, beat_duration, offset, duration = result
+    timing.update({
+        "audio_seconds": duration,
+        "realtime_factor": duration / timing["best_s"] if timing["best_s"] > 0 else None,
+        "bpm_error": abs(tempo - CLICK_TRACK_BPM),
+        "offset_error_s": abs(offset - CLICK_TRACK_SILENCE_SEC),
+    })
+    return timing
+
+
+def _decode_all(path):
+    cap = cv2.VideoCapture(path)
+    frames = 0
+    try:
+        while True:
+            ret, _ = cap.read()
+            if not ret: break
+            frames += 1
+    finally:
+        cap.release()
+    return frames
+
+
+def _sampled_decode_opencv(path, interval_sec, inference_width, detector=None):
+    # What the OpenCV backend does: decode every frame, convert/downscale (and classify) only the sampled ones
+    cap = cv2.VideoCapture(path)
+    step = sample_step_frames(cap.get(cv2.CAP_PROP_FPS), interval_sec) # Same stepping as the app's scanners
+    frames = 0
+    sampled = 0
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret: break
+            if frames % step == 0:
+                height, width = frame.shape[:2]
+                size = output_size(width, height, inference_width)
+                if size != (width, height):
+                    frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                if detector is not None:
+                    from mediapipe_utils import classify_frame_mediapipe
+                    classify_frame_mediapipe(frame, detector, rgb=True)
+                sampled += 1
+            frames += 1
+    finally:
+        cap.release()
+    return sampled
+
+
+def _sampled_decode_ffmpeg(path, width, height, interval_sec, inference_width):
+    out_width, out_height = output_size(width, height, inference_width)
+    with FfmpegFrameReader(path, 1.0 / interval_sec, out_width, out_height) as reader:
+        return sum(1 for _ in reader)
+
+
+def _read_frames(path, limit):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    try:
+        while len(frames) < limit:
+            ret, frame = cap.read()
+            if not ret: break
+            frames.append(frame)
+    finally:
+        cap.release()
+    return frames
+
+
+def bench_video(work_dir, cases, repeat, classify_frames=20):
+    results = []
+    detector = None
+    if os.path.exists(MODEL_FILENAME):
+        from mediapipe_utils import load_object_detector
+        detector = load_object_detector()
+    for width, height, fps, seconds in cases:
+        path = os.path.join(work_dir, f"synthetic_{width}x{height}_{int(fps)}fps_{seconds}s.mp4")
+        num_frames = generate_synthetic_video(path, width, height, fps, seconds)
+        case = {"width": width, "height": height, "fps": fps, "seconds": seconds, "frames": num_frames}
+
+        timing, decoded = time_stage(lambda: _decode_all(path), repeat)
+        timing["frames_per_s"] = decoded / timing["best_s"] if timing["best_s"] > 0 else None
+        timing["realtime_factor"] = seconds / timing["best_s"] if timing["best_s"] > 0 else None
+        case["decode"] = timing
+
+        # Sampled decode as used by the analysis (default preset), per decode backend
+        interval_sec = ANALYSIS_PRESETS[DEFAULT_ANALYSIS_PRESET]["frame_check_interval_sec"]
+        inference_width = ANALYSIS_PRESETS[DEFAULT_ANALYSIS_PRESET]["inference_width"]
+        timing, sampled = time_stage(lambda: _sampled_decode_opencv(path, interval_sec, inference_width), repeat)
+        timing["sampled_frames"] = sampled
+        timing["realtime_factor"] = seconds / timing["best_s"] if timing["best_s"] > 0 else None
+        case["sampled_decode_opencv"] = timing
+        if ffmpeg_available():
+            timing, sampled = time_stage(lambda: _sampled_decode_ffmpeg(path, width, height, interval_sec, inference_width), repeat)
+            timing["sampled_frames"] = sampled
+            timing["realtime_factor"] = seconds / timing["best_s"] if timing["best_s"] > 0 else None
+            case["sampled_decode_ffmpeg"] = timing
+        else:
+            case["sampled_decode_ffmpeg"] = {"skipped": "ffmpeg not found"}
+
+        if detector is not None:
+            from mediapipe_utils import classify_frame_mediapipe
+            frames = _read_frames(path, classify_frames)
+            timing, _ = time_stage(lambda: [classify_frame_mediapipe(f, detector) for f in frames], repeat)
+            timing["frames_per_s"] = len(frames) / timing["best_s"] if timing["best_s"] > 0 else None
+            case["classify"] = timing
+        else:
+            case["classify"] = {"skipped": f"model file '{MODEL_FILENAME}' not present (no network access in benchmarks)"}
+        results.append(case)
+        print(f"  video {width}x{height}@{fps:g} {seconds}s: decode {case['decode']['frames_per_s'] or 0:.0f} fps")
+    return results
+
+
+_SWEEP_DETECTOR = None # Per pool process
+
+
+@profiled("sweep_analyze")
+def _sweep_analyze(path):
+    """One file as an analysis worker sees it: sampled decode, plus classification if the model file is present."""
+    global _SWEEP_DETECTOR
+    if _SWEEP_DETECTOR is None and os.path.exists(MODEL_FILENAME):
+        from mediapipe_utils import load_object_detector
+        _SWEEP_DETECTOR = load_object_detector()
+    preset = ANALYSIS_PRESETS[DEFAULT_ANALYSIS_PRESET]
+    return _sampled_decode_opencv(path, preset["frame_check_interval_sec"], preset["inference_width"], _SWEEP_DETECTOR)
+
+
+def bench_thread_splits(work_dir, repeat, total_cores=None, split_path=None):
+    """
+    Runs the same files with every worker count (powers of two) under split_thread_budget, and a single worker
+    with fewer threads, then reports the fastest split and saves the fastest one per worker count
+    (thread_budget.save_thread_split; the app loads the single-worker split at startup).
+    """
+    width, height, fps, seconds = THREAD_SWEEP_CASE
+    paths = []
+    for i in range(THREAD_SWEEP_FILES):
+        path = os.path.join(work_dir, f"sweep_{i}.mp4")
+        generate_synthetic_video(path, width, height, fps, seconds, seed=i)
+        paths.append(path)
+    total = split_thread_budget(total_cores)["total"]
+    worker_counts = [w for w in (1, 2, 4, 8, 16, 32, 64) if w <= min(total, len(paths))]
+    # The app analyzes one file at a time, so a single worker is also measured with fewer threads
+    # (inference runtimes often stop scaling before all cores are used)
+    splits = [split_thread_budget(total, workers) for workers in worker_counts]
+    splits += [split_thread_budget(threads, 1) for threads in (1, 2, 4, 8, 16, 32) if threads < total]
+    cases = []
+    for budget in splits:
+        workers = budget["workers"]
+
+        def run():
+            # Pool processes start like analysis workers: the split is applied first
+            with multiprocessing.Pool(workers, initializer=apply_thread_budget, initargs=(budget,)) as pool:
+                return sum(pool.map(_sweep_analyze, paths))
+        timing, sampled = time_stage(run, repeat)
+        timing["budget"] = budget
+        timing["classified"] = os.path.exists(MODEL_FILENAME)
+        timing["realtime_factor"] = len(paths) * seconds / timing["best_s"] if timing["best_s"] > 0 else None
+        cases.append(timing)
+        print(f"  {format_thread_budget(budget)}: {timing['best_s']:.2f}s ({timing['realtime_factor'] or 0:.1f}x realtime)")
+    best = min(cases, key=lambda c: c["best_s"])
+    print(f"  Best split: {format_thread_budget(best['budget'])}")
+    best_by_workers = {}
+    for case in sorted(cases, key=lambda c: c["best_s"], reverse=True):
+        best_by_workers[case["budget"]["workers"]] = case["budget"]
+    split_path = save_thread_split(best_by_workers, split_path)
+    print(f"  Splits saved to {split_path}")
+    return {"files": len(paths), "case": list(THREAD_SWEEP_CASE), "splits": cases, "best": best["budget"],
+            "best_by_workers": {str(w): b for w, b in best_by_workers.items()}, "saved_to": split_path}
+
+
+def bench_planning(work_dir, counts, repeat, beat_duration_s=0.5, style="Standard"):
+    results = []
+    merge_threshold = MEDIAPIPE_FRAME_CHECK_INTERVAL_SEC * MEDIAPIPE_MERGE_THRESHOLD_FACTOR
+    for count in counts:
+        moments = synthetic_moments(count)
+        case = {"moments": count}
+
+        case["merge_segments"], _ = time_stage(lambda: _merge_segments(moments, merge_threshold), repeat)
+        case["simulate"], (prepared, total) = time_stage(
+            lambda: plan_clips(moments, style, beat_duration_s, seed=0), repeat)
+        target = total * 0.5
+        case["fit_target"], _ = time_stage(lambda: fit_clips_to_target(prepared, target), repeat)
+
+        ordered = order_clips_by_source(prepared, random.Random(0))
+        video_files = sorted({f"/footage/{m[3]}" for m in moments})
+        script_path = os.path.join(work_dir, f"resolve_script_{count}.py")
+        case["render_script"], (script_path, sidecar_path) = time_stage(lambda: write_script_files(
+            script_path, 120.0, beat_duration_s, ordered, video_files, "/footage/song.wav", 1.5, None, style), repeat)
+        case["render_script"]["script_bytes"] = os.path.getsize(script_path)
+        case["render_script"]["sidecar_bytes"] = os.path.getsize(sidecar_path)
+        results.append(case)
+        print(f"  planning {count} moments: simulate {case['simulate']['best_s'] * 1000:.1f} ms, "
+              f"fit {case['fit_target']['best_s'] * 1000:.1f} ms, render {case['render_script']['best_s'] * 1000:.1f} ms")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synthetic throughput benchmark for every pipeline stage.")
+    parser.add_argument("--quick", action="store_true", help="Small cases only (smoke test)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage (best and median are reported)")
+    parser.add_argument("--output", help="Write JSON results to this path (default: stdout)")
+    parser.add_argument("--keep-media", action="store_true", help="Keep the generated media directory")
+    parser.add_argument("--thread-sweep", action="store_true",
+                        help="Also find the best split of the CPU thread budget between workers and per-library threads")
+    parser.add_argument("--cores", type=int, default=None, help="Core budget for --thread-sweep (default: all cores)")
+    parser.add_argument("--thread-split", default=None,
+                        help="Where --thread-sweep saves the fastest splits (default: the per-user file the app loads)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile the pool tasks and decoder processes (written to a profiles folder next to --output)")
+    args = parser.parse_args(argv)
+    set_profiling(args.profile or profiling_enabled(), output_dir=profile_dir_for_report(args.output) if args.output else None)
+
+    work_dir = tempfile.mkdtemp(prefix="recap_bench_")
+    results = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "machine": machine_info(),
+               "profile_dir": profile_output_dir() if profiling_enabled() else None}
+    try:
+        print("Benchmarking audio analysis...")
+        results["audio"] = bench_audio(work_dir, args.repeat)
+        print("Benchmarking video decode/classification...")
+        results["video"] = bench_video(work_dir, QUICK_VIDEO_CASES if args.quick else VIDEO_CASES, args.repeat)
+        print("Benchmarking clip planning and script rendering...")
+        results["planning"] = bench_planning(work_dir, QUICK_MOMENT_COUNTS if args.quick else MOMENT_COUNTS, args.repeat)
+        if args.thread_sweep:
+            print("Benchmarking CPU thread budget splits...")
+            results["thread_budget"] = bench_thread_splits(work_dir, args.repeat, args.cores, args.thread_split)
+    finally:
+        if args.keep_media:
+            print(f"Synthetic media kept in {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"Results written to {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
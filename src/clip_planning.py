@@ -0,0 +1,302 @@
+import os
+import random
+from collections import defaultdict
+
+import numpy as np
+
+from config import EDITING_STYLE_LOGIC, DEFAULT_FPS, MIN_CLIP_FRAMES, MOMENT_FEATURE_NAMES
+
+FIT_DP_MAX_BIT_OPS = 2_000_000_000 # Above (split items x capacity bits) the target fitting falls back to greedy
+
+def s2f(s, fps=DEFAULT_FPS):
+    """Converts seconds to frames."""
+    return int(round(s * fps))
+
+def f2s(f, fps=DEFAULT_FPS):
+    """Converts frames to seconds."""
+    return float(f) / fps if fps > 0 else 0.0
+
+def _style_table(style):
+    """Returns (sorted multipliers, their weights or None) for a style (falls back to _Default)."""
+    style_params = EDITING_STYLE_LOGIC.get(style, EDITING_STYLE_LOGIC.get("_Default"))
+    base_multipliers = sorted(style_params.get("base_multipliers", [1])) or [1] # Ensure sorted
+    base_weights = style_params.get("weights")
+    if not base_weights or len(base_weights) != len(base_multipliers) or sum(base_weights) <= 0:
+        base_weights = None # Uniform choice among the valid multipliers
+    return np.asarray(base_multipliers, dtype=np.int64), (np.asarray(base_weights, dtype=np.float64) if base_weights else None)
+
+class ClipPlanner:
+    """
+    Vectorized, seeded clip planning for one set of moments (one analysis run).
+
+    Moment times, source durations and the beat are converted to frame arrays once. For each style
+    plan() draws a style-weighted beat multiple per moment (constrained by its detected duration),
+    applies MIN_CLIP_FRAMES and clamps to the source duration. The draw uses a NumPy generator seeded
+    from (seed, style), so the same seed always gives the same plan - the UI estimate and the script
+    use the exact same clips. Results are cached per style.
+    moment_features maps (fname, start, end) to visual features (frame_features.py); their 'quality' and
+    'features' are copied into the planned clips, so fit_clips_to_target keeps the best ones and the edit
+    decision list records them.
+    """
+    def __init__(self, moments, beat_duration_s, fps=DEFAULT_FPS, source_durations_s=None, seed=0, moment_features=None):
+        self.fps = fps
+        self.seed = seed
+        self.beat_f = max(1, s2f(beat_duration_s, fps)) if beat_duration_s and beat_duration_s > 0 else 0
+        source_durations_s = source_durations_s or {}
+        self.moments = [m for m in moments if m[1] - m[0] > 0]
+        self.source_files = [os.path.basename(m[3]) for m in self.moments]
+        n = len(self.moments)
+        starts = np.fromiter((m[0] for m in self.moments), dtype=np.float64, count=n)
+        ends = np.fromiter((m[1] for m in self.moments), dtype=np.float64, count=n)
+        src = np.fromiter((source_durations_s.get(f) or 0.0 for f in self.source_files), dtype=np.float64, count=n)
+        self.start_f = np.rint(starts * fps).astype(np.int64) # Same rounding as s2f (half to even)
+        self.orig_dur_f = np.rint(ends * fps).astype(np.int64) - self.start_f
+        self.src_dur_f = np.rint(src * fps).astype(np.int64) # 0 = unknown
+        moment_features = moment_features or {}
+        found = [moment_features.get((m[3], m[0], m[1])) or {} for m in self.moments]
+        self.quality = [f.get("quality") for f in found] # None = unknown
+        self.features = [{name: f[name] for name in MOMENT_FEATURE_NAMES if name in f} or None for f in found]
+        self._cache = {}
+
+    def _probabilities(self, style):
+        """Returns (multipliers, n x k probability matrix, beat-length mask) for a style."""
+        multipliers, weights = _style_table(style)
+        max_m = self.orig_dur_f // self.beat_f if self.beat_f > 0 else np.zeros_like(self.orig_dur_f)
+        valid = multipliers[None, :] <= max_m[:, None]
+        valid[~valid.any(axis=1), 0] = True # Ensure at least one multiplier (the smallest)
+        probs = valid * (weights[None, :] if weights is not None else 1.0)
+        probs /= probs.sum(axis=1, keepdims=True)
+        beat_mask = (self.orig_dur_f >= self.beat_f) & (self.beat_f > 0) # Only clips >= one beat get a multiple
+        return multipliers, probs, beat_mask
+
+    def _finalize(self, dur_f):
+        """Applies the minimum length and source clamping to chosen durations. Returns end frames."""
+        dur_f = np.maximum(MIN_CLIP_FRAMES, dur_f)
+        end_f = self.start_f + dur_f
+        known = self.src_dur_f > 0
+        end_f = np.where(known, np.minimum(end_f, self.src_dur_f), end_f)
+        too_short = known & (end_f - self.start_f < MIN_CLIP_FRAMES) # Keep the minimum length where the source allows it
+        return np.where(too_short, np.minimum(self.start_f + MIN_CLIP_FRAMES, self.src_dur_f), end_f)
+
+    def _fallback_durations(self):
+        """Durations for clips shorter than one beat: their original duration (1 s if empty)."""
+        return np.where(self.orig_dur_f > 0, self.orig_dur_f, s2f(1.0, self.fps))
+
+    def _style_seed(self, style):
+        return [int(self.seed) & 0xFFFFFFFF, sum(ord(c) * 31 ** i for i, c in enumerate(style or "")) & 0xFFFFFFFF]
+
+    def plan(self, style):
+        """
+        Returns (planned_clips, total_duration_sec). Each clip is a dict:
+        {'moment', 'source_file', 'start_frame', 'end_frame', 'duration_frames', 'calculated_duration_sec', 'quality', 'features'}
+        """
+        if style in self._cache:
+            return self._cache[style]
+        if self.beat_f <= 0 or not self.moments:
+            return [], 0.0
+        multipliers, probs, beat_mask = self._probabilities(style)
+        rng = np.random.default_rng(self._style_seed(style))
+        u = rng.random(len(self.moments))
+        chosen = (probs.cumsum(axis=1) < u[:, None]).sum(axis=1) # Inverse CDF sampling per row
+        chosen = np.minimum(chosen, len(multipliers) - 1)
+        dur_f = np.where(beat_mask, multipliers[chosen] * self.beat_f, self._fallback_durations())
+        end_f = self._finalize(dur_f)
+
+        planned = []
+        fps = self.fps
+        for i in np.flatnonzero(end_f > self.start_f).tolist(): # Skip clips that end up empty after clamping
+            s_f = int(self.start_f[i]); e_f = int(end_f[i])
+            planned.append({
+                "moment": self.moments[i],
+                "source_file": self.source_files[i],
+                "start_frame": s_f,
+                "end_frame": e_f,
+                "duration_frames": e_f - s_f,
+                "calculated_duration_sec": f2s(e_f - s_f, fps),
+                "quality": self.quality[i],
+                "features": self.features[i],
+            })
+        total_frames = int(np.maximum(end_f - self.start_f, 0).sum())
+        result = (planned, f2s(total_frames, fps))
+        self._cache[style] = result
+        return result
+
+    def expected_total_s(self, style):
+        """Expected total duration over the random multiplier choice (exact, including clamping)."""
+        if self.beat_f <= 0 or not self.moments:
+            return 0.0
+        multipliers, probs, beat_mask = self._probabilities(style)
+        # Duration of every (moment, multiplier) option after clamping, weighted by its probability
+        option_frames = np.stack([np.maximum(self._finalize(np.full_like(self.start_f, m * self.beat_f)) - self.start_f, 0)
+                                  for m in multipliers.tolist()], axis=1)
+        expected_f = np.where(beat_mask, (probs * option_frames).sum(axis=1),
+                              np.maximum(self._finalize(self._fallback_durations()) - self.start_f, 0))
+        return f2s(float(expected_f.sum()), self.fps)
+
+def plan_clips(moments, style, beat_duration_s, fps=DEFAULT_FPS, source_durations_s=None, seed=0, moment_features=None):
+    """
+    Plans every moment for one style (see ClipPlanner). source_durations_s maps file basename -> duration in seconds.
+
+    Returns:
+        tuple: (planned_clips, total_duration_sec)
+    """
+    return ClipPlanner(moments, beat_duration_s, fps, source_durations_s, seed, moment_features).plan(style)
+
+def order_clips_by_source(planned_clips, rng=random):
+    """Groups clips by source file and shuffles the order of the groups (clips keep their order within a file)."""
+    grouped_clips = defaultdict(list)
+    for clip in planned_clips:
+        grouped_clips[clip["source_file"]].append(clip)
+    source_files_ordered = list(grouped_clips.keys())
+    rng.shuffle(source_files_ordered)
+    ordered = []
+    for source_file in source_files_ordered:
+        ordered.extend(grouped_clips[source_file])
+    return ordered
+
+def plan_audio_clip(audio_start_offset_s, video_duration_frames, fps=DEFAULT_FPS, audio_duration_s=None):
+    """Returns (start_frame, end_frame) of the music under the video track; end_frame is None if no video."""
+    aud_s_f = max(0, s2f(audio_start_offset_s or 0.0, fps))
+    if video_duration_frames <= 0:
+        return aud_s_f, None
+    aud_e_f = aud_s_f + video_duration_frames
+    if audio_duration_s:
+        aud_e_f = min(aud_e_f, s2f(audio_duration_s, fps)) # Clamp end to audio source duration
+    if aud_e_f <= aud_s_f: aud_e_f = aud_s_f + 1 # Ensure end > start
+    return aud_s_f, aud_e_f
+
+def _subset_sum_counts(weight_counts, capacity):
+    """
+    Bounded subset sum over clip durations (frames) with a Python int as bitset.
+    weight_counts: {weight: available count}. Items are binary-split (1, 2, 4, ... copies), so the
+    work is O(sum(log count) * capacity / 64) word operations.
+    Returns ({weight: count to take}, best_sum <= capacity).
+    """
+    mask = (1 << (capacity + 1)) - 1
+    items = [] # (weight, copies) after binary splitting
+    for weight, count in sorted(weight_counts.items()):
+        k = 1
+        while count > 0:
+            take = min(k, count)
+            items.append((weight, take))
+            count -= take
+            k *= 2
+    reach = 1 # Bit i set = sum i reachable
+    history = [reach]
+    for weight, copies in items:
+        reach = (reach | (reach << (weight * copies))) & mask
+        history.append(reach)
+    best = reach.bit_length() - 1 # Highest reachable sum <= capacity
+    counts = defaultdict(int)
+    remaining = best
+    for i in range(len(items) - 1, -1, -1): # Backtrack: take item i only if the sum is not reachable without it
+        if not (history[i] >> remaining) & 1:
+            weight, copies = items[i]
+            counts[weight] += copies
+            remaining -= weight * copies
+    return dict(counts), best
+
+def _fit_counts(weight_counts, capacity):
+    """
+    Returns ({weight: count to take}, total) fitting capacity: exact subset sum, or largest-first greedy when
+    the DP would be too large (FIT_DP_MAX_BIT_OPS).
+    """
+    split_items = sum(max(1, count.bit_length()) for count in weight_counts.values())
+    if split_items * (capacity + 1) <= FIT_DP_MAX_BIT_OPS:
+        return _subset_sum_counts(weight_counts, capacity)
+    counts = {}
+    total = 0
+    for weight in sorted(weight_counts, reverse=True):
+        take = min(weight_counts[weight], (capacity - total) // weight)
+        if take:
+            counts[weight] = take
+            total += take * weight
+    return counts, total
+
+def _weight_counts(clips):
+    counts = defaultdict(int)
+    for clip in clips:
+        counts[clip["duration_frames"]] += 1
+    return dict(counts)
+
+def _pick_fairly(clips_by_file, count, picked_per_file):
+    """Picks `count` clips spread across files, preferring files with the fewest clips picked so far."""
+    picked = []
+    while len(picked) < count:
+        available = [f for f, clips in clips_by_file.items() if clips]
+        if not available: break
+        source_file = min(available, key=lambda f: picked_per_file[f])
+        picked.append(clips_by_file[source_file].pop())
+        picked_per_file[source_file] += 1
+    return picked
+
+def fit_clips_to_target(planned_clips, target_duration_s, fps=DEFAULT_FPS, min_clips_per_file=1):
+    """
+    Selects planned clips whose durations sum as close as possible to (without exceeding) the target.
+    First reserves up to min_clips_per_file shortest clips per source file (if they fit), then solves a
+    bounded subset sum over the remaining clip durations in frames (durations are beat multiples, so there
+    are few distinct weights). Falls back to largest-first greedy fitting when the DP would be too large.
+    When clips have a 'quality' (unknown counts as 0), the lowest-quality clips are dropped first as long as
+    the remaining ones still reach the same total (found by bisection over the drop count, the reachable
+    totals only shrink as more clips are dropped). Within a duration, clips are taken round-robin across
+    source files, highest quality first (ties keep the original order); the reserved clips per file prefer
+    quality as well.
+
+    Returns:
+        tuple: (selected_clips in original order, num_removed, selected_duration_sec)
+    """
+    target_f = s2f(target_duration_s, fps)
+    clips = [c for c in planned_clips if c["duration_frames"] > 0]
+    total_f = sum(c["duration_frames"] for c in clips)
+    if total_f <= target_f:
+        return list(clips), len(planned_clips) - len(clips), f2s(total_f, fps)
+    if target_f <= 0 or not clips:
+        return [], len(planned_clips), 0.0
+
+    order = {id(c): i for i, c in enumerate(clips)}
+    picked_per_file = defaultdict(int)
+    selected = []
+
+    # Fairness: reserve the shortest clips of every file first (skipped if they alone exceed the target)
+    by_file = defaultdict(list)
+    for clip in clips:
+        by_file[clip["source_file"]].append(clip)
+    reserved = []
+    for source_file, file_clips in by_file.items():
+        file_clips.sort(key=lambda c: (c["duration_frames"], -(c.get("quality") or 0.0)))
+        reserved.extend(file_clips[:max(0, min_clips_per_file)])
+    reserved_f = sum(c["duration_frames"] for c in reserved)
+    if reserved and reserved_f <= target_f:
+        selected.extend(reserved)
+        for clip in reserved: picked_per_file[clip["source_file"]] += 1
+        reserved_ids = {id(c) for c in reserved}
+        rest = [c for c in clips if id(c) not in reserved_ids]
+        capacity = target_f - reserved_f
+    else:
+        rest = clips
+        capacity = target_f
+
+    rest = sorted(rest, key=lambda c: (c.get("quality") or 0.0, -order[id(c)])) # Worst quality (then latest) first
+    counts, best_f = _fit_counts(_weight_counts(rest), capacity)
+    if any(c.get("quality") is not None for c in rest):
+        kept_from, drop_max = 0, len(rest) # rest[kept_from:] still reaches best_f
+        while kept_from < drop_max:
+            mid = (kept_from + drop_max + 1) // 2
+            mid_counts, mid_f = _fit_counts(_weight_counts(rest[mid:]), capacity)
+            if mid_f == best_f:
+                kept_from, counts = mid, mid_counts
+            else:
+                drop_max = mid - 1
+        rest = rest[kept_from:]
+
+    # Group the remaining clips by duration, per file (best quality, then earliest, popped first)
+    by_weight = defaultdict(lambda: defaultdict(list))
+    for clip in rest:
+        by_weight[clip["duration_frames"]][clip["source_file"]].append(clip)
+
+    for weight in sorted(counts, reverse=True):
+        selected.extend(_pick_fairly(by_weight[weight], counts[weight], picked_per_file))
+
+    selected.sort(key=lambda c: order[id(c)])
+    selected_f = sum(c["duration_frames"] for c in selected)
+    return selected, len(planned_clips) - len(selected), f2s(selected_f, fps)
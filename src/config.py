@@ -7,6 +7,28 @@ MODEL_URL = f'https://storage.googleapis.com/mediapipe-models/object_detector/ef
 MEDIAPIPE_SCORE_THRESHOLD = 0.3
 MEDIAPIPE_MAX_RESULTS = 5
 
+# Scene taxonomy: category -> detector (COCO) labels. Compiled into a label-id lookup in mediapipe_utils;
+# each sample keeps max score and count per category, a frame's scene is the category with the best score.
+SCENE_TAXONOMY = {
+    "People Scene": ['person'],
+    "Vehicle Scene": ['car', 'truck', 'bus', 'motorcycle', 'bicycle', 'airplane', 'boat', 'train'],
+    "Animal Scene": ['cat', 'dog', 'bird', 'horse', 'sheep', 'cow', 'bear', 'zebra', 'giraffe', 'elephant'],
+    "Indoor Scene": ['chair', 'couch', 'potted plant', 'bed', 'dining table', 'toilet', 'tv', 'laptop',
+                     'mouse', 'remote', 'keyboard', 'cell phone', 'microwave', 'oven', 'toaster', 'sink',
+                     'refrigerator', 'book', 'clock', 'vase', 'scissors', 'teddy bear', 'hair drier',
+                     'toothbrush', 'cup', 'fork', 'knife', 'spoon', 'bowl'],
+    "Outdoor/Object Scene": ['bench', 'traffic light', 'fire hydrant', 'stop sign', 'parking meter', 'tree',
+                             'backpack', 'umbrella', 'handbag', 'tie', 'suitcase', 'frisbee', 'skis', 'snowboard',
+                             'sports ball', 'kite', 'baseball bat', 'baseball glove', 'skateboard', 'surfboard',
+                             'tennis racket', 'bottle', 'wine glass'],
+    "Food Scene": ['banana', 'apple', 'sandwich', 'orange', 'broccoli', 'carrot', 'hot dog', 'pizza', 'donut', 'cake'],
+}
+
+# Minimum max-score per category for it to label a frame (others use MEDIAPIPE_SCORE_THRESHOLD), e.g.
+# {"Indoor Scene": 0.6} so a stray cup does not turn a shot into an indoor scene
+SCENE_CATEGORY_MIN_SCORES = {}
+SCENE_KEEP_LABEL_WHILE_DETECTED = True # A segment keeps its label while its category is still detected (frames can match several)
+
 # Video Processing Config
 MEDIAPIPE_FRAME_CHECK_INTERVAL_SEC = 0.1 # How often to classify frames
 MEDIAPIPE_MERGE_THRESHOLD_FACTOR = 2.0 # Multiplier for interval to get merge gap
@@ -14,8 +36,56 @@ MEDIAPIPE_MERGE_THRESHOLD_FACTOR = 2.0 # Multiplier for interval to get merge ga
 # Audio Processing Config
 AUDIO_TRIM_TOP_DB = 60
 
+# Analysis Presets - bundle speed/quality settings so they don't need editing above
+# frame_check_interval_sec: how often to classify frames
+# inference_width: frames are downscaled to this width before detection (None = full resolution)
+# model_filename: EfficientDet variant (Lite0 is fastest, Lite2 most accurate)
+# audio_sample_rate: librosa load rate (None = native rate, lower is faster)
+MODEL_URL_TEMPLATE = 'https://storage.googleapis.com/mediapipe-models/object_detector/{variant}/int8/latest/{filename}'
+ANALYSIS_PRESETS = {
+    "Draft": {
+        "frame_check_interval_sec": 0.5,
+        "inference_width": 320,
+        "model_filename": 'efficientdet_lite0.tflite',
+        "audio_sample_rate": 11025,
+    },
+    "Standard": { # Same settings as before presets existed
+        "frame_check_interval_sec": MEDIAPIPE_FRAME_CHECK_INTERVAL_SEC,
+        "inference_width": None,
+        "model_filename": MODEL_FILENAME,
+        "audio_sample_rate": None,
+    },
+    "Precise": {
+        "frame_check_interval_sec": 0.05,
+        "inference_width": None,
+        "model_filename": 'efficientdet_lite2.tflite',
+        "audio_sample_rate": None,
+    },
+}
+DEFAULT_ANALYSIS_PRESET = "Standard"
+
+# Profiling (opt-in, see profiling.py)
+PROFILE_ENV_VAR = "RECAP_PROFILE" # Set to 1 to profile every analysis run
+PROFILE_DIR_ENV_VAR = "RECAP_PROFILE_DIR" # Where .prof/.collapsed files go
+PROFILE_DEFAULT_DIR = "profiles" # Subdirectory next to the run report (metrics export / benchmark output)
+PROFILE_SAMPLE_INTERVAL_SEC = 0.005 # Stack sampling interval for collapsed stacks
+
+# Analysis export (see analysis_export.py)
+EXPORT_BATCH_ROWS = 65536 # Rows per record batch / write call
+
 # Editing Styles
 EDITING_STYLES = ["Fast-paced", "Standard", "Relaxed"]
+EDITING_STYLE_LOGIC = { # Beat multipliers and their weights per style (used by clip_planning.ClipPlanner)
+     "Fast-paced": {"base_multipliers": [2, 4, 8],"weights": [0.2, 0.4, 0.4]},
+     "Standard": {"base_multipliers": [2, 4, 8, 16],"weights": [0.1, 0.4, 0.4, 0.1]},
+     "Relaxed": {"base_multipliers": [4, 8, 16],"weights": [0.2, 0.4, 0.4]},
+     "_Default": {"base_multipliers": [2, 4, 8, 16],"weights": [0.1, 0.3, 0.3, 0.3]}
+}
+
+# Clip Planning Config
+DEFAULT_FPS = 24.0
+MIN_CLIP_FRAMES = 12
+TIMELINE_FPS_OPTIONS = ["23.976", "24", "25", "29.97", "30", "50", "59.94", "60"] # Timeline frame rates clips can be planned at
 
 # Detection Methods 
 METHOD_MEDIAPIPE = "MediaPipe (Scenes & People)" # Currently unused, if more models are added in future then this config will be updated
@@ -24,3 +94,56 @@ METHOD_MEDIAPIPE = "MediaPipe (Scenes & People)" # Currently unused, if more mod
 WINDOW_TITLE = "Recap Assistant for DaVinci Resolve"
 WINDOW_GEOMETRY = "650x600"
 DEFAULT_THEME = "cosmo"
+PLAN_DEBOUNCE_MS = 150 # Style/FPS changes within this window are planned once (in the background)
+EVENT_POLL_INTERVAL_MS = 50 # Tk loop polls worker events at this rate (progress updates coalesce in between)
+EVENT_MAX_PER_POLL = 500 # Upper bound of events handled per poll, keeps the UI responsive under bursts
+MOMENT_TREE_PAGE_SIZE = 200 # Moment rows created per page when a file is opened in the Moments tab
+
+# Fill-budget mode (opt-in): stop video analysis once enough usable footage is found for the song
+FILL_BUDGET_MULTIPLE = 3.0 # Stop when the planned clips (expected total, selected style) reach this multiple of the song length
+FILL_BUDGET_SLICE_SEC = 30.0 # Video seconds analyzed per file per round-robin turn
+
+# Video scheduling (see video_probe.py)
+SCHEDULE_POLICIES = ["input", "shortest_first", "longest_first"] # By probed frame count; files are analyzed one at a time
+DEFAULT_SCHEDULE_POLICY = "shortest_first" # Most files finish early, long files don't hold back other results
+VIDEO_PROGRESS_INTERVAL_SEC = 10.0 # Video seconds between progress/ETA updates of a file
+
+# Video index / analysis cache (see video_index.py)
+VIDEO_INDEX_ENABLED = True # Use per-file keyframe/PTS indexes for frame timestamps and seeking
+CACHE_DIR_ENV_VAR = "RECAP_CACHE_DIR" # Where indexes are stored (overrides the per-user cache directory)
+CACHE_APP_NAME = "RecapAssistant" # Folder in the per-user cache directory (%LOCALAPPDATA%, ~/Library/Caches, $XDG_CACHE_HOME)
+SEEK_MIN_SKIP_FRAMES = 12 # Jump to a keyframe only if that skips at least this many frames (a seek restarts the decoder)
+FFPROBE_BINARY = "ffprobe" # Index builder (packet timestamps and key flags, no decoding); optional
+FFPROBE_TIMEOUT_SEC = 600
+
+# Video decode backend (see ffmpeg_decoder.py)
+DECODE_BACKENDS = ["opencv", "ffmpeg", "opencv_process"] # ffmpeg: sampled and downscaled inside a subprocess, falls back to OpenCV if missing
+                                                         # opencv_process: OpenCV decode in a separate process, frames via a shared-memory ring
+DEFAULT_DECODE_BACKEND = "opencv"
+FFMPEG_BINARY = "ffmpeg"
+FFMPEG_DECODE_THREADS = 0 # ffmpeg decoder threads, 0 = decoder share of the thread budget
+FRAME_RING_SLOTS = 8 # Model-input frames buffered between the decoder process and inference (see frame_ring.py)
+FRAME_RING_POLL_SEC = 0.5 # How often a waiting consumer checks that the decoder process is still alive
+FRAME_RING_STOP_TIMEOUT_SEC = 5.0 # Wait for a stopped decoder process to exit (and write its profile) before terminating it
+
+# CPU thread budget (see thread_budget.py)
+THREAD_BUDGET_CORES = None # Cores split between workers, decoding and inference; None = all (os.cpu_count())
+THREAD_SPLIT_FILENAME = "thread_split.json" # Splits measured by benchmark_throughput --thread-sweep (app cache dir), loaded at app start
+BLAS_THREAD_ENV_VARS = ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS"]
+
+# Visual quality features per sample (see frame_features.py), used to prefer the best clips when fitting the song length
+VISUAL_FEATURES_ENABLED = True
+FEATURE_MAX_WIDTH = 320 # Features are computed on at most this width (the model-input frame is reused)
+SHARPNESS_REFERENCE = 100.0 # Laplacian variance counted as fully sharp (common blur threshold)
+MOTION_REFERENCE = 0.1 # Mean absolute sample difference (0..1) counted as full motion
+QUALITY_WEIGHTS = {"sharpness": 0.5, "exposure": 0.3, "motion": 0.2}
+MOMENT_FEATURE_NAMES = ["sharpness", "motion", "brightness"] # Averaged per moment; carried into planned clips, the EDL sidecar and exports
+
+# Shot-boundary detection (see shot_detection.py): moment starts are snapped to camera cuts
+SHOT_DETECTION_ENABLED = True
+SHOT_SAMPLE_INTERVAL_SEC = 0.1 # OpenCV backend: frames checked for cuts (decoded anyway); ffmpeg backends check the classified samples
+SHOT_FRAME_WIDTH = 64 # Frames are shrunk to this width for the histogram
+SHOT_HIST_BINS = (16, 4, 4) # Hue, saturation, value bins
+SHOT_THRESHOLD = 0.4 # Histogram distance (0..1) of a cut
+SHOT_MIN_LENGTH_SEC = 0.5 # Cuts closer than this to the previous cut are ignored
+SHOT_SNAP_TOLERANCE_FACTOR = 1.5 # Snap window around a moment start, in classification intervals
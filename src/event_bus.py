@@ -0,0 +1,92 @@
+import queue
+import time
+
+from config import EVENT_POLL_INTERVAL_MS, EVENT_MAX_PER_POLL
+
+# Worker -> UI events. Workers only post (kind, run_id, payload) tuples; all state changes happen in
+# handlers on the Tk thread. The bus wraps any queue with put/get_nowait, so a multiprocessing.Queue
+# (or Manager().Queue()) works for process workers as long as payloads are picklable.
+
+PROGRESS = "progress" # Coalesced: only the newest progress event per (run_id, key) is delivered per poll
+
+class EventBus:
+    def __init__(self, event_queue=None):
+        self.queue = event_queue if event_queue is not None else queue.Queue()
+
+    def __getstate__(self):
+        return {"queue": self.queue} # Lets process workers receive the bus (needs a multiprocessing queue)
+
+    def __setstate__(self, state):
+        self.queue = state["queue"]
+
+    def post(self, kind, run_id, **payload):
+        """Posts an event from any thread or process."""
+        self.queue.put((kind, run_id, payload))
+
+    def progress(self, run_id, key, **payload):
+        """Posts a progress event. Rapid updates for the same key collapse into the newest one."""
+        payload["key"] = key
+        payload.setdefault("time", time.time())
+        self.queue.put((PROGRESS, run_id, payload))
+
+    def drain(self, max_events=EVENT_MAX_PER_POLL):
+        """
+        Takes up to max_events events off the queue without blocking, in posting order. A progress event
+        replaces an earlier one for the same run/key in the batch (keeping the newer position). Returns a list of events.
+        """
+        events = []
+        progress_slots = {} # (run_id, key) -> index in events
+        for _ in range(max_events):
+            try:
+                event = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            except (EOFError, OSError): # Process queue closed
+                break
+            kind, run_id, payload = event
+            if kind == PROGRESS:
+                slot = (run_id, payload.get("key"))
+                if slot in progress_slots:
+                    events[progress_slots[slot]] = None
+                progress_slots[slot] = len(events)
+            events.append(event)
+        return [e for e in events if e is not None]
+
+class TkEventPump:
+    """Polls an EventBus from the Tk loop at a fixed rate and dispatches events to handlers by kind."""
+    def __init__(self, root, bus, handlers, interval_ms=EVENT_POLL_INTERVAL_MS):
+        self.root = root
+        self.bus = bus
+        self.handlers = handlers # kind -> callable(run_id, **payload)
+        self.interval_ms = interval_ms
+        self._after_id = None
+
+    def start(self):
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval_ms, self._poll)
+        return self
+
+    def stop(self):
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def _poll(self):
+        self._after_id = None
+        for kind, run_id, payload in self.bus.drain():
+            handler = self.handlers.get(kind)
+            if handler is None:
+                print(f"Warning: No handler for event '{kind}'.")
+                continue
+            try:
+                handler(run_id, **payload)
+            except Exception as e:
+                print(f"Error handling event '{kind}': {e}")
+        try:
+            if self.root.winfo_exists():
+                self._after_id = self.root.after(self.interval_ms, self._poll)
+        except Exception:
+            pass # Root destroyed
@@ -0,0 +1,104 @@
+"""
+ffmpeg subprocess decode backend.
+
+A local ffmpeg process decodes with its own (multi-threaded) decoder, drops frames with the fps filter and
+downscales with the scale filter, then pipes raw RGB frames of the model input size. Python only ever sees
+the sampled, model-sized frames; each is read into one reusable NumPy buffer. Frame k of the output is at
+k / sample_fps seconds (the fps filter emits a constant rate, also for variable-frame-rate sources).
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+
+import numpy as np
+
+from config import FFMPEG_BINARY, FFMPEG_DECODE_THREADS
+from thread_budget import current_thread_budget
+
+STDERR_TAIL_BYTES = 4096 # Tail of ffmpeg's stderr kept for error messages
+
+def ffmpeg_available():
+    return shutil.which(FFMPEG_BINARY) is not None
+
+def output_size(width, height, inference_width=None):
+    """Size of the piped frames: downscaled to inference_width (keeping aspect ratio, even height), never upscaled."""
+    if not inference_width or width <= inference_width:
+        return width, height
+    return inference_width, max(2, int(round(height * inference_width / width / 2.0)) * 2)
+
+class FfmpegFrameReader:
+    """
+    Iterates (timestamp_sec, rgb_frame) of a video sampled at sample_fps and scaled to out_width x out_height.
+    The yielded frame is a view of one reusable buffer - it is overwritten by the next frame.
+    """
+    def __init__(self, video_path, sample_fps, out_width, out_height, threads=None):
+        if not ffmpeg_available():
+            raise RuntimeError(f"ffmpeg not found ('{FFMPEG_BINARY}'), use the OpenCV decode backend.")
+        self.video_path = video_path
+        self.sample_fps = sample_fps
+        self.width = out_width
+        self.height = out_height
+        self.frame_bytes = out_width * out_height * 3
+        self.buffer = np.empty((out_height, out_width, 3), dtype=np.uint8)
+        self._view = memoryview(self.buffer).cast("B")
+        self.frames_read = 0
+        if threads is None:
+            threads = FFMPEG_DECODE_THREADS or current_thread_budget()["decoder"]
+        cmd = [
+            FFMPEG_BINARY, "-v", "error", "-nostdin",
+            "-threads", str(threads), "-i", video_path,
+            "-map", "0:v:0", "-an", "-sn", "-dn",
+            "-vf", f"fps={sample_fps:.6f},scale={out_width}:{out_height}:flags=area",
+            "-pix_fmt", "rgb24", "-f", "rawvideo", "pipe:1",
+        ]
+        # stderr goes to a temp file: an undrained pipe would block ffmpeg once it fills up (e.g. repeated decode warnings)
+        self.stderr_file = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=self.stderr_file, bufsize=self.frame_bytes)
+
+    def read(self):
+        """Reads the next frame into the buffer. Returns (timestamp_sec, frame) or (None, None) at the end."""
+        view = self._view
+        filled = 0
+        stdout = self.process.stdout
+        while filled < self.frame_bytes:
+            n = stdout.readinto(view[filled:])
+            if not n:
+                self.process.wait() # Reap ffmpeg so close() can tell an error exit from an early stop
+                if filled:
+                    print(f"Warning: Truncated last frame from ffmpeg for {os.path.basename(self.video_path)}.")
+                return None, None
+            filled += n
+        timestamp = self.frames_read / self.sample_fps
+        self.frames_read += 1
+        return timestamp, self.buffer
+
+    def __iter__(self):
+        while True:
+            timestamp, frame = self.read()
+            if frame is None:
+                return
+            yield timestamp, frame
+
+    def close(self):
+        """Stops ffmpeg. Raises IOError if it failed before any frame was read."""
+        if self.process is None:
+            return
+        process, self.process = self.process, None
+        killed = process.poll() is None # Stopped early (budget, cancel, error) - not a decode failure
+        if killed:
+            process.kill()
+        process.communicate()
+        with self.stderr_file as stderr_file:
+            stderr_file.seek(max(0, stderr_file.seek(0, os.SEEK_END) - STDERR_TAIL_BYTES))
+            stderr = stderr_file.read()
+        if not killed and process.returncode != 0 and self.frames_read == 0:
+            message = stderr.decode("utf-8", "replace").strip().splitlines()
+            raise IOError(f"ffmpeg could not decode {os.path.basename(self.video_path)}: {message[-1] if message else process.returncode}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
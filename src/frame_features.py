@@ -0,0 +1,64 @@
+"""
+Cheap visual quality features per classified sample, computed on the model-input frame that was already
+decoded and downscaled for detection (no second decode pass):
+sharpness (variance of the Laplacian), motion (mean absolute difference to the previous sample) and
+brightness (mean luma). Samples are aggregated per moment into a quality score used by clip selection.
+"""
+import numpy as np
+import cv2
+
+from config import FEATURE_MAX_WIDTH, QUALITY_WEIGHTS, SHARPNESS_REFERENCE, MOTION_REFERENCE
+
+class FrameFeatures:
+    """Feature extractor for consecutive samples of one video (keeps the previous sample for motion)."""
+    def __init__(self):
+        self.prev_gray = None
+        self.last = None # (sharpness, motion, brightness) of the latest sample
+
+    def update(self, image_rgb):
+        """Computes the features of a sample. Returns (sharpness, motion, brightness), motion and brightness in 0..1."""
+        gray = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2GRAY)
+        height, width = gray.shape[:2]
+        if width > FEATURE_MAX_WIDTH: # Full-resolution presets: bound the cost
+            gray = cv2.resize(gray, (FEATURE_MAX_WIDTH, max(1, int(round(height * FEATURE_MAX_WIDTH / width)))), interpolation=cv2.INTER_AREA)
+        sharpness = float(cv2.Laplacian(gray, cv2.CV_32F).var())
+        brightness = float(gray.mean()) / 255.0
+        prev = self.prev_gray
+        motion = float(cv2.absdiff(gray, prev).mean()) / 255.0 if prev is not None and prev.shape == gray.shape else 0.0
+        self.prev_gray = gray
+        self.last = (sharpness, motion, brightness)
+        return self.last
+
+def quality_score(sharpness, motion, brightness):
+    """Combined 0..1 quality: sharp, well exposed (mid brightness) and moving footage scores high (QUALITY_WEIGHTS)."""
+    terms = {
+        "sharpness": min(1.0, sharpness / SHARPNESS_REFERENCE),
+        "exposure": max(0.0, 1.0 - 2.0 * abs(brightness - 0.5)),
+        "motion": min(1.0, motion / MOTION_REFERENCE),
+    }
+    total_weight = sum(QUALITY_WEIGHTS.values())
+    return sum(QUALITY_WEIGHTS[name] * value for name, value in terms.items()) / total_weight if total_weight > 0 else 0.0
+
+def aggregate_moment_features(moments, samples):
+    """
+    Averages (time_s, sharpness, motion, brightness) samples over each (start, end, label, fname) moment.
+    Moments without a sample inside use the last sample before their start.
+    Returns {(fname, start, end): {'sharpness', 'motion', 'brightness', 'quality', 'samples'}}.
+    """
+    if not samples or not moments:
+        return {}
+    data = np.asarray(samples, dtype=np.float64)
+    data = data[np.argsort(data[:, 0], kind="stable")]
+    times = data[:, 0]
+    features = {}
+    for start, end, _, fname in moments:
+        lo = int(np.searchsorted(times, start, side="left"))
+        hi = int(np.searchsorted(times, end, side="left"))
+        if hi <= lo:
+            lo, hi = max(0, lo - 1), max(1, lo)
+        sharpness, motion, brightness = data[lo:hi, 1:].mean(axis=0).tolist()
+        features[(fname, start, end)] = {
+            "sharpness": sharpness, "motion": motion, "brightness": brightness,
+            "quality": quality_score(sharpness, motion, brightness), "samples": hi - lo,
+        }
+    return features
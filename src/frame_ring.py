@@ -0,0 +1,243 @@
+"""
+Shared-memory frame ring between a decoder process and inference.
+
+FrameRing holds a fixed number of model-input sized frame slots in one multiprocessing.shared_memory block.
+The producer acquires a free slot (blocking while the ring is full), writes the frame into the slot's NumPy
+view and publishes (slot, timestamp, frame_number) over a small queue; consumers read the slot in place and
+release it. Only slot indices and timestamps are pickled, never frame data. A FrameRing passed to a
+multiprocessing.Process attaches to the same memory in the child; the creating process unlinks it on close().
+A consumer that stops early calls stop(): the producer sees it at its next acquire() and ends normally.
+"""
+import os
+import queue
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+import cv2
+
+from config import FRAME_RING_SLOTS, FRAME_RING_POLL_SEC, FRAME_RING_STOP_TIMEOUT_SEC, VIDEO_INDEX_ENABLED
+from thread_budget import apply_thread_budget, current_thread_budget
+from profiling import profiled
+from video_index import load_or_build_index
+from video_probe import sample_step_frames
+
+class FrameRing:
+    def __init__(self, slots, frame_shape, dtype=np.uint8, ctx=None):
+        ctx = ctx or multiprocessing.get_context()
+        self.slots = slots
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = np.dtype(dtype)
+        frame_bytes = int(np.prod(self.frame_shape)) * self.dtype.itemsize
+        self._shm = shared_memory.SharedMemory(create=True, size=max(1, slots * frame_bytes))
+        self._owner_pid = os.getpid() # Only the creating process unlinks (a forked child gets a copy of this object)
+        self.free_slots = ctx.Queue()
+        self.ready = ctx.Queue()
+        self.stop_event = ctx.Event()
+        for slot in range(slots):
+            self.free_slots.put(slot)
+        self._attach()
+
+    def _attach(self):
+        self.frames = np.ndarray((self.slots,) + self.frame_shape, dtype=self.dtype, buffer=self._shm.buf)
+
+    def __getstate__(self):
+        return {"name": self._shm.name, "slots": self.slots, "frame_shape": self.frame_shape, "dtype": self.dtype.str,
+                "free_slots": self.free_slots, "ready": self.ready, "stop_event": self.stop_event}
+
+    def __setstate__(self, state):
+        self.slots = state["slots"]
+        self.frame_shape = state["frame_shape"]
+        self.dtype = np.dtype(state["dtype"])
+        self.free_slots = state["free_slots"]
+        self.ready = state["ready"]
+        self.stop_event = state["stop_event"]
+        self._shm = shared_memory.SharedMemory(name=state["name"])
+        self._owner_pid = None
+        self._attach()
+
+    # Producer side
+    def acquire(self):
+        """Blocks until a slot is free. Returns (slot, writable frame view), or (None, None) once stop() was called."""
+        while not self.stop_event.is_set():
+            try:
+                slot = self.free_slots.get(timeout=FRAME_RING_POLL_SEC)
+            except queue.Empty:
+                continue # Ring full: check for stop again
+            if slot is None: # Wake-up from stop()
+                break
+            return slot, self.frames[slot]
+        return None, None
+
+    def publish(self, slot, timestamp, frame_number=None):
+        self.ready.put((slot, timestamp, frame_number))
+
+    def end(self, error=None, frame_number=None, consumers=1):
+        """Marks the end of the stream for each consumer; error (str) reports a failed decode."""
+        for _ in range(consumers):
+            self.ready.put((None, error, frame_number))
+
+    # Consumer side
+    def get(self, timeout=None):
+        """Next published (slot, timestamp, frame_number), or (None, error, frame_number) at the end. Read the frame as frames[slot]."""
+        return self.ready.get(timeout=timeout)
+
+    def release(self, slot):
+        self.free_slots.put(slot)
+
+    def stop(self):
+        """Asks the producer to end the stream early (seen at its next acquire)."""
+        self.stop_event.set()
+        self.free_slots.put(None) # Wakes a producer waiting for a slot
+
+    def close(self):
+        """Detaches from the shared memory (and frees it in the creating process). Frame views must not be used afterwards."""
+        if self._shm is None:
+            return
+        shm, self._shm = self._shm, None
+        self.frames = None
+        try:
+            shm.close()
+        except BufferError:
+            pass # A caller still holds a view, the mapping goes away with it
+        if self._owner_pid == os.getpid():
+            shm.unlink()
+
+@profiled("ring_decoder")
+def opencv_ring_producer(video_path, ring, sample_fps, budget=None, use_index=False):
+    """
+    Decoder process target: decodes a video with OpenCV, converts every sampled frame (about sample_fps per
+    second, same frame stepping as the in-process scanner) to RGB at the ring's frame size directly into a slot.
+    budget is the parent's thread split (thread_budget.py), applied with the decoder share. With use_index,
+    timestamps come from the file's PTS index and frames between samples are skipped with keyframe seeks.
+    """
+    if budget is not None:
+        apply_thread_budget(budget, role="decoder")
+    out_height, out_width = ring.frame_shape[:2]
+    index = load_or_build_index(video_path) if use_index else None
+    frame_times = index.pts if index is not None and len(index) else None
+    seek_index = index if frame_times is not None and len(index.keyframes) else None
+    cap = cv2.VideoCapture(video_path)
+    frame_count = 0
+    error = None
+    stopped = False
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        if not cap.isOpened() or fps <= 0:
+            raise IOError(f"Could not open video: {os.path.basename(video_path)}")
+        step = sample_step_frames(fps, 1.0 / sample_fps)
+        last_timestamp = 0.0
+        while True:
+            sampled = frame_count % step == 0
+            if not sampled and seek_index is not None:
+                position = seek_index.seek_forward(cap, frame_count, -(-frame_count // step) * step)
+                if position != frame_count:
+                    frame_count = position
+                    continue
+            if sampled:
+                ret, frame = cap.read()
+            else:
+                ret, frame = cap.grab(), None # Decode forward without converting the frame
+            if not ret:
+                break
+            if frame_times is not None and frame_count < len(frame_times):
+                last_timestamp = float(frame_times[frame_count]) # True presentation time of this frame
+            elif frame_count > 0:
+                # Ensure timestamp progresses even if MSEC doesn't update reliably
+                last_timestamp = max(last_timestamp + 1.0 / fps, cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0)
+            if sampled:
+                slot, view = ring.acquire() # Blocks while the ring is full
+                if slot is None:
+                    stopped = True # Consumer stopped early
+                    break
+                if frame.shape[1] != out_width or frame.shape[0] != out_height:
+                    frame = cv2.resize(frame, (out_width, out_height), interpolation=cv2.INTER_AREA)
+                cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=view)
+                ring.publish(slot, last_timestamp, frame_count)
+            frame_count += 1
+        if frame_count == 0 and not stopped:
+            error = f"Cannot read first frame of video: {os.path.basename(video_path)}"
+    except Exception as e:
+        error = str(e)
+    finally:
+        cap.release()
+        ring.end(error, frame_count)
+        ring.close()
+
+class RingFrameReader:
+    """
+    Same interface as ffmpeg_decoder.FfmpegFrameReader, with OpenCV decoding in a separate process that feeds a
+    FrameRing. read() returns a view of the frame's slot, which is released on the next read() or close().
+    """
+    def __init__(self, video_path, sample_fps, out_width, out_height, threads=None, slots=FRAME_RING_SLOTS, use_index=VIDEO_INDEX_ENABLED):
+        self.video_path = video_path
+        self.sample_fps = sample_fps
+        self.width = out_width
+        self.height = out_height
+        self.frames_read = 0
+        self.source_frames = 0 # Frames decoded by the producer (known at the end)
+        self.ring = FrameRing(slots, (out_height, out_width, 3))
+        self._slot = None
+        budget = current_thread_budget()
+        if threads:
+            budget = dict(budget, decoder=threads)
+        self.process = multiprocessing.Process(target=opencv_ring_producer, args=(video_path, self.ring, sample_fps, budget, use_index), daemon=True)
+        self.process.start()
+
+    def read(self):
+        """Returns (timestamp_sec, frame) or (None, None) at the end. Raises IOError if decoding failed."""
+        ring = self.ring
+        if self._slot is not None:
+            ring.release(self._slot)
+            self._slot = None
+        if self.process is None:
+            return None, None
+        while True:
+            try:
+                slot, timestamp, frame_number = ring.get(timeout=FRAME_RING_POLL_SEC)
+                break
+            except queue.Empty:
+                if not self.process.is_alive():
+                    raise IOError(f"Decoder process for {os.path.basename(self.video_path)} exited unexpectedly (code {self.process.exitcode})")
+        if slot is None:
+            self.source_frames = frame_number or 0
+            self.process.join()
+            self.process = None
+            if timestamp is not None:
+                raise IOError(timestamp)
+            return None, None
+        self._slot = slot
+        self.frames_read += 1
+        return timestamp, ring.frames[slot]
+
+    def __iter__(self):
+        while True:
+            timestamp, frame = self.read()
+            if frame is None:
+                return
+            yield timestamp, frame
+
+    def close(self):
+        """
+        Stops the decoder process (if still running) and frees the ring. The process is asked to stop and given
+        FRAME_RING_STOP_TIMEOUT_SEC to exit cleanly (so a profiled producer writes its profile), then terminated.
+        """
+        if self.ring is None:
+            return
+        if self.process is not None: # Stopped early (budget, cancel, error)
+            self.ring.stop()
+            self.process.join(FRAME_RING_STOP_TIMEOUT_SEC)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
+            self.process = None
+        self._slot = None
+        self.ring.close()
+        self.ring = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
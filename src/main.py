@@ -4,13 +4,16 @@ from tkinter import font as tkFont
 from threading import Thread
 import os
 import traceback
-from collections import Counter 
+from collections import Counter, defaultdict
 import time
 import csv
-import random
 import math
 import uuid
 import sys
+import argparse
+import multiprocessing
+import random
+from itertools import chain
 
 from ttkbootstrap import Style, utility
 utility.enable_high_dpi_awareness()
@@ -19,23 +22,25 @@ from ttkbootstrap.widgets import Progressbar
 # Import project modules
 from config import (
     WINDOW_TITLE, WINDOW_GEOMETRY, DEFAULT_THEME, EDITING_STYLES,
-    METHOD_MEDIAPIPE # Keep for info label, though not used directly in logic here
+    METHOD_MEDIAPIPE, # Keep for info label, though not used directly in logic here
+    ANALYSIS_PRESETS, DEFAULT_ANALYSIS_PRESET, DEFAULT_FPS, MIN_CLIP_FRAMES, TIMELINE_FPS_OPTIONS,
+    PLAN_DEBOUNCE_MS, MOMENT_TREE_PAGE_SIZE, FILL_BUDGET_MULTIPLE, SCHEDULE_POLICIES, DEFAULT_SCHEDULE_POLICY,
+    DECODE_BACKENDS, DEFAULT_DECODE_BACKEND
 )
 
-EDITING_STYLE_LOGIC = {
-     "Fast-paced": {"base_multipliers": [2, 4, 8],"weights": [0.2, 0.4, 0.4]},
-     "Standard": {"base_multipliers": [2, 4, 8, 16],"weights": [0.1, 0.4, 0.4, 0.1]},
-     "Relaxed": {"base_multipliers": [4, 8, 16],"weights": [0.2, 0.4, 0.4]},
-     "_Default": {"base_multipliers": [2, 4, 8, 16],"weights": [0.1, 0.3, 0.3, 0.3]}
-}
-
-DEFAULT_FPS = 24.0
-MIN_CLIP_FRAMES = 12
 MIN_SLIDER_S = max(1.0, MIN_CLIP_FRAMES / DEFAULT_FPS if DEFAULT_FPS > 0 else 1.0)
+SUMMARY_SECTIONS = ("status", "audio", "video", "files", "errors", "total") # Display order in result_display
 
-from mediapipe_utils import load_object_detector, release_detector
-from media_processing import get_bpm_and_offset, detect_video_moments
+from mediapipe_utils import load_object_detector, release_detector, iter_score_labels
+from media_processing import get_bpm_and_offset, detect_video_moments, detect_video_moments_fill_budget, get_analysis_preset
 from resolve_script_generator import create_script
+from clip_planning import ClipPlanner, order_clips_by_source, fit_clips_to_target
+from run_metrics import RunMetrics, export_metrics_json
+from profiling import run_profiled, profiling_enabled, set_profiling, profile_output_dir, staging_profile_dir, move_profiles_to_report
+from event_bus import EventBus, TkEventPump
+from analysis_export import export_analysis, ANALYSIS_EXPORT_FORMATS
+from video_probe import probe_videos, schedule_videos, FrameProgress
+from thread_budget import split_thread_budget, apply_thread_budget, format_thread_budget, load_thread_split
 
 def resource_path(relative_path):
     """ Get absolute path to resource, needed for PyInstaller (when creating .EXE)"""
@@ -46,8 +51,13 @@ def resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 class VideoAnalysisApp:
-    def __init__(self, root):
+    def __init__(self, root, analysis_preset=DEFAULT_ANALYSIS_PRESET, fill_budget=False, schedule_policy=DEFAULT_SCHEDULE_POLICY,
+                 decode_backend=DEFAULT_DECODE_BACKEND):
         self.root = root
+        self.initial_analysis_preset = analysis_preset if analysis_preset in ANALYSIS_PRESETS else DEFAULT_ANALYSIS_PRESET
+        self.initial_fill_budget = fill_budget
+        self.schedule_policy = schedule_policy if schedule_policy in SCHEDULE_POLICIES else DEFAULT_SCHEDULE_POLICY
+        self.decode_backend = decode_backend if decode_backend in DECODE_BACKENDS else DEFAULT_DECODE_BACKEND
         self.style = Style(theme=DEFAULT_THEME)
         self.root.title(WINDOW_TITLE)
         self.root.geometry(WINDOW_GEOMETRY)
@@ -61,10 +71,20 @@ class VideoAnalysisApp:
         except Exception as e:
             print(f"Warning: An unexpected error occurred setting the icon: {e}")
 
+        # Background clip planning (see _calculate_and_configure_slider)
+        self._plan_after_id = None # Pending debounced recalculation
+        self._plan_worker_busy = False # Only one planning worker runs at a time
+        self._plan_rerun_pending = False # Inputs changed while the worker was running
+        self._slider_refresh_pending = False
+        self.plan_generation = 0
+
+        # Workers never touch app state: they post events, applied on the Tk thread by the pump
+        self.event_bus = EventBus()
+
         self._initialize_state()
 
         print("Loading MediaPipe object detector...")
-        self.object_detector = load_object_detector()
+        self.object_detector = load_object_detector(model_filename=get_analysis_preset(self.initial_analysis_preset)["model_filename"])
         self.detector_loaded = self.object_detector is not None
         print(f"MediaPipe Detector Loaded: {self.detector_loaded}")
 
@@ -77,6 +97,17 @@ class VideoAnalysisApp:
         except tk.TclError:
             print("Warning: Initial check_button_states skipped (widgets initializing).")
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.bind("<Control-P>", self._toggle_profiling) # Hidden toggle (Ctrl+Shift+P)
+
+        self.event_pump = TkEventPump(self.root, self.event_bus, {
+            "progress": self._handle_progress_event,
+            "plan_ready": self._handle_plan_ready_event,
+            "audio_done": self._handle_audio_done_event,
+            "audio_error": self._handle_audio_error_event,
+            "video_file_done": self._handle_video_file_done_event,
+            "video_done": self._handle_video_done_event,
+            "video_error": self._handle_video_error_event,
+        }).start()
 
     def _initialize_state(self):
         """Sets or resets all state variables."""
@@ -94,10 +125,24 @@ class VideoAnalysisApp:
         self.is_processing = False
         self.audio_analysis_s = None
         self.video_analysis_s = None
-        self.prepared_clips_cache = [] # looks like this - {'moment': (s, e, lbl, fname), 'calculated_duration_sec': float}
+        self.audio_preset_used = None # Analysis preset names recorded per run for statistics
+        self.video_preset_used = None
+        self.audio_metrics = None # RunMetrics for the audio file
+        self.video_metrics = [] # RunMetrics per video file (stage timings, counters)
+        self.sample_scores = [] # (fname, time_s, score vector) per classified video sample, see mediapipe_utils.score_frame_mediapipe
+        self.moment_features = {} # (fname, start, end) -> visual features and quality of a moment, see frame_features.py
+        self.shot_boundaries = {} # fname -> sorted camera cut times (seconds), see shot_detection.py
+        self.prepared_clips_cache = [] # Planned clips, see clip_planning.ClipPlanner.plan - {'moment', 'source_file', 'start_frame', 'end_frame', 'duration_frames', 'calculated_duration_sec'}
         self.simulated_total_duration_s = None
+        self.expected_total_duration_s = None # Analytic expectation of the planned total for the selected style
+        self.plan_seed = random.randrange(2**32) # Seeds clip planning, so estimate and script use the same clips
+        self.clip_planner = None # ClipPlanner for the current moments (caches plans per style)
+        self.clip_planner_key = None
+        self.plan_generation = getattr(self, 'plan_generation', 0) + 1 # Drops results of plans started before a reset
         self.video_errors = [] # List of (filename, error_string) tuples
         self.processing_id = None # UUID to track current processing task
+        self.summary_sections = {} # Section name -> [(text, tag)] currently shown in result_display
+        self.moment_tree_data = {} # File node id -> [moments sorted by start], rows inserted on demand
         
         # Use hasattr check for robustness during initialization/reset
         if hasattr(self, 'target_duration_var'):
@@ -131,14 +176,6 @@ class VideoAnalysisApp:
         except (ValueError, TypeError):
             return "N/A"
 
-    def _s2f(self, s, fps=DEFAULT_FPS):
-        """Converts seconds to frames."""
-        return int(round(s * fps))
-
-    def _f2s(self, f, fps=DEFAULT_FPS):
-        """Converts frames to seconds."""
-        return float(f) / fps if fps > 0 else 0.0
-
     def create_widgets(self):
         """Creates and packs all the UI widgets."""
         title_label = ttk.Label(self.root, text="Recap Assistant for DaVinci Resolve", font=("Arial", 12, "bold"))
@@ -161,6 +198,20 @@ class VideoAnalysisApp:
         self.style_combobox = ttk.Combobox(options_frame, textvariable=self.style_var, values=EDITING_STYLES, state="readonly", width=10)
         self.style_var.trace_add("write", self._on_style_change) # Use trace_add
         self.style_combobox.pack(side=tk.LEFT, padx=5)
+        preset_label = ttk.Label(options_frame, text="Analysis Preset:")
+        preset_label.pack(side=tk.LEFT, padx=(15, 5))
+        self.preset_var = tk.StringVar(value=self.initial_analysis_preset)
+        self.preset_combobox = ttk.Combobox(options_frame, textvariable=self.preset_var, values=list(ANALYSIS_PRESETS), state="readonly", width=9)
+        self.preset_combobox.pack(side=tk.LEFT, padx=5)
+        fps_label = ttk.Label(options_frame, text="Timeline FPS:")
+        fps_label.pack(side=tk.LEFT, padx=(15, 5))
+        self.fps_var = tk.StringVar(value=f"{DEFAULT_FPS:g}")
+        self.fps_combobox = ttk.Combobox(options_frame, textvariable=self.fps_var, values=TIMELINE_FPS_OPTIONS, state="readonly", width=7)
+        self.fps_var.trace_add("write", self._on_style_change) # Clip frames are planned at this rate
+        self.fps_combobox.pack(side=tk.LEFT, padx=5)
+        self.fill_budget_var = tk.BooleanVar(value=self.initial_fill_budget)
+        self.fill_budget_check = ttk.Checkbutton(options_frame, text="Fill budget", variable=self.fill_budget_var)
+        self.fill_budget_check.pack(side=tk.LEFT, padx=(15, 5)) # Stop video analysis once enough footage is found
         # Show detection method (even if only one option currently)
         method_info_label = ttk.Label(options_frame, text="(Analysis: MediaPipe Object Detection)")
         method_info_label.pack(side=tk.RIGHT, padx=(10, 5))
@@ -182,9 +233,11 @@ class VideoAnalysisApp:
         self.progress_bar = Progressbar(self.root, mode='determinate', maximum=100, value=0, bootstyle="info-striped", length=300)
         self.progress_bar.pack(side=tk.TOP, pady=5, fill=tk.X, padx=10)
 
-        # Results textbox
-        result_label_frame = ttk.Frame(self.root)
-        result_label_frame.pack(side=tk.TOP, pady=(5, 5), padx=10, fill=tk.BOTH, expand=True)
+        # Results: summary textbox and moments list
+        self.results_notebook = ttk.Notebook(self.root)
+        self.results_notebook.pack(side=tk.TOP, pady=(5, 5), padx=10, fill=tk.BOTH, expand=True)
+        result_label_frame = ttk.Frame(self.results_notebook)
+        self.results_notebook.add(result_label_frame, text="Summary")
         bg_color = self.style.lookup('TFrame', 'background')
         fg_color = self.style.lookup('TLabel', 'foreground')
         
@@ -198,18 +251,37 @@ class VideoAnalysisApp:
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.result_display.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
+        # Moments per file; rows are only created when a file node is opened (one page at a time)
+        moments_frame = ttk.Frame(self.results_notebook)
+        self.results_notebook.add(moments_frame, text="Moments")
+        self.moment_tree = ttk.Treeview(moments_frame, columns=("start", "end", "duration", "label"), show="tree headings", height=10)
+        self.moment_tree.heading("#0", text="File / Moment")
+        self.moment_tree.column("#0", width=200, stretch=True)
+        for column, title, width in (("start", "Start", 70), ("end", "End", 70), ("duration", "Duration", 70), ("label", "Label", 140)):
+            self.moment_tree.heading(column, text=title)
+            self.moment_tree.column(column, width=width, stretch=column == "label", anchor="w" if column == "label" else "e")
+        tree_scrollbar = ttk.Scrollbar(moments_frame, orient=tk.VERTICAL, command=self.moment_tree.yview, bootstyle="round")
+        self.moment_tree.configure(yscrollcommand=tree_scrollbar.set)
+        tree_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.moment_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.moment_tree.bind("<<TreeviewOpen>>", self._on_moment_tree_open)
+        self.moment_tree.bind("<<TreeviewSelect>>", self._on_moment_tree_select)
+
         # Bottom buttons
         bottom_button_frame = ttk.Frame(self.root)
         bottom_button_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=(5, 10))
         bottom_button_frame.columnconfigure(0, weight=2)
         bottom_button_frame.columnconfigure(1, weight=1)
         bottom_button_frame.columnconfigure(2, weight=1)
+        bottom_button_frame.columnconfigure(3, weight=1)
         self.create_script_button = ttk.Button(bottom_button_frame, text="Create Script", command=self.run_create_script, bootstyle="success")
         self.create_script_button.grid(row=0, column=0, sticky="ew", padx=(0, 5))
         self.reset_button = ttk.Button(bottom_button_frame, text="Reset", command=self.reset_application, bootstyle="warning")
         self.reset_button.grid(row=0, column=1, sticky="ew", padx=(5, 5))
         self.save_csv_button = ttk.Button(bottom_button_frame, text="Save CSV", command=self.save_to_csv, bootstyle="info-outline")
-        self.save_csv_button.grid(row=0, column=2, sticky="ew", padx=(5, 0))
+        self.save_csv_button.grid(row=0, column=2, sticky="ew", padx=(5, 5))
+        self.export_metrics_button = ttk.Button(bottom_button_frame, text="Export Metrics", command=self.export_metrics, bootstyle="info-outline")
+        self.export_metrics_button.grid(row=0, column=3, sticky="ew", padx=(5, 0))
 
 
     def _configure_text_tags(self):
@@ -243,6 +315,7 @@ class VideoAnalysisApp:
             try:
                 self.result_display.config(state=tk.NORMAL)
                 self.result_display.delete("1.0", tk.END)
+                self.summary_sections = {}
 
                 # Clear previous tags (except selection) before inserting
                 for tag in self.result_display.tag_names():
@@ -306,7 +379,8 @@ class VideoAnalysisApp:
         """Enables/Disables UI controls based on application state."""
         widget_names = [
             'upload_audio_button', 'upload_video_button', 'create_script_button',
-            'reset_button', 'style_combobox', 'save_csv_button', 'length_slider'
+            'reset_button', 'style_combobox', 'save_csv_button', 'length_slider',
+            'preset_combobox', 'fps_combobox', 'export_metrics_button', 'fill_budget_check'
         ]
         if not all(hasattr(self, name) and getattr(self, name, None) and getattr(self, name).winfo_exists() for name in widget_names):
             print("Debug: Not all widgets ready for state check.") # Debug for buttons missing
@@ -316,7 +390,8 @@ class VideoAnalysisApp:
 
         can_adjust_or_save = (self.audio_processed and self.video_processed and not self.is_processing and not self.video_errors)
 
-        can_create_script = (self.audio_processed and (self.video_processed or self.video_errors) and style_selected and self.detector_loaded)
+        can_create_script = (self.audio_processed and (self.video_processed or self.video_errors) and style_selected and self.detector_loaded
+                             and not self._plan_pending())
 
         # Determine states when processing
         if self.is_processing:
@@ -326,6 +401,7 @@ class VideoAnalysisApp:
             combo_state = tk.DISABLED
             slider_state = tk.DISABLED
             save_csv_state = tk.DISABLED
+            metrics_state = tk.DISABLED
         else:
             # Enable audio if not yet processed
             audio_state = tk.NORMAL if not self.audio_processed else tk.DISABLED
@@ -338,6 +414,8 @@ class VideoAnalysisApp:
             # Enable slider/save based on their condition
             slider_state = tk.NORMAL if can_adjust_or_save else tk.DISABLED
             save_csv_state = tk.NORMAL if can_adjust_or_save else tk.DISABLED
+            # Metrics can be exported as soon as any file was analyzed (also after errors)
+            metrics_state = tk.NORMAL if (self.audio_metrics or self.video_metrics) else tk.DISABLED
 
         # Reset button always enabled
         reset_state = tk.NORMAL
@@ -351,11 +429,18 @@ class VideoAnalysisApp:
             self.style_combobox.config(state=combo_state)
             self.save_csv_button.config(state=save_csv_state)
             self.length_slider.config(state=slider_state)
+            self.preset_combobox.config(state=combo_state)
+            self.fps_combobox.config(state=combo_state)
+            self.fill_budget_check.config(state=tk.DISABLED if self.is_processing else tk.NORMAL)
+            self.export_metrics_button.config(state=metrics_state)
         except tk.TclError as e:
             print(f"Warning: Error configuring button states: {e}")
 
-    def _update_summary_display(self, processing_errors=None):
-        """Updates the result Text widget with a formatted summary."""
+    def _update_summary_display(self, processing_errors=None, status=None):
+        """
+        Updates the result Text widget with a formatted summary. Only sections whose content changed
+        are rewritten (appended to if they only grew), so per-file updates during a run stay cheap.
+        """
         if not self.audio_processed:
             self.update_ui_status("Status: Please analyze audio first.")
             return
@@ -363,174 +448,252 @@ class VideoAnalysisApp:
             return
 
         try:
-            self.result_display.config(state=tk.NORMAL)
-            self.result_display.delete("1.0", tk.END)
-            self._configure_text_tags()
-
-            # Audio Info 
-            self.result_display.insert(tk.END, "Audio Analysis Results:\n")
+            if not self.summary_sections: # Text currently holds a status message - start over
+                self.result_display.config(state=tk.NORMAL)
+                self.result_display.delete("1.0", tk.END)
+                self.result_display.config(state=tk.DISABLED)
+                self._configure_text_tags()
+
+            sections = {name: [] for name in SUMMARY_SECTIONS}
+            video_running = self.is_processing and self.video_files and self.video_analysis_s is None
+            if status:
+                sections["status"] = [(f"{status}\n", "bold")]
+            elif video_running:
+                sections["status"] = self.summary_sections.get("status", [])
+
+            # Audio Info
+            audio = sections["audio"]
+            audio.append(("Audio Analysis Results:\n", None))
             bpm_str = f"{self.bpm:.2f}" if self.bpm else "N/A"
-            self.result_display.insert(tk.END, "  Estimated BPM: ")
-            self.result_display.insert(tk.END, f"{bpm_str}\n", "bold")
+            audio.append(("  Estimated BPM: ", None))
+            audio.append((f"{bpm_str}\n", "bold"))
             audio_len_str = self._format_time(self.audio_duration_s)
-            self.result_display.insert(tk.END, f"  Audio Duration: {audio_len_str}\n")
+            audio.append((f"  Audio Duration: {audio_len_str}\n", None))
             time_audio_str = self._format_time(self.audio_analysis_s)
-            self.result_display.insert(tk.END, f"  Analysis time: {time_audio_str}\n")
+            audio.append((f"  Analysis time: {time_audio_str} (Preset: {self.audio_preset_used or 'N/A'})\n", None))
+            if self.audio_metrics:
+                audio.append((f"  Stages: {self.audio_metrics.summary_line()}\n", None))
 
             # Video Info
-            if self.video_processed or self.video_errors: # If video analysis was attempted
-                self.result_display.insert(tk.END, "\nVideo Analysis Results:\n")
+            video = sections["video"]
+            if self.video_processed or self.video_errors or video_running: # If video analysis was attempted
+                if video_running:
+                    video.append((f"\nVideo Analysis: In Progress ({len(self.video_metrics)}/{len(self.video_files)} files)\n", None))
+                else:
+                    video.append(("\nVideo Analysis Results:\n", None))
                 total_clips = sum(self.moment_counts.values()) if self.moment_counts else 0
-                self.result_display.insert(tk.END, "  Total Clips Found: ")
-                self.result_display.insert(tk.END, f"{total_clips}\n", "bold")
+                video.append(("  Total Clips Found: ", None))
+                video.append((f"{total_clips}\n", "bold"))
                 # Use the simulated duration based on selected style
                 video_clips_total_str = self._format_time(self.simulated_total_duration_s)
-                self.result_display.insert(tk.END, f"  Avail. Clips Duration: {video_clips_total_str}\n")
+                video.append((f"  Avail. Clips Duration: {video_clips_total_str}\n", None))
                 time_video_str = self._format_time(self.video_analysis_s)
-                self.result_display.insert(tk.END, f"  Analysis time: {time_video_str}\n")
+                video.append((f"  Analysis time: {time_video_str} (Preset: {self.video_preset_used or 'N/A'})\n", None))
+                # Per-file stage breakdown (shows whether a file was decode- or inference-bound), one row per finished file
+                sections["files"] = [(f"  - {file_metrics.name}: {file_metrics.summary_line()}\n", None) for file_metrics in self.video_metrics]
 
                 # Display Errors
                 final_errors = processing_errors if processing_errors else self.video_errors
                 if final_errors:
-                    self.result_display.insert(tk.END, f"\nProcessing completed with {len(final_errors)} error(s):\n", "error")
+                    errors = sections["errors"]
+                    errors.append((f"\nProcessing completed with {len(final_errors)} error(s):\n", "error"))
                     # Show first few errors inline
                     for i, (fname, err_str) in enumerate(final_errors):
                         if i < 5:
-                             self.result_display.insert(tk.END, f"  - {fname}: {err_str}\n", "error")
+                             errors.append((f"  - {fname}: {err_str}\n", "error"))
                         elif i == 5:
-                             self.result_display.insert(tk.END, "  ... (additional errors logged)\n", "error")
+                             errors.append(("  ... (additional errors logged)\n", "error"))
                              break
-            elif self.is_processing and self.video_files:
-                 self.result_display.insert(tk.END, "\nVideo Analysis: In Progress...\n")
             else:
-                 self.result_display.insert(tk.END, "\nVideo Analysis: Not started.\n")
+                 video.append(("\nVideo Analysis: Not started.\n", None))
 
             # Total Time
             if self.audio_analysis_s is not None and self.video_analysis_s is not None:
                 total_time = self.audio_analysis_s + self.video_analysis_s
                 total_time_str = self._format_time(total_time)
-                self.result_display.insert(tk.END, "\nTotal processing time: ", "bold")
-                self.result_display.insert(tk.END, f"{total_time_str}\n", "bold")
-
-                self.result_display.insert(tk.END, f"TIP: If you are not satisfied with the generated video, just\nclick 'Create Script' again for a different result - no re-analysis required!")
-
+                sections["total"] = [
+                    ("\nTotal processing time: ", "bold"),
+                    (f"{total_time_str}\n", "bold"),
+                    ("TIP: If you are not satisfied with the generated video, just\nclick 'Create Script' again for a different clip order - no re-analysis required!", None),
+                ]
 
-            self.result_display.config(state=tk.DISABLED)
+            for name in SUMMARY_SECTIONS:
+                self._set_summary_section(name, sections[name])
         except tk.TclError as e:
             print(f"Error updating summary display: {e}")
 
-
-    def _simulate_prep_clip(self, moment, style):
-        """Simulates clip duration adjustment based on style and beat duration. Returns duration in seconds or None."""
-        # Needs beat duration to function
-        if not self.beat_duration_s or self.beat_duration_s <= 0: return None
-
-        start_s, end_s, _, _ = moment # Unpack moment tuple
-        original_duration_s = end_s - start_s
-        if original_duration_s <= 0: return None
-
-        # Convert to frames for beat-based calculation
-        original_duration_f = self._s2f(original_duration_s)
-        beat_f = self._s2f(self.beat_duration_s)
-        if beat_f <= 0: return None
-
-        final_duration_f = 0
-        chosen_multiplier = 1 # Default multiplier
-
-        # Get style parameters or default
-        style_params = EDITING_STYLE_LOGIC.get(style, EDITING_STYLE_LOGIC.get("_Default"))
-        base_multipliers = sorted(style_params.get("base_multipliers", [1])) # Ensure sorted
-        base_weights = style_params.get("weights")
-
-        # Only adjust if clip is at least one beat long
-        if original_duration_f >= beat_f:
-            # Find max possible multiplier based on original duration
-            max_possible_multiplier = math.floor(original_duration_f / beat_f)
-
-            # Filter multipliers and their corresponding weights
-            valid_multipliers = []
-            valid_indices = []
-            for i, m in enumerate(base_multipliers):
-                if max_possible_multiplier >= m:
-                    valid_multipliers.append(m)
-                    valid_indices.append(i)
-
-            # Ensure we have at least one multiplier (use the smallest if needed)
-            if not valid_multipliers:
-                valid_multipliers = [base_multipliers[0]] if base_multipliers else [1]
-                valid_indices = [0] if base_multipliers else []
-
-            # Calculate weights for the valid multipliers
-            weights = None
-            if base_weights and len(base_weights) == len(base_multipliers) and valid_indices:
-                temp_weights = [base_weights[i] for i in valid_indices]
-                sum_w = sum(temp_weights)
-                if sum_w > 0: # Normalize weights
-                    weights = [w / sum_w for w in temp_weights]
-
-            # Choose a multiplier
-            if valid_multipliers:
-                if weights and len(weights) == len(valid_multipliers):
-                    try: # Use weighted choice if possible
-                        chosen_multiplier = random.choices(valid_multipliers, weights=weights, k=1)[0]
-                    except Exception as e: # Fallback if weights are invalid
-                        print(f"Warning: random.choices failed (weights invalid?), using random.choice. Error: {e}")
-                        chosen_multiplier = random.choice(valid_multipliers)
-                else: # Use uniform random choice if weights are not available/valid
-                    chosen_multiplier = random.choice(valid_multipliers)
-
-            final_duration_f = chosen_multiplier * beat_f
+    def _set_summary_section(self, name, chunks):
+        """
+        Shows chunks [(text, tag or None)] as one section of the summary. Unchanged sections are skipped,
+        sections that only grew get the new chunks appended, others are replaced in place.
+        """
+        old = self.summary_sections.get(name, [])
+        if old == chunks:
+            return
+        section_tag = f"section_{name}"
+        text = self.result_display
+        text.config(state=tk.NORMAL)
+        ranges = text.tag_ranges(section_tag)
+        if old and ranges and chunks[:len(old)] == old:
+            insert_at, new_chunks = ranges[-1], chunks[len(old):]
+        elif ranges:
+            insert_at, new_chunks = ranges[0], chunks
+            text.delete(ranges[0], ranges[-1])
         else:
-            # If clip is shorter than a beat, use its original duration
-            # Note: Filtering in detect_video_moments might make this rare
-            final_duration_f = original_duration_f
-
-        # Ensure final duration meets minimum clip length requirement (in frames)
-        final_duration_f = max(MIN_CLIP_FRAMES, final_duration_f)
-
-        # Convert back to seconds for return value
-        return self._f2s(final_duration_f)
-
-
-    def _simulate_prep_and_get_duration(self, selected_style):
-        """Simulates clip preparation for all moments, populates cache, returns total duration (seconds)."""
+            insert_at, new_chunks = tk.END, chunks
+            for later in SUMMARY_SECTIONS[SUMMARY_SECTIONS.index(name) + 1:]: # Keep the section order
+                later_ranges = text.tag_ranges(f"section_{later}")
+                if later_ranges:
+                    insert_at = later_ranges[0]
+                    break
+        text.mark_set("section_insert", insert_at) # Right gravity: moves past each inserted chunk
+        for chunk, tag in new_chunks:
+            text.insert("section_insert", chunk, (tag, section_tag) if tag else (section_tag,))
+        text.mark_unset("section_insert")
+        text.config(state=tk.DISABLED)
+        self.summary_sections[name] = list(chunks)
+
+    def _clear_moment_tree(self):
+        self.moment_tree_data = {}
+        if hasattr(self, 'moment_tree') and self.moment_tree.winfo_exists():
+            self.moment_tree.delete(*self.moment_tree.get_children())
+
+    def _add_moment_tree_file(self, file_name, moments):
+        """Adds a collapsed node for one analyzed file. Its moment rows are created when it is opened."""
+        if not hasattr(self, 'moment_tree') or not self.moment_tree.winfo_exists():
+            return
+        moments = sorted(moments, key=lambda m: m[0])
+        total_s = sum(m[1] - m[0] for m in moments)
+        node = self.moment_tree.insert("", tk.END, text=file_name,
+                                       values=("", "", self._format_time(total_s), f"{len(moments)} moments"))
+        if moments:
+            self.moment_tree_data[node] = {"moments": moments, "loaded": 0}
+            self.moment_tree.insert(node, tk.END, text="Loading...") # Placeholder so the node can be opened
+
+    def _load_moment_tree_page(self, node):
+        """Inserts the next MOMENT_TREE_PAGE_SIZE moment rows of a file node (plus a 'show more' row)."""
+        entry = self.moment_tree_data.get(node)
+        if not entry:
+            return
+        moments = entry["moments"]
+        first = entry["loaded"]
+        for index, (start, end, label, _) in enumerate(moments[first:first + MOMENT_TREE_PAGE_SIZE], start=first + 1):
+            self.moment_tree.insert(node, tk.END, text=f"#{index}",
+                                    values=(f"{start:.2f}s", f"{end:.2f}s", f"{end - start:.2f}s", label))
+        entry["loaded"] = min(len(moments), first + MOMENT_TREE_PAGE_SIZE)
+        remaining = len(moments) - entry["loaded"]
+        if remaining > 0:
+            self.moment_tree.insert(node, tk.END, text=f"Show {min(remaining, MOMENT_TREE_PAGE_SIZE)} more ({remaining} left)...", tags=("more",))
+
+    def _on_moment_tree_open(self, event=None):
+        node = self.moment_tree.focus()
+        entry = self.moment_tree_data.get(node)
+        if entry and entry["loaded"] == 0:
+            self.moment_tree.delete(*self.moment_tree.get_children(node)) # Drop the placeholder
+            self._load_moment_tree_page(node)
+
+    def _on_moment_tree_select(self, event=None):
+        for item in self.moment_tree.selection():
+            if "more" in self.moment_tree.item(item, "tags"):
+                node = self.moment_tree.parent(item)
+                self.moment_tree.delete(item)
+                self._load_moment_tree_page(node)
+
+
+    def _timeline_fps(self):
+        """Returns the selected timeline frame rate (clips are planned in frames at this rate)."""
+        try:
+            fps = float(self.fps_var.get()) if hasattr(self, 'fps_var') else DEFAULT_FPS
+        except (ValueError, tk.TclError):
+            fps = DEFAULT_FPS
+        return fps if fps > 0 else DEFAULT_FPS
+
+    def _source_durations(self):
+        """Returns {file basename: duration in seconds} for analyzed videos (used to clamp planned clips)."""
+        return {m.name: m.media_duration_s for m in self.video_metrics or [] if m.media_duration_s}
+
+
+    def _snapshot_plan_inputs(self, fps):
+        """
+        Copies everything clip planning reads from the app state (Tk thread), so the planning worker never
+        touches live state. The current ClipPlanner is passed along and reused if its key still matches.
+        """
+        people = list(self.people_moments or [])
+        other = list(self.other_scene_moments or [])
+        key = (id(self.people_moments), id(self.other_scene_moments), len(people) + len(other),
+               self.beat_duration_s, fps, self.plan_seed, len(self.moment_features))
+        return {
+            "analysis_attempted": bool(self.video_processed or self.video_errors),
+            "moments": people + other, "beat_duration_s": self.beat_duration_s, "fps": fps,
+            "source_durations": self._source_durations(), "seed": self.plan_seed,
+            "moment_features": dict(self.moment_features), "key": key,
+            "planner": self.clip_planner if self.clip_planner_key == key else None,
+        }
+
+    def _build_clip_planner(self, inputs):
+        """Returns (ClipPlanner, key) for a plan input snapshot, reusing the snapshot's planner if it is current."""
+        planner = inputs["planner"]
+        if planner is None:
+            planner = ClipPlanner(inputs["moments"], inputs["beat_duration_s"], inputs["fps"],
+                                  inputs["source_durations"], inputs["seed"], inputs["moment_features"])
+        return planner, inputs["key"]
+
+
+    def _simulate_prep_and_get_duration(self, selected_style, inputs):
+        """
+        Plans the final clips for all moments (same plan the script will use) from a _snapshot_plan_inputs snapshot.
+        Runs in the planning worker thread. Returns ((clips, total duration in seconds, expected total in seconds),
+        (planner, key)); planner is None if nothing could be planned.
+        """
         # Requires video analysis attempted and beat duration known
-        if not (self.video_processed or self.video_errors) or not self.beat_duration_s:
+        if not inputs["analysis_attempted"] or not inputs["beat_duration_s"]:
             print("Warning: Cannot simulate clip prep - video/beat data missing.")
-            return [], None # Return empty list and None duration
+            return ([], None, None), (None, None) # Return empty list and None duration
 
         print(f"Simulating clip preparation for style '{selected_style}'...")
-        prepared_clips = []
-        total_simulated_seconds = 0.0
-        all_moments = (self.people_moments or []) + (self.other_scene_moments or [])
-
-        if not all_moments:
+        if not inputs["moments"]:
             print("No video moments found to simulate.")
-            return [], 0.0
-
-        simulation_count = 0
-        for moment_data in all_moments:
-            # Simulate the duration calculation for this moment and style
-            calculated_duration_s = self._simulate_prep_clip(moment_data, selected_style)
-
-            # Only include clips with a valid positive duration
-            if calculated_duration_s is not None and calculated_duration_s > 0:
-                # Store original moment tuple and its calculated duration
-                prepared_info = {
-                    "moment": moment_data,
-                    "calculated_duration_sec": calculated_duration_s # Use calculated duration
-                 }
-                prepared_clips.append(prepared_info)
-                total_simulated_seconds += calculated_duration_s
-                simulation_count += 1
-
-        print(f"Simulation complete. Calculated total duration from {simulation_count} clips: {total_simulated_seconds:.2f}s.")
+            return ([], 0.0, 0.0), (None, None)
+
+        planner, key = self._build_clip_planner(inputs)
+        prepared_clips, total_simulated_seconds = planner.plan(selected_style)
+        expected_total_s = planner.expected_total_s(selected_style)
+
+        print(f"Planning complete (seed {inputs['seed']}). Calculated total duration from {len(prepared_clips)} clips: "
+              f"{total_simulated_seconds:.2f}s (expected {expected_total_s:.2f}s).")
         # Return the list of prepared clip info and the total duration
-        return prepared_clips, total_simulated_seconds
+        return (prepared_clips, total_simulated_seconds, expected_total_s), (planner, key)
+
+
+    def _plan_inputs_ready(self):
+        """True if analysis results and a style are available for planning."""
+        return (
+            self.audio_processed and self.audio_duration_s is not None and
+            (self.video_processed or self.video_errors) and # Video analysis attempted
+            hasattr(self, 'style_var') and self.style_var.get() in EDITING_STYLES and
+            self.beat_duration_s is not None # Beat duration needed
+        )
 
+    def _plan_pending(self):
+        """True while a (debounced) plan recalculation is scheduled or running."""
+        return self._plan_after_id is not None or self._plan_worker_busy
 
     def _calculate_and_configure_slider(self):
-        """Runs simulation, updates total duration, configures slider range/value, updates labels."""
+        """
+        Schedules a debounced background plan recalculation. Rapid style/FPS changes collapse into one run;
+        the slider and labels are configured in a single UI update when the worker finishes.
+        """
+        if self._plan_after_id is not None:
+            try: self.root.after_cancel(self._plan_after_id)
+            except tk.TclError: pass
+        self._plan_after_id = self.root.after(PLAN_DEBOUNCE_MS, self._start_plan_recalculation)
+
+    def _start_plan_recalculation(self):
+        """Reads the planning inputs on the Tk thread and starts the planning worker (or marks a rerun)."""
+        self._plan_after_id = None
+        if self._plan_worker_busy:
+            self._plan_rerun_pending = True # Picked up when the running worker reports back
+            return
         # Check required UI elements exist
         widgets_to_check = ['est_length_label', 'length_slider', 'slider_label', 'style_var']
         if not all(hasattr(self, w) and getattr(self, w, None) for w in widgets_to_check):
@@ -542,16 +705,50 @@ class VideoAnalysisApp:
              print("Warning: Tkinter UI elements for slider/length not ready.")
              return
 
-
         selected_style = self.style_var.get()
+        generation = self.plan_generation
+        if not self._plan_inputs_ready():
+            self._apply_plan_result(selected_style, None)
+            self.check_button_states()
+            return
 
-        # Check conditions required for calculation
-        conditions_met = (
-            self.audio_processed and self.audio_duration_s is not None and
-            (self.video_processed or self.video_errors) and # Video analysis attempted
-            selected_style in EDITING_STYLES and
-            self.beat_duration_s is not None # Beat duration needed
-        )
+        print(f"Recalculating video clip total duration for style: {selected_style}")
+        try:
+            audio_duration_str = self._format_time(self.audio_duration_s)
+            self.est_length_label.config(text=f"Audio: {audio_duration_str} | Target: ... | Avail. Clips: calculating...")
+        except tk.TclError: pass
+        self._plan_worker_busy = True
+        self.check_button_states()
+        inputs = self._snapshot_plan_inputs(self._timeline_fps())
+        thread = Thread(target=self._run_plan_worker, args=(selected_style, inputs, generation), daemon=True)
+        thread.start()
+
+    def _run_plan_worker(self, selected_style, inputs, generation):
+        """Worker function for clip planning (runs in thread). Only reads the input snapshot; hands the result and planner to the Tk thread."""
+        try:
+            result, (planner, planner_key) = self._simulate_prep_and_get_duration(selected_style, inputs)
+        except Exception as e:
+            print(f"Clip planning error: {e}\n{traceback.format_exc()}")
+            result, planner, planner_key = ([], None, None), None, None
+        self.event_bus.post("plan_ready", generation, selected_style=selected_style, result=result,
+                            planner=planner, planner_key=planner_key)
+
+    def _on_plan_ready(self, selected_style, result, generation, planner=None, planner_key=None):
+        """Applies a finished plan unless inputs changed meanwhile (then plans again with the latest inputs)."""
+        self._plan_worker_busy = False
+        if planner is not None: # Cached for the next run; the key check drops it if inputs changed meanwhile
+            self.clip_planner, self.clip_planner_key = planner, planner_key
+        if not self.root.winfo_exists(): return
+        if self._plan_rerun_pending or generation != self.plan_generation or selected_style != self.style_var.get():
+            self._plan_rerun_pending = False
+            self._start_plan_recalculation()
+            return
+        self._apply_plan_result(selected_style, result)
+        self.check_button_states()
+
+    def _apply_plan_result(self, selected_style, result):
+        """Stores the plan, configures slider range/value and updates labels (Tk thread, one UI update)."""
+        conditions_met = result is not None and self._plan_inputs_ready()
 
         # Initialize display strings
         audio_duration_str = self._format_time(self.audio_duration_s) if self.audio_duration_s else "N/A"
@@ -560,10 +757,7 @@ class VideoAnalysisApp:
         slider_enabled = False # Default slider state
 
         if conditions_met:
-            print(f"Recalculating video clip total duration for style: {selected_style}")
-            # Run simulation
-            # This populates self.prepared_clips_cache and returns the total duration
-            self.prepared_clips_cache, self.simulated_total_duration_s = self._simulate_prep_and_get_duration(selected_style)
+            self.prepared_clips_cache, self.simulated_total_duration_s, self.expected_total_duration_s = result
             video_clips_total_str = self._format_time(self.simulated_total_duration_s)
 
             # Configure Slider
@@ -633,10 +827,20 @@ class VideoAnalysisApp:
                 self.est_length_label.config(text=f"Audio: {audio_duration_str} | Target: {target_str} | Avail. Clips: {video_clips_total_str}")
         except tk.TclError: pass
 
-        self.root.update_idletasks() # Process UI updates
-
 
     # Event Handlers / Actions
+    def _toggle_profiling(self, event=None):
+        """Hidden toggle for profiling analysis runs (for diagnosing slow runs remotely)."""
+        enabled = not profiling_enabled()
+        set_profiling(enabled)
+        output_dir = profile_output_dir()
+        if output_dir == staging_profile_dir():
+            output_dir += " (moved next to the metrics report on export)"
+        state_str = f"ON - profiles will be written to {output_dir}" if enabled else "OFF"
+        print(f"Profiling {state_str}")
+        if not self.is_processing:
+            self.update_ui_status(f"Profiling {state_str}")
+
     def _on_style_change(self, *args):
         """Call when editing style combobox changes."""
         selected_style = self.style_var.get()
@@ -648,7 +852,15 @@ class VideoAnalysisApp:
 
 
     def _on_slider_change(self, value=None):
-        """Call when slider value changes. Updates labels."""
+        """Call when slider value changes. Label updates are coalesced into one per idle cycle."""
+        if self._slider_refresh_pending: return
+        self._slider_refresh_pending = True
+        self.root.after_idle(self._refresh_slider_labels)
+
+
+    def _refresh_slider_labels(self):
+        """Updates the slider and estimate labels from the current slider value."""
+        self._slider_refresh_pending = False
         # Check required UI elements exist and target_duration_var exists
         if not all(hasattr(self, w) for w in ['slider_label', 'est_length_label', 'target_duration_var']): return
         if not all(getattr(self, w, None) and getattr(self,w).winfo_exists() for w in ['slider_label', 'est_length_label'] if hasattr(self, w)): return
@@ -665,14 +877,12 @@ class VideoAnalysisApp:
             audio_duration_str = self._format_time(self.audio_duration_s) if hasattr(self,'audio_duration_s') else "N/A"
             video_clips_total_str = self._format_time(self.simulated_total_duration_s) if hasattr(self,'simulated_total_duration_s') else "N/A"
             self.est_length_label.config(text=f"Audio: {audio_duration_str} | Target: {target_str} | Avail. Clips: {video_clips_total_str}")
-
-            self.root.update_idletasks()
         except tk.TclError as e:
              print(f"Error during slider change update (TclError): {e}")
         except AttributeError as e:
              print(f"Attribute Error during slider change update: {e}") # Catch if state vars missing
         except Exception as e:
-             print(f"Unexpected error in _on_slider_change: {e}")
+             print(f"Unexpected error in _refresh_slider_labels: {e}")
 
 
     def reset_application(self):
@@ -699,6 +909,7 @@ class VideoAnalysisApp:
             if hasattr(self, 'slider_label') and self.slider_label.winfo_exists(): self.slider_label.config(text="N/A")
             if hasattr(self, 'result_display') and self.result_display.winfo_exists():
                 self.result_display.config(state=tk.NORMAL); self.result_display.delete("1.0", tk.END); self.result_display.config(state=tk.DISABLED)
+            self._clear_moment_tree()
 
             # Set initial status message (checks detector) and update button states
             self._set_initial_status_message()
@@ -723,11 +934,12 @@ class VideoAnalysisApp:
             # Start processing
             run_id = uuid.uuid4(); self.processing_id = run_id
             self.is_processing = True
-            self.update_ui_status(f"Starting Audio Analysis: {os.path.basename(file_path)}...")
+            preset_name = self.preset_var.get()
+            self.update_ui_status(f"Starting Audio Analysis ({preset_name}): {os.path.basename(file_path)}...")
             self.start_indeterminate_progress()
             self.check_button_states()
             # Run analysis in a separate thread
-            thread = Thread(target=self._run_audio_analysis, args=(file_path, run_id), daemon=True)
+            thread = Thread(target=run_profiled, args=("audio_analysis", self._run_audio_analysis, file_path, run_id, preset_name), daemon=True)
             thread.start()
 
     def select_video_files(self):
@@ -755,9 +967,15 @@ class VideoAnalysisApp:
             self.other_scene_moments.clear()
             self.moment_counts.clear()
             self.video_analysis_s = None
+            self.video_preset_used = None
+            self.video_metrics = []
+            self.sample_scores = []
+            self.moment_features = {}
+            self.shot_boundaries = {}
             self.video_errors = []
             self.prepared_clips_cache = []
             self.simulated_total_duration_s = None
+            self._clear_moment_tree()
 
             # Reset relevant UI parts safely
             try:
@@ -776,11 +994,16 @@ class VideoAnalysisApp:
             # Start processing
             run_id = uuid.uuid4(); self.processing_id = run_id
             self.is_processing = True
-            self.update_ui_status(f"Analyzing {len(self.video_files)} video file(s)...")
+            preset_name = self.preset_var.get()
+            # Fill-budget mode: stop once the planned clips reach a multiple of the song length
+            fill_budget_s = FILL_BUDGET_MULTIPLE * self.audio_duration_s if self.fill_budget_var.get() else None
+            style = self.style_var.get() if self.style_var.get() in EDITING_STYLES else None
+            mode_str = f", fill budget {self._format_time(fill_budget_s)}" if fill_budget_s else ""
+            self._update_summary_display(status=f"Analyzing {len(self.video_files)} video file(s) ({preset_name}{mode_str})...")
             self.start_indeterminate_progress()
             self.check_button_states()
             # Run analysis in a separate thread
-            thread = Thread(target=self._run_video_processing, args=(self.video_files, self.beat_duration_s, run_id), daemon=True)
+            thread = Thread(target=run_profiled, args=("video_processing", self._run_video_processing, self.video_files, self.beat_duration_s, run_id, preset_name, fill_budget_s, style, self.schedule_policy, self.decode_backend), daemon=True)
             thread.start()
 
 
@@ -806,13 +1029,15 @@ class VideoAnalysisApp:
         if not hasattr(self, 'target_duration_var'):
              messagebox.showerror("Internal Error", "Target duration variable is missing.")
              return
-        # Ensure clip simulation has run (or re-run it if needed)
+        # Ensure the clip plan is up to date (it is recalculated in the background)
+        if self._plan_pending():
+             messagebox.showinfo("Please wait", "The clip plan is still being calculated. Try again in a moment.")
+             return
         if self.prepared_clips_cache is None:
              print("Warning: prepared_clips_cache is None. Recalculating...")
-             self._calculate_and_configure_slider() # This runs the simulation
-             if self.prepared_clips_cache is None: # Check again
-                 messagebox.showerror("Error", "Clip preparation/simulation failed. Cannot create script.")
-                 return
+             self._calculate_and_configure_slider()
+             messagebox.showinfo("Please wait", "The clip plan is being recalculated. Try again in a moment.")
+             return
 
         # Target Duration and Available Duration
         target_duration_s = self.target_duration_var.get()
@@ -827,7 +1052,7 @@ class VideoAnalysisApp:
         final_target_s = max(final_target_s, MIN_SLIDER_S) # Ensure minimum
 
         # Select Clips based on Target Duration
-        final_moments = [] # This will hold the original moment tuples to use
+        final_clips = [] # Planned clips (frame ranges) to use
 
         if not self.prepared_clips_cache or available_duration_s <= 0:
             print("No prepared clips available or total duration is zero. Script will have no video clips.")
@@ -835,52 +1060,35 @@ class VideoAnalysisApp:
         # Use all clips if target is close to or exceeds available (allow small float tolerance)
         elif final_target_s >= available_duration_s * 0.999:
             print(f"Using all {len(self.prepared_clips_cache)} prepared clips. Target ({self._format_time(final_target_s)}) >= Available ({self._format_time(available_duration_s)}).")
-            final_moments = [clip_info['moment'] for clip_info in self.prepared_clips_cache]
+            final_clips = list(self.prepared_clips_cache)
         else:
-            # Remove clips until total duration is <= target
+            # Pick the clips whose durations sum closest to the target (at least one clip per file where possible)
             print(f"Target duration ({self._format_time(final_target_s)}) requires shortening from {self._format_time(available_duration_s)}...")
-            # Work with a copy of the cached clip info (which includes calculated durations)
-            clips_to_shorten = list(self.prepared_clips_cache)
-            current_total_s = available_duration_s
-            num_removed = 0
-
-            # Sort by calculated duration (ascending) to remove shortest first
-            clips_to_shorten.sort(key=lambda x: x['calculated_duration_sec'])
-
-            print(f" Starting shortening. Initial simulated duration: {current_total_s:.2f}s. Target: {final_target_s:.2f}s")
-            while current_total_s > final_target_s and clips_to_shorten:
-                # Remove the shortest clip (based on its pre-calculated duration)
-                removed_clip_info = clips_to_shorten.pop(0)
-                removed_duration = removed_clip_info['calculated_duration_sec'] # Use stored calculated duration
-                current_total_s -= removed_duration
-                num_removed += 1
-                # Safety break
-                if current_total_s < -0.01: # Allow tiny negative due to float math
-                    print(f" Warning: Shortening resulted in negative duration ({current_total_s:.2f}s). Stopping removal.")
-                    break
-
-            print(f" Removed {num_removed} clips (shortest first). New simulated duration: {current_total_s:.2f}s.")
-            # The remaining clips' original moments are used for the script
-            final_moments = [clip_info['moment'] for clip_info in clips_to_shorten]
+            fit_start = time.perf_counter()
+            final_clips, num_removed, current_total_s = fit_clips_to_target(
+                self.prepared_clips_cache, final_target_s, self._timeline_fps()
+            )
+            print(f" Removed {num_removed} clips in {1000 * (time.perf_counter() - fit_start):.1f} ms. Selected duration: {current_total_s:.2f}s (target {final_target_s:.2f}s).")
 
 
-        # Separate Final Moments for Script Generator
-        final_people_moments = [m for m in final_moments if m[2] == "People"]
-        final_other_moments = [m for m in final_moments if m[2] != "People"]
-        print(f"Passing {len(final_people_moments)} People and {len(final_other_moments)} Other moments ({len(final_moments)} total) to script generator.")
+        # Order by source file (new order on every click, durations stay as estimated)
+        final_clips = order_clips_by_source(final_clips, random.Random())
+        final_total_s = sum(clip_info['calculated_duration_sec'] for clip_info in final_clips)
+        print(f"Passing {len(final_clips)} planned clips ({final_total_s:.2f}s) to script generator.")
 
         # Call Script Generator
         try:
             create_script(
                 estimated_tempo=self.bpm,
                 frame_duration=self.beat_duration_s,
-                merged_moments=final_people_moments,
-                scene_moments=final_other_moments,
+                planned_clips=final_clips,
                 video_files=self.video_files,
                 audio_file_path=self.audio_file_path,
                 audio_start_offset=self.audio_offset_s,
+                audio_duration_s=self.audio_duration_s,
                 selected_style=selected_style,
-                
+                fps=self._timeline_fps(),
+
                 audio_processed=self.audio_processed,
                 video_processed=self.video_processed or self.video_errors
             )
@@ -891,7 +1099,10 @@ class VideoAnalysisApp:
 
 
     def save_to_csv(self):
-        """Saves detailed analysis results (including simulated durations) to a CSV file."""
+        """
+        Saves detailed analysis results (including simulated durations) to a CSV file,
+        or as separate typed tables to JSON Lines / Parquet / Arrow files (see analysis_export.py).
+        """
 
         if not self.audio_processed:
             messagebox.showwarning("Save CSV", "Audio analysis must be completed first.")
@@ -913,12 +1124,16 @@ class VideoAnalysisApp:
         file_path = filedialog.asksaveasfilename(
             title="Save Analysis Summary CSV",
             defaultextension=".csv",
-            filetypes=[("CSV Files", "*.csv"), ("All Files", "*.*")],
+            filetypes=[("CSV Files", "*.csv"), ("JSON Lines Tables", "*.jsonl"), ("Parquet Tables", "*.parquet"),
+                       ("Arrow IPC Tables", "*.arrow"), ("All Files", "*.*")],
             initialfile=default_filename
         )
         if not file_path:
             print("CSV save cancelled.")
             return
+        if os.path.splitext(file_path)[1].lower() in ANALYSIS_EXPORT_FORMATS:
+            self._export_analysis_tables(file_path)
+            return
 
         print(f"Saving analysis summary to: {file_path}")
         try:
@@ -930,7 +1145,7 @@ class VideoAnalysisApp:
                     "EstBPM", "BeatDurationSec", "AudioOffsetSec", "TotalAudioDurationSec",
                     "SelectedStyle", "AudioAnalysisTimeSec", "VideoAnalysisTimeSec",
                     "TotalProcessingTimeSec", "TotalClipsFound", "SimulatedTotalClipsDurationSec",
-                    "VideoErrors"
+                    "VideoErrors", "AudioPreset", "VideoPreset"
                 ]
                 writer.writerow(header)
 
@@ -959,7 +1174,9 @@ class VideoAnalysisApp:
                     f"{total_time_s:.2f}" if total_time_s is not None else "N/A",
                     total_clips_found,
                     simulated_duration_str, # Use simulated duration !!
-                    video_error_str
+                    video_error_str,
+                    self.audio_preset_used or "N/A",
+                    self.video_preset_used or "N/A"
                 ]
                 writer.writerow(audio_row)
 
@@ -974,7 +1191,7 @@ class VideoAnalysisApp:
                     moment_row = [
                         "VideoMoment", fname, label,
                         f"{start:.3f}", f"{end:.3f}", f"{duration:.3f}",
-                        "", "", "", "", "", "", "", "", "", "", ""
+                        "", "", "", "", "", "", "", "", "", "", "", "", ""
                     ]
                     writer.writerow(moment_row)
 
@@ -988,12 +1205,90 @@ class VideoAnalysisApp:
             print(f"Save CSV Unexpected Error:\n{tb_str}")
 
 
+    def _export_analysis_tables(self, file_path):
+        """Streams summary, moments, stage timings and per-sample category scores as separate typed tables (format from the extension)."""
+        total_time_s = None
+        if self.audio_analysis_s is not None and self.video_analysis_s is not None:
+            total_time_s = self.audio_analysis_s + self.video_analysis_s
+        summary = {
+            "audio_file": os.path.basename(self.audio_file_path) if self.audio_file_path else None,
+            "bpm": self.bpm,
+            "beat_duration_s": self.beat_duration_s,
+            "audio_offset_s": self.audio_offset_s,
+            "audio_duration_s": self.audio_duration_s,
+            "selected_style": self.style_var.get() if hasattr(self, 'style_var') and self.style_var.get() in EDITING_STYLES else None,
+            "audio_analysis_s": self.audio_analysis_s,
+            "video_analysis_s": self.video_analysis_s,
+            "total_processing_s": total_time_s,
+            "total_clips_found": sum(self.moment_counts.values()) if self.moment_counts else 0,
+            "simulated_total_clips_s": self.simulated_total_duration_s,
+            "video_file_count": len(self.video_files),
+            "video_error_count": len(self.video_errors),
+            "video_errors": "; ".join(f"{fname}: {err}" for fname, err in self.video_errors),
+            "audio_preset": self.audio_preset_used,
+            "video_preset": self.video_preset_used,
+        }
+        metrics_list = ([self.audio_metrics] if self.audio_metrics else []) + list(self.video_metrics)
+        print(f"Exporting analysis tables to: {file_path}")
+        try:
+            written = export_analysis(file_path, summary, chain(self.people_moments, self.other_scene_moments), metrics_list,
+                                      sample_scores=iter_score_labels(self.sample_scores) if self.sample_scores else None,
+                                      shot_boundaries=self.shot_boundaries if self.shot_boundaries else None,
+                                      moment_features=self.moment_features)
+            paths = "\n".join(path for path, _ in written.values())
+            messagebox.showinfo("Save Analysis", f"Analysis tables saved successfully:\n{paths}")
+        except (IOError, OSError) as e:
+            messagebox.showerror("Save Analysis Error", f"Could not write file to disk:\n{e}")
+            print(f"Analysis export IO Error: {e}")
+        except (RuntimeError, ValueError) as e: # pyarrow missing / unknown format
+            messagebox.showerror("Save Analysis Error", str(e))
+            print(f"Analysis export error: {e}")
+
+    def export_metrics(self):
+        """Exports per-stage timings and counters of the last run to a JSON file."""
+        if self.is_processing:
+            messagebox.showwarning("Export Metrics", "Please wait for analysis to complete.")
+            return
+        if not self.audio_metrics and not self.video_metrics:
+            messagebox.showwarning("Export Metrics", "No analysis metrics recorded yet.")
+            return
+
+        default_filename = f"analysis_metrics_{time.strftime('%Y%m%d_%H%M%S')}.json"
+        file_path = filedialog.asksaveasfilename(
+            title="Export Analysis Metrics",
+            defaultextension=".json",
+            filetypes=[("JSON Files", "*.json"), ("All Files", "*.*")],
+            initialfile=default_filename
+        )
+        if not file_path:
+            print("Metrics export cancelled.")
+            return
+
+        run_info = {
+            "audio_file": os.path.basename(self.audio_file_path) if self.audio_file_path else None,
+            "audio_preset": self.audio_preset_used,
+            "video_preset": self.video_preset_used,
+            "audio_analysis_s": self.audio_analysis_s,
+            "video_analysis_s": self.video_analysis_s,
+            "video_errors": [list(e) for e in self.video_errors],
+            "profile_dir": move_profiles_to_report(file_path) if profiling_enabled() else None,
+        }
+        metrics_list = ([self.audio_metrics] if self.audio_metrics else []) + list(self.video_metrics)
+        try:
+            export_metrics_json(file_path, run_info, metrics_list)
+            messagebox.showinfo("Export Metrics", f"Analysis metrics saved successfully to:\n{file_path}")
+        except (IOError, OSError) as e:
+            messagebox.showerror("Export Metrics Error", f"Could not write file to disk:\n{e}")
+            print(f"Export Metrics IO Error: {e}")
+
+
     def on_close(self):
         """Handles window closing: release detector, destroy window."""
         print("Closing application...")
         # Signal threads to stop processing callbacks by changing ID
         self.is_processing = False
         self.processing_id = uuid.uuid4()
+        if hasattr(self, 'event_pump'): self.event_pump.stop()
         print("Releasing MediaPipe detector (if loaded)...")
         release_detector() # cleanup function from mediapipe_utils
         print("Destroying Tkinter root window...")
@@ -1007,8 +1302,9 @@ class VideoAnalysisApp:
 
     # Background Task Execution
 
-    def _run_audio_analysis(self, file_path, run_id):
-        """Worker function for audio analysis (runs in thread)."""
+    def _run_audio_analysis(self, file_path, run_id, preset_name=DEFAULT_ANALYSIS_PRESET):
+        """Worker function for audio analysis (runs in thread). Reports only through the event bus."""
+        bus = self.event_bus
         start_time = time.perf_counter()
         try:
 
@@ -1016,64 +1312,113 @@ class VideoAnalysisApp:
                 print(f"Audio run {run_id} cancelled before start.")
                 return
 
-            self.root.after(0, self.update_ui_status, f"Audio: Loading & Analyzing...")
+            bus.progress(run_id, "status", message="Audio: Loading & Analyzing...")
 
-            tempo, beat_dur, offset, total_audio_dur = get_bpm_and_offset(file_path)
+            preset = get_analysis_preset(preset_name)
+            audio_metrics = RunMetrics(os.path.basename(file_path), kind="audio")
+            tempo, beat_dur, offset, total_audio_dur = get_bpm_and_offset(file_path, sample_rate=preset["audio_sample_rate"], metrics=audio_metrics)
 
             if run_id != self.processing_id:
                 print(f"Audio run {run_id} cancelled after processing.")
                 return
 
-            end_time = time.perf_counter()
-            self.audio_analysis_s = end_time - start_time # Store duration
-            print(f"--- Audio analysis completed in {self.audio_analysis_s:.2f}s ---")
-
-            self.bpm = tempo
-            self.beat_duration_s = beat_dur
-            self.audio_offset_s = offset
-            self.audio_duration_s = total_audio_dur
-            self.audio_processed = True
-
-            self.root.after(0, self._on_audio_analysis_complete, run_id)
+            analysis_s = time.perf_counter() - start_time
+            print(f"--- Audio analysis completed in {analysis_s:.2f}s (preset '{preset_name}') ---")
+            bus.post("audio_done", run_id, analysis_s=analysis_s, preset_name=preset_name, metrics=audio_metrics,
+                     bpm=tempo, beat_duration_s=beat_dur, offset_s=offset, duration_s=total_audio_dur)
 
         except Exception as e:
             if run_id != self.processing_id:
                 print(f"Audio run {run_id} cancelled during error handling.")
                 return
 
-            end_time = time.perf_counter()
-            if 'start_time' in locals(): 
-                self.audio_analysis_s = end_time - start_time
-                print(f"--- Audio analysis FAILED after {self.audio_analysis_s:.2f}s ---")
-            else:
-                print(f"--- Audio analysis FAILED (timing error) ---")
-                self.audio_analysis_s = None 
-
-            self.audio_processed = False
-            self.bpm = None
-            self.beat_duration_s = None
-            self.audio_offset_s = 0.0
-            self.audio_duration_s = None
+            analysis_s = time.perf_counter() - start_time
+            print(f"--- Audio analysis FAILED after {analysis_s:.2f}s ---")
 
-            tb_str = traceback.format_exc() 
+            tb_str = traceback.format_exc()
             print(f"Audio Analysis Error: {e}\n{tb_str}")
 
-            self.root.after(0, self._on_audio_analysis_error, e, tb_str, run_id)
+            bus.post("audio_error", run_id, error=str(e), traceback_str=tb_str, analysis_s=analysis_s)
 
 
-    def _run_video_processing(self, file_paths, beat_duration_s, run_id):
-        """Worker function for video processing (runs in thread). Handles errors per file."""
+    def _run_video_processing(self, file_paths, beat_duration_s, run_id, preset_name=DEFAULT_ANALYSIS_PRESET, fill_budget_s=None, style=None,
+                              schedule_policy=DEFAULT_SCHEDULE_POLICY, decode_backend=DEFAULT_DECODE_BACKEND):
+        """
+        Worker function for video processing (runs in thread). Handles errors per file, reports through the event bus.
+        Files are probed first and analyzed one at a time in schedule_policy order (see video_probe.schedule_videos),
+        progress and ETA are frame-based. With fill_budget_s the files are analyzed round-robin until the planned clips
+        for the style reach that duration; progress is then the share of that budget found so far (no ETA, the stop
+        point is not known in advance).
+        """
+        bus = self.event_bus
         overall_start_time = time.perf_counter()
         # Local lists to accumulate results
         all_people_local = []
         all_other_local = []
         video_errors_local = []
+        video_metrics_local = []
         local_moment_counts = Counter()
         processed_count = 0
         num_files = len(file_paths)
 
+        def results(**extra):
+            """Payload with everything collected so far (applied on the Tk thread)."""
+            return dict(analysis_s=time.perf_counter() - overall_start_time, preset_name=preset_name,
+                        people_moments=all_people_local, other_scene_moments=all_other_local,
+                        moment_counts=local_moment_counts, errors=video_errors_local,
+                        metrics=video_metrics_local, **extra)
+
         try:
-            for i, path in enumerate(file_paths):
+            bus.progress(run_id, "status", message=f"Probing {num_files} video file(s)...")
+            probe_start = time.perf_counter()
+            probes = schedule_videos(probe_videos(file_paths), schedule_policy)
+            file_paths = [p["path"] for p in probes]
+            frame_progress = FrameProgress(probes)
+            print(f"Probed {num_files} video(s) in {time.perf_counter() - probe_start:.2f}s: {frame_progress.total_frames:.0f} frames, "
+                  f"order '{schedule_policy}': {', '.join(p['name'] for p in probes)}")
+
+            if fill_budget_s:
+                metrics_by_path = {}
+                fill_scores = [] # Samples of all files, interleaved; drained into scores_by_file as files finish
+                fill_features = {}
+                fill_shots = {}
+                scores_by_file = defaultdict(list)
+                features_by_file = defaultdict(dict)
+
+                def on_file_done(path, local_people, local_other, error):
+                    nonlocal processed_count
+                    base_name = os.path.basename(path)
+                    if error is None:
+                        all_people_local.extend(local_people)
+                        all_other_local.extend(local_other)
+                        if local_people: local_moment_counts["People"] += len(local_people)
+                        for _, _, label, _ in local_other: local_moment_counts[label] += 1
+                        processed_count += 1
+                    else:
+                        video_errors_local.append((base_name, str(error)))
+                    video_metrics_local.append(metrics_by_path[path])
+                    for sample in fill_scores: # Group once per sample, not once per file
+                        scores_by_file[sample[0]].append(sample)
+                    fill_scores.clear()
+                    for key, value in fill_features.items():
+                        features_by_file[key[0]][key] = value
+                    fill_features.clear()
+                    bus.post("video_file_done", run_id, name=base_name, people=local_people, other=local_other,
+                             metrics=metrics_by_path[path], errors=list(video_errors_local), done=len(video_metrics_local), total=num_files,
+                             scores=scores_by_file.pop(base_name, []), features=features_by_file.pop(base_name, {}),
+                             shots={base_name: fill_shots[base_name]} if base_name in fill_shots else {})
+
+                def on_progress(path, analyzed_until_s, usable_s):
+                    bus.progress(run_id, "status", message=f"Fill budget: {self._format_time(usable_s)} / {self._format_time(fill_budget_s)} "
+                                                           f"of clips found (analyzed up to {self._format_time(analyzed_until_s)} per file)...",
+                                 fraction=min(1.0, usable_s / fill_budget_s))
+
+                detect_video_moments_fill_budget(
+                    file_paths, beat_duration_s, fill_budget_s, style, preset_name=preset_name, metrics_by_path=metrics_by_path,
+                    on_file_done=on_file_done, on_progress=on_progress, should_stop=lambda: run_id != self.processing_id,
+                    decode_backend=decode_backend, sample_scores=fill_scores, moment_features=fill_features, shot_boundaries=fill_shots)
+
+            for i, path in enumerate(file_paths if not fill_budget_s else []):
                  # Check for cancellation before processing each file
                 if run_id != self.processing_id:
                     print(f"Video run {run_id} cancelled before file {i+1}/{num_files}.")
@@ -1081,16 +1426,32 @@ class VideoAnalysisApp:
 
                 video_start_time = time.perf_counter()
                 base_name = os.path.basename(path)
-                # Update UI status
-                self.root.after(0, self.update_ui_status, f"Video {i+1}/{num_files}: Analyzing {base_name}...")
 
+                def on_frames(frames_decoded, i=i, base_name=base_name):
+                    # Update UI status with frame-based progress / ETA
+                    frame_progress.update(frames_decoded)
+                    eta_s = frame_progress.eta_s()
+                    eta_str = f" | ETA {self._format_time(eta_s)}" if eta_s is not None else ""
+                    bus.progress(run_id, "status", message=f"Video {i+1}/{num_files}: Analyzing {base_name}... "
+                                                           f"{100.0 * frame_progress.fraction():.0f}%{eta_str}",
+                                 fraction=frame_progress.fraction())
+                on_frames(0)
+
+                file_metrics = RunMetrics(base_name)
+                video_metrics_local.append(file_metrics)
+                file_scores = []
+                file_features = {}
+                file_shots = {}
                 try:
                     # Video detection HERE
-                    local_people, local_other = detect_video_moments(path, beat_duration_s)
+                    local_people, local_other = detect_video_moments(path, beat_duration_s, preset_name=preset_name, metrics=file_metrics, on_progress=on_frames,
+                                                                     decode_backend=decode_backend, sample_scores=file_scores,
+                                                                     moment_features=file_features, shot_boundaries=file_shots)
 
                     video_end_time = time.perf_counter()
                     video_duration = video_end_time - video_start_time
                     print(f"--- Processed '{base_name}' in {video_duration:.2f}s ({len(local_people)} P, {len(local_other)} O clips) ---")
+                    print(f"    Stages: {file_metrics.summary_line()}")
 
                     # Append results to local lists
                     all_people_local.extend(local_people)
@@ -1111,6 +1472,12 @@ class VideoAnalysisApp:
                     tb_str = traceback.format_exc()
                     print(f"--- FAILED processing '{base_name}': {err_str} ---\n{tb_str}")
                     video_errors_local.append((base_name, err_str))
+                    local_people, local_other = [], []
+
+                frame_progress.file_done(path)
+                bus.post("video_file_done", run_id, name=base_name, people=local_people, other=local_other,
+                         metrics=file_metrics, errors=list(video_errors_local), done=i + 1, total=num_files, scores=file_scores,
+                         features=file_features, shots=file_shots)
 
 
             # Loop finished,
@@ -1119,29 +1486,15 @@ class VideoAnalysisApp:
                 print(f"Video run {run_id} cancelled after loop completion.")
                 return
 
-            overall_end_time = time.perf_counter()
-            self.video_analysis_s = overall_end_time - overall_start_time
-            print(f"--- Video processing loop finished in {self.video_analysis_s:.2f}s ---")
-
-            # Update main state variables
-            self.people_moments = all_people_local
-            self.other_scene_moments = all_other_local
-            self.moment_counts = local_moment_counts
-            self.video_errors = video_errors_local
-
-            # Set video_processed flag: True if analysis ran, even with errors, as long as some clips were found
-            self.video_processed = bool(all_people_local or all_other_local or not video_errors_local)
-
-
-            # Appropriate UI callback
+            payload = results()
+            print(f"--- Video processing loop finished in {payload['analysis_s']:.2f}s (preset '{preset_name}') ---")
             if not video_errors_local:
                 print("Video processing fully successful.")
-                self.root.after(0, self._on_video_processing_complete, run_id)
             else:
                 # If finished with errors
                 print(f"Video processing finished with {len(video_errors_local)} error(s). Processed {processed_count}/{num_files} files.")
-                print(f" Found clips: {bool(all_people_local or all_other_local)}. video_processed flag set to: {self.video_processed}")
-                self.root.after(0, self._on_video_processing_partial_success, video_errors_local, run_id)
+                print(f" Found clips: {bool(all_people_local or all_other_local)}.")
+            bus.post("video_done", run_id, **payload)
 
         except Exception as e: # Catches errors outside the per-file loop
              # Check for cancellation again
@@ -1149,30 +1502,96 @@ class VideoAnalysisApp:
                 print(f"Video run {run_id} cancelled during overall error handling.")
                 return
 
-            overall_end_time = time.perf_counter()
-            if 'overall_start_time' in locals():
-                self.video_analysis_s = overall_end_time - overall_start_time
-                print(f"--- Video processing FAILED critically after {self.video_analysis_s:.2f}s ---")
-            else:
-                print(f"--- Video processing FAILED critically (timing error) ---")
-                self.video_analysis_s = None
-
             # Preserve data collected before critical error
-            self.people_moments = all_people_local
-            self.other_scene_moments = all_other_local
-            self.moment_counts = local_moment_counts
-            self.video_errors = video_errors_local
-            # Add critical error
-            self.video_errors.append( ("Overall Processing", str(e)) )
-            # Mark as not successfully processed overall
-            self.video_processed = False
+            payload = results(error=str(e), traceback_str=traceback.format_exc())
+            print(f"--- Video processing FAILED critically after {payload['analysis_s']:.2f}s ---")
+            print(f"Video Processing Critical Error: {e}\n{payload['traceback_str']}")
+
+            # critical error event
+            bus.post("video_error", run_id, **payload)
+
+
+    # Worker events (applied on the Tk thread by TkEventPump)
+    def _handle_progress_event(self, run_id, key, message=None, fraction=None, **_):
+        """Shows the newest progress of the current run (older updates were coalesced by the bus)."""
+        if run_id != self.processing_id or not self.is_processing: return
+        if fraction is not None:
+            self.set_progress(1000.0 * fraction, 1000)
+        if message is None: return
+        if self.summary_sections: # Summary is shown - only replace its status line
+            self._set_summary_section("status", [(message + "\n", "bold")])
+        else:
+            self.update_ui_status(message)
 
-            tb_str = traceback.format_exc()
-            print(f"Video Processing Critical Error: {e}\n{tb_str}")
+    def _handle_video_file_done_event(self, run_id, name, people, other, metrics, errors, done, total, scores=(), features=None, shots=None):
+        """Appends one finished file to the summary and the moments list while the run continues."""
+        if run_id != self.processing_id: return # Ignore if cancelled
+        self.video_metrics.append(metrics)
+        self.sample_scores.extend(scores)
+        self.moment_features.update(features or {})
+        self.shot_boundaries.update(shots or {})
+        self.video_errors = errors
+        if people: self.moment_counts["People"] += len(people)
+        for _, _, label, _ in other: self.moment_counts[label] += 1
+        self._add_moment_tree_file(name, people + other)
+        self._update_summary_display()
 
-            # critical error callback
-            self.root.after(0, self._on_video_processing_error, e, tb_str, run_id)
+    def _handle_plan_ready_event(self, generation, selected_style, result, planner=None, planner_key=None):
+        self._on_plan_ready(selected_style, result, generation, planner, planner_key)
 
+    def _handle_audio_done_event(self, run_id, analysis_s, preset_name, metrics, bpm, beat_duration_s, offset_s, duration_s):
+        """Stores the audio analysis results and updates the UI."""
+        if run_id != self.processing_id: return # Ignore if cancelled
+        self.audio_analysis_s = analysis_s
+        self.audio_preset_used = preset_name
+        self.audio_metrics = metrics
+        self.bpm = bpm
+        self.beat_duration_s = beat_duration_s
+        self.audio_offset_s = offset_s
+        self.audio_duration_s = duration_s
+        self.audio_processed = True
+        self._on_audio_analysis_complete(run_id)
+
+    def _handle_audio_error_event(self, run_id, error, traceback_str, analysis_s):
+        """Resets the audio state after a failed analysis and reports the error."""
+        if run_id != self.processing_id: return # Ignore if cancelled
+        self.audio_analysis_s = analysis_s
+        self.audio_processed = False
+        self.bpm = None
+        self.beat_duration_s = None
+        self.audio_offset_s = 0.0
+        self.audio_duration_s = None
+        self._on_audio_analysis_error(error, traceback_str, run_id)
+
+    def _apply_video_results(self, analysis_s, preset_name, people_moments, other_scene_moments, moment_counts, errors, metrics):
+        self.video_analysis_s = analysis_s
+        self.video_preset_used = preset_name
+        self.people_moments = people_moments
+        self.other_scene_moments = other_scene_moments
+        self.moment_counts = moment_counts
+        self.video_errors = list(errors)
+        self.video_metrics = list(metrics)
+
+    def _handle_video_done_event(self, run_id, **results):
+        """Stores the video analysis results and updates the UI (full or partial success)."""
+        if run_id != self.processing_id: return # Ignore if cancelled
+        self._apply_video_results(**results)
+        # Set video_processed flag: True if analysis ran, even with errors, as long as some clips were found
+        self.video_processed = bool(self.people_moments or self.other_scene_moments or not self.video_errors)
+        if not self.video_errors:
+            self._on_video_processing_complete(run_id)
+        else:
+            print(f"UI: video_processed flag set to: {self.video_processed}")
+            self._on_video_processing_partial_success(self.video_errors, run_id)
+
+    def _handle_video_error_event(self, run_id, error, traceback_str, **results):
+        """Stores the results collected before a critical video failure and reports the error."""
+        if run_id != self.processing_id: return # Ignore if cancelled
+        self._apply_video_results(**results)
+        # Add critical error, mark as not successfully processed overall
+        self.video_errors.append(("Overall Processing", error))
+        self.video_processed = False
+        self._on_video_processing_error(error, traceback_str, run_id)
 
     # Callbacks from Threads
     def _on_audio_analysis_complete(self, run_id):
@@ -1203,7 +1622,7 @@ class VideoAnalysisApp:
 
         print("UI: Audio analysis error callback.")
         self.is_processing = False
-        # State variables should have been reset in the worker thread's except block
+        # State variables were reset by _handle_audio_error_event
         self.stop_progress()
         # Show error message box
         messagebox.showerror("Audio Error", f"Audio analysis failed:\n{error}\n\nDetails logged to console.")
@@ -1246,7 +1665,7 @@ class VideoAnalysisApp:
 
         print("UI: Video processing critical error callback.")
         self.is_processing = False
-        # State variables (video_processed=False) should be set in worker thread
+        # State variables (video_processed=False) were set by _handle_video_error_event
         self.stop_progress()
         # Show error message box
         messagebox.showerror("Video Processing Error", f"Video processing failed critically:\n{error}\n\nDetails logged to console.")
@@ -1263,8 +1682,42 @@ class VideoAnalysisApp:
         self.check_button_states()
 
 
+def parse_args(argv=None):
+    """Parses command line options for launching the app."""
+    parser = argparse.ArgumentParser(description=WINDOW_TITLE)
+    parser.add_argument("--preset", choices=list(ANALYSIS_PRESETS), default=DEFAULT_ANALYSIS_PRESET,
+                        help="Analysis preset to preselect (speed vs. quality trade-off)")
+    parser.add_argument("--fill-budget", action="store_true",
+                        help="Preselect fill-budget mode (stop video analysis once enough clips are found for the song)")
+    parser.add_argument("--schedule", choices=SCHEDULE_POLICIES, default=DEFAULT_SCHEDULE_POLICY,
+                        help="Order in which video files are analyzed (by probed frame count)")
+    parser.add_argument("--decoder", choices=DECODE_BACKENDS, default=DEFAULT_DECODE_BACKEND,
+                        help="Video decode backend (ffmpeg samples and downscales in a subprocess, needs ffmpeg on PATH; "
+                             "opencv_process decodes in a separate process)")
+    parser.add_argument("--cores", type=int, default=None,
+                        help="CPU core budget for decoding and inference threads (default: the split saved by "
+                             "benchmark_throughput --thread-sweep, else all cores)")
+    parser.add_argument("--thread-split", default=None,
+                        help="Thread split file saved by benchmark_throughput --thread-sweep (default: the per-user file)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile each analysis run (cProfile + collapsed stacks for flamegraphs)")
+    parser.add_argument("--profile-dir", default=None,
+                        help="Directory for profile files (default: a profiles folder next to the exported metrics report)")
+    return parser.parse_args(argv)
+
+
 # Main Execution
 if __name__ == "__main__":
+    multiprocessing.freeze_support() # Decoder processes in the bundled .EXE
+    args = parse_args()
+    # Files are analyzed one at a time, so the measured single-worker split sets the core budget
+    saved_split = load_thread_split(args.thread_split) if args.cores is None else None
+    cores = saved_split["total"] if saved_split else args.cores
+    budget = split_thread_budget(cores, separate_decoder=args.decoder != "opencv")
+    apply_thread_budget(budget)
+    print(f"Thread budget{' (measured)' if saved_split else ''}: {format_thread_budget(budget)}")
+    set_profiling(args.profile or profiling_enabled(), output_dir=args.profile_dir)
     root = tk.Tk()
-    app = VideoAnalysisApp(root)
+    app = VideoAnalysisApp(root, analysis_preset=args.preset, fill_budget=args.fill_budget, schedule_policy=args.schedule,
+                           decode_backend=args.decoder)
     root.mainloop()
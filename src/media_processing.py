@@ -2,18 +2,40 @@ import librosa
 import numpy as np
 import cv2
 import os
+import time
 import traceback
 
 # Import utilities and config
 from config import (
     MEDIAPIPE_FRAME_CHECK_INTERVAL_SEC, MEDIAPIPE_MERGE_THRESHOLD_FACTOR,
-    METHOD_MEDIAPIPE, AUDIO_TRIM_TOP_DB # METHOD_MEDIAPIPE unused for now - check config.py
+    METHOD_MEDIAPIPE, AUDIO_TRIM_TOP_DB, # METHOD_MEDIAPIPE unused for now - check config.py
+    ANALYSIS_PRESETS, DEFAULT_ANALYSIS_PRESET, DEFAULT_FPS, FILL_BUDGET_SLICE_SEC, VIDEO_PROGRESS_INTERVAL_SEC,
+    VIDEO_INDEX_ENABLED, DEFAULT_DECODE_BACKEND, VISUAL_FEATURES_ENABLED,
+    SHOT_DETECTION_ENABLED, SHOT_SAMPLE_INTERVAL_SEC, SHOT_SNAP_TOLERANCE_FACTOR
 )
-from mediapipe_utils import classify_frame_mediapipe, load_object_detector
-
-def get_bpm_and_offset(audio_path):
+from mediapipe_utils import score_frame_mediapipe, best_category, segment_label, load_object_detector, OBJECT_DETECTORS
+from run_metrics import RunMetrics
+from clip_planning import ClipPlanner
+from video_index import load_or_build_index
+from video_probe import probe_video, sample_step_frames
+from ffmpeg_decoder import FfmpegFrameReader, ffmpeg_available, output_size
+from frame_ring import RingFrameReader
+from frame_features import FrameFeatures, aggregate_moment_features
+from shot_detection import ShotDetector, snap_moment_starts
+
+def get_analysis_preset(preset_name):
+    """Returns the settings dict for an analysis preset name, falling back to the default preset."""
+    if preset_name not in ANALYSIS_PRESETS:
+        if preset_name is not None:
+            print(f"Warning: Unknown analysis preset '{preset_name}', using '{DEFAULT_ANALYSIS_PRESET}'.")
+        preset_name = DEFAULT_ANALYSIS_PRESET
+    return ANALYSIS_PRESETS[preset_name]
+
+def get_bpm_and_offset(audio_path, sample_rate=None, metrics=None):
     """
     Estimates BPM, detects audio start offset, and gets total duration using librosa.
+    sample_rate: load rate passed to librosa (None = native rate). Lower rates are faster but less precise.
+    metrics: optional RunMetrics that receives per-stage timings (load, trim, onset, beat_track, tempo_fallback).
 
     Returns:
         tuple: (estimated_tempo, beat_duration, start_offset_sec, total_audio_duration_sec)
@@ -26,26 +48,34 @@ def get_bpm_and_offset(audio_path):
     total_audio_duration_sec = None
     y = None
     sr = None
+    if metrics is None:
+        metrics = RunMetrics(os.path.basename(audio_path), kind="audio")
 
     try:
-        print("  Loading audio...")
-        y, sr = librosa.load(audio_path, sr=None)
-        # Get total duration immediately after loading
-        total_audio_duration_sec = librosa.get_duration(y=y, sr=sr)
+        print(f"  Loading audio (sr={sample_rate or 'native'})...")
+        with metrics.stage("load"):
+            y, sr = librosa.load(audio_path, sr=sample_rate)
+            # Get total duration immediately after loading
+            total_audio_duration_sec = librosa.get_duration(y=y, sr=sr)
+        metrics.media_duration_s = total_audio_duration_sec
+        metrics.count("samples_decoded", len(y))
         print(f"  Total Audio Duration: {total_audio_duration_sec:.3f} sec")
 
         print("  Trimming silence...")
-        y_trimmed, index = librosa.effects.trim(y, top_db=AUDIO_TRIM_TOP_DB)
+        with metrics.stage("trim"):
+            y_trimmed, index = librosa.effects.trim(y, top_db=AUDIO_TRIM_TOP_DB)
         if index.size > 0 and index[0] > 0:
             start_offset_sec = librosa.samples_to_time(index[0], sr=sr)
         print(f"  Audio Start Offset: {start_offset_sec:.3f} sec")
 
         print("  Analyzing rhythm...")
-        onset_env = librosa.onset.onset_strength(y=y, sr=sr)
+        with metrics.stage("onset"):
+            onset_env = librosa.onset.onset_strength(y=y, sr=sr)
 
         print("  Tracking beats...")
         # Use the original 'y' for beat tracking as trimming might affect stability
-        estimated_tempo_val, beats = librosa.beat.beat_track(y=y, sr=sr, onset_envelope=onset_env)
+        with metrics.stage("beat_track"):
+            estimated_tempo_val, beats = librosa.beat.beat_track(y=y, sr=sr, onset_envelope=onset_env)
 
         if estimated_tempo_val is not None:
             if isinstance(estimated_tempo_val, (np.ndarray, list)) and len(estimated_tempo_val) > 0:
@@ -74,7 +104,8 @@ def get_bpm_and_offset(audio_path):
         if tempo is None:
             print("  Using feature.rhythm.tempo fallback...")
             # Consider using y_trimmed here if initial silence is very long? Test needed.
-            tempo_estimates = librosa.feature.rhythm.tempo(y=y, sr=sr, onset_envelope=onset_env)
+            with metrics.stage("tempo_fallback"):
+                tempo_estimates = librosa.feature.rhythm.tempo(y=y, sr=sr, onset_envelope=onset_env)
             if tempo_estimates is not None and len(tempo_estimates) > 0:
                 tempo = float(tempo_estimates[0])
                 print(f"  Tempo from feature.rhythm.tempo: {tempo:.2f}")
@@ -86,6 +117,7 @@ def get_bpm_and_offset(audio_path):
             beat_duration_sec = 60.0 / raw_tempo
             print(f"  Final Est. BPM: {raw_tempo:.2f} (Rounded: {estimated_tempo_rounded})")
             print(f"  Beat Duration: {beat_duration_sec:.4f} sec")
+            metrics.finish()
             return raw_tempo, beat_duration_sec, start_offset_sec, total_audio_duration_sec
         else:
             err_msg = "Could not estimate a valid BPM."
@@ -98,117 +130,480 @@ def get_bpm_and_offset(audio_path):
         # Re-raise exception for the main thread to handle UI feedback
         raise Exception(f"Audio analysis failed for {os.path.basename(audio_path)}: {e}")
 
-def _detect_scenes_mediapipe(video_path, detector):
-    """Internal helper: Detects scene segments using MediaPipe. Returns [(start, end, label, fname), ...]."""
-    base_name = os.path.basename(video_path)
-    if detector is None:
-        # Safety check
-        raise ValueError("MediaPipe detector is not loaded.")
-
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        raise IOError(f"Could not open video: {base_name}")
-
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    if fps <= 0:
-        cap.release()
-        raise ValueError(f"Invalid FPS ({fps}) for video: {base_name}")
-
-    # Determine how often to check frames and the time threshold for merging segments
-    frame_interval_frames = max(1, int(fps * MEDIAPIPE_FRAME_CHECK_INTERVAL_SEC))
-    merge_threshold_seconds = MEDIAPIPE_FRAME_CHECK_INTERVAL_SEC * MEDIAPIPE_MERGE_THRESHOLD_FACTOR
-
-    raw_moments = []
-    current_segment_start_time = 0.0
-    current_segment_label = None
-    last_processed_timestamp_sec = 0.0
-    frame_count = 0
-
-    try:
-        ret, first_frame = cap.read()
-        if not ret:
-            raise IOError(f"Cannot read first frame of video: {base_name}")
-
-        # Classify the first frame to initialize the state
-        initial_label = classify_frame_mediapipe(first_frame, detector)
-        current_segment_label = initial_label
-        frame_count = 1
-
-        # Process video frame by frame (or at intervals)
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break # End of video
-
-            current_msec = cap.get(cv2.CAP_PROP_POS_MSEC)
-            # Ensure timestamp progresses even if MSEC doesn't update reliably
-            current_timestamp_sec = max(last_processed_timestamp_sec + (1.0 / fps if fps > 0 else 0.01), current_msec / 1000.0)
-
-            # Check frame at the specified interval
-            if frame_count % frame_interval_frames == 0:
-                label = classify_frame_mediapipe(frame, detector)
-
-                # Check if the label has changed
-                if label != current_segment_label:
-                    segment_end_time = current_timestamp_sec
+class _SceneScanner:
+    """
+    Resumable MediaPipe scene scan of one video. scan(until_s) classifies frames up to a timestamp and can be
+    called again to continue, so several files can be analyzed in time slices; a single scan() covers the whole file.
+    Per-stage timings (index, open_probe, decode, preprocess, inference, features, shots, segmentation, merge, shot_snap) and 'frames_decoded' /
+    'frames_classified' counters are recorded into the RunMetrics.
+    With use_index, frame timestamps come from the file's keyframe/PTS index (video_index.py) and frames between
+    samples are skipped with keyframe seeks where possible; without an index (no ffprobe) the file is decoded
+    sequentially with OpenCV's timestamps. Frames that are neither classified nor checked for cuts are only grabbed.
+    """
+    def __init__(self, video_path, detector, frame_check_interval_sec=MEDIAPIPE_FRAME_CHECK_INTERVAL_SEC, inference_width=None, metrics=None,
+                 use_index=VIDEO_INDEX_ENABLED):
+        self._init_state(video_path, detector, frame_check_interval_sec, inference_width, metrics)
+        if use_index:
+            with self.metrics.stage("index"):
+                index = load_or_build_index(video_path)
+            if index is not None and len(index):
+                self.index = index
+                self.frame_times = index.pts.tolist()
+                self.metrics.count("index_frames", len(index))
+
+        with self.metrics.stage("open_probe"):
+            self.cap = cv2.VideoCapture(video_path)
+            if not self.cap.isOpened():
+                raise IOError(f"Could not open video: {self.base_name}")
+
+            self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+            total_frames = self.cap.get(cv2.CAP_PROP_FRAME_COUNT)
+            if self.fps <= 0:
+                self.cap.release()
+                raise ValueError(f"Invalid FPS ({self.fps}) for video: {self.base_name}")
+            if total_frames and total_frames > 0:
+                self.metrics.media_duration_s = total_frames / self.fps
+
+        # Determine how often to check frames (classification, cuts)
+        self.frame_interval_frames = sample_step_frames(self.fps, frame_check_interval_sec)
+        self.shot_interval_frames = sample_step_frames(self.fps, SHOT_SAMPLE_INTERVAL_SEC)
+
+    def _init_state(self, video_path, detector, frame_check_interval_sec, inference_width, metrics):
+        """Sets up the scan state shared by all decode backends; the constructors only add opening/probing the source."""
+        self.video_path = video_path
+        self.base_name = os.path.basename(video_path)
+        if detector is None:
+            # Safety check
+            raise ValueError("MediaPipe detector is not loaded.")
+        self.detector = detector
+        self.inference_width = inference_width
+        self.metrics = metrics if metrics is not None else RunMetrics(self.base_name)
+
+        self.index = None # VideoIndex of the file (keyframe seeks), see video_index.py
+        self.frame_times = None # Per-frame timestamps from the index
+        self.frames_seeked = 0 # Frames skipped by keyframe seeks (never decoded)
+        self.merge_threshold_seconds = frame_check_interval_sec * MEDIAPIPE_MERGE_THRESHOLD_FACTOR
+
+        self.sample_scores = None # List to collect (fname, time_s, score vector) per classified sample, see _open_scanner
+        self.features = FrameFeatures() if VISUAL_FEATURES_ENABLED else None
+        self.sample_features = [] # (time_s, sharpness, motion, brightness) per classified sample
+        self.shots = ShotDetector() if SHOT_DETECTION_ENABLED else None
+        self.snap_tolerance_s = frame_check_interval_sec * SHOT_SNAP_TOLERANCE_FACTOR
+        self.shot_s = 0.0
+        self.raw_moments = []
+        self.current_segment_start_time = 0.0
+        self.current_segment_label = None
+        self.last_processed_timestamp_sec = 0.0
+        self.frame_count = 0 # Decoded frames (piped, sampled frames for the process backends)
+        self.decode_s = 0.0
+        self.segmentation_s = 0.0
+        self.finished = False # End of video reached
+        self.released = False
+
+    def scan(self, until_s=None):
+        """Classifies frames until the timestamp reaches until_s (None = end of video). Returns True at the end of the video."""
+        cap = self.cap
+        fps = self.fps
+        detector = self.detector
+        inference_width = self.inference_width
+        metrics = self.metrics
+        base_name = self.base_name
+        frame_interval_frames = self.frame_interval_frames
+        shots = self.shots
+        shot_interval_frames = self.shot_interval_frames
+        perf_counter = time.perf_counter
+        decode_s = 0.0
+        segmentation_s = 0.0
+        shot_s = 0.0
+        raw_moments = self.raw_moments
+        sample_scores = self.sample_scores
+        features = self.features
+        sample_features = self.sample_features
+        current_segment_start_time = self.current_segment_start_time
+        current_segment_label = self.current_segment_label
+        last_processed_timestamp_sec = self.last_processed_timestamp_sec
+        frame_count = self.frame_count
+        frame_times = self.frame_times
+        num_frame_times = len(frame_times) if frame_times is not None else 0
+        index = self.index if self.index is not None and len(self.index.keyframes) else None # Seeks need keyframe data
+        frames_seeked = 0
+
+        try:
+            if frame_count == 0:
+                t0 = perf_counter()
+                ret, first_frame = cap.read()
+                decode_s += perf_counter() - t0
+                if not ret:
+                    raise IOError(f"Cannot read first frame of video: {base_name}")
+                if shots is not None:
+                    t0 = perf_counter()
+                    shots.add(0.0, first_frame)
+                    shot_s += perf_counter() - t0
+
+                # Classify the first frame to initialize the state
+                scores = score_frame_mediapipe(first_frame, detector, inference_width, metrics, features=features)
+                current_segment_label = best_category(scores)
+                if sample_scores is not None:
+                    sample_scores.append((base_name, 0.0, scores))
+                if features is not None and features.last is not None:
+                    sample_features.append((0.0,) + features.last)
+                frame_count = 1
+
+            # Process video frame by frame (or at intervals)
+            while until_s is None or last_processed_timestamp_sec < until_s:
+                classify = frame_count % frame_interval_frames == 0
+                check_shot = shots is not None and frame_count % shot_interval_frames == 0
+                if index is not None and not (classify or check_shot):
+                    # Jump to the keyframe before the next classified / cut-checked frame if that skips enough frames
+                    next_frame = -(-frame_count // frame_interval_frames) * frame_interval_frames
+                    if shots is not None:
+                        next_frame = min(next_frame, -(-frame_count // shot_interval_frames) * shot_interval_frames)
+                    t0 = perf_counter()
+                    position = index.seek_forward(cap, frame_count, next_frame)
+                    decode_s += perf_counter() - t0
+                    if position != frame_count:
+                        frames_seeked += position - frame_count
+                        frame_count = position
+                        continue
+
+                t0 = perf_counter()
+                if classify or check_shot:
+                    ret, frame = cap.read()
+                else:
+                    ret, frame = cap.grab(), None # Decode forward without converting the frame
+                decode_s += perf_counter() - t0
+                if not ret:
+                    self.finished = True
+                    break # End of video
+
+                if frame_count < num_frame_times:
+                    current_timestamp_sec = frame_times[frame_count] # True presentation time of this frame
+                else:
+                    current_msec = cap.get(cv2.CAP_PROP_POS_MSEC)
+                    # Ensure timestamp progresses even if MSEC doesn't update reliably
+                    current_timestamp_sec = max(last_processed_timestamp_sec + (1.0 / fps if fps > 0 else 0.01), current_msec / 1000.0)
+
+                if check_shot:
+                    t0 = perf_counter()
+                    shots.add(current_timestamp_sec, frame)
+                    shot_s += perf_counter() - t0
+
+                # Check frame at the specified interval
+                if classify:
+                    scores = score_frame_mediapipe(frame, detector, inference_width, metrics, features=features)
+                    label = segment_label(scores, current_segment_label)
+                    if sample_scores is not None:
+                        sample_scores.append((base_name, current_timestamp_sec, scores))
+                    if features is not None and features.last is not None:
+                        sample_features.append((current_timestamp_sec,) + features.last)
+
+                    # Check if the label has changed
+                    t0 = perf_counter()
+                    if label != current_segment_label:
+                        segment_end_time = current_timestamp_sec
+                        # Record the previous segment if it was NOT 'Other'
+                        if current_segment_label != 'Other' and current_segment_label is not None:
+                            if segment_end_time > current_segment_start_time:
+                                raw_moments.append((current_segment_start_time, segment_end_time, current_segment_label, base_name))
+                        # Start a new segment
+                        current_segment_start_time = segment_end_time
+                        current_segment_label = label
+                    segmentation_s += perf_counter() - t0
+
+                last_processed_timestamp_sec = current_timestamp_sec
+                frame_count += 1
+        finally:
+            self.current_segment_start_time = current_segment_start_time
+            self.current_segment_label = current_segment_label
+            self.last_processed_timestamp_sec = last_processed_timestamp_sec
+            self.frame_count = frame_count
+            self.frames_seeked += frames_seeked
+            self.decode_s += decode_s
+            self.segmentation_s += segmentation_s
+            self.shot_s += shot_s
+        return self.finished
+
+    def moments_so_far(self):
+        """Merged segments closed so far (the open segment is not included)."""
+        return self._snap_to_shots(_merge_segments(self.raw_moments, self.merge_threshold_seconds))
+
+    def shot_boundaries(self):
+        """Sorted array of the camera cuts found so far (seconds), empty if shot detection is disabled."""
+        return self.shots.boundaries() if self.shots is not None else np.empty(0, dtype=np.float64)
+
+    def _snap_to_shots(self, moments):
+        if self.shots is None:
+            return moments
+        return snap_moment_starts(moments, self.shot_boundaries(), self.snap_tolerance_s)
+
+    def features_for(self, moments):
+        """Visual features of moments of this file, {(fname, start, end): {...}} (see frame_features.aggregate_moment_features)."""
+        return aggregate_moment_features(moments, self.sample_features)
+
+    def release(self):
+        """Releases the capture and records decode/segmentation totals (idempotent)."""
+        if self.released:
+            return
+        self.released = True
+        self.metrics.add_time("decode", self.decode_s)
+        self.metrics.add_time("segmentation", self.segmentation_s)
+        if self.shots is not None:
+            self.metrics.add_time("shots", self.shot_s)
+        self.metrics.count("frames_decoded", self.frames_done() - self.frames_seeked)
+        if self.frames_seeked:
+            self.metrics.count("frames_seeked", self.frames_seeked)
+        self._close_source()
+
+    def frames_done(self):
+        """Source frames covered so far (decoded or skipped by keyframe seeks)."""
+        return self.frame_count
+
+    def _close_source(self):
+        self.cap.release()
+
+    def finish(self):
+        """Closes the open segment (up to the last analyzed frame), releases the capture and returns the merged moments."""
+        # Record the very last segment if it wasn't 'Other'
+        final_timestamp = self.last_processed_timestamp_sec
+        if self.current_segment_label != 'Other' and self.current_segment_label is not None:
+            if final_timestamp > self.current_segment_start_time:
+                self.raw_moments.append((self.current_segment_start_time, final_timestamp, self.current_segment_label, self.base_name))
+        self.current_segment_label = None
+        self.release()
+
+        self.metrics.analyzed_duration_s = final_timestamp
+        if not self.metrics.media_duration_s:
+            self.metrics.media_duration_s = final_timestamp # No frame count from the container
+
+        if not self.raw_moments:
+            return [] # Return empty list if no relevant segments found
+
+        with self.metrics.stage("merge"):
+            moments = _merge_segments(self.raw_moments, self.merge_threshold_seconds)
+        if self.shots is None:
+            return moments
+        with self.metrics.stage("shot_snap"):
+            boundaries = self.shot_boundaries()
+            self.metrics.count("shot_boundaries", len(boundaries))
+            return snap_moment_starts(moments, boundaries, self.snap_tolerance_s)
+
+class _FfmpegSceneScanner(_SceneScanner):
+    """
+    _SceneScanner on the ffmpeg decode backend: ffmpeg drops frames to the classification interval and scales
+    them to the model input size, so every piped frame is classified and nothing is decoded in Python.
+    """
+    reader_class = FfmpegFrameReader
+
+    def __init__(self, video_path, detector, frame_check_interval_sec=MEDIAPIPE_FRAME_CHECK_INTERVAL_SEC, inference_width=None, metrics=None):
+        self._init_state(video_path, detector, frame_check_interval_sec, inference_width, metrics)
+        with self.metrics.stage("open_probe"):
+            info = probe_video(video_path)
+            if info["error"]:
+                raise IOError(f"Could not open video: {self.base_name}")
+            if not info["fps"] or not info["width"]:
+                raise ValueError(f"Invalid FPS ({info['fps']}) or frame size for video: {self.base_name}")
+            self.fps = info["fps"]
+            if info["duration_s"]:
+                self.metrics.media_duration_s = info["duration_s"]
+            out_width, out_height = output_size(info["width"], info["height"], inference_width)
+            self.reader = self.reader_class(video_path, 1.0 / frame_check_interval_sec, out_width, out_height)
+
+        self.frame_interval_frames = 1 # The decoder process already sampled
+
+    def scan(self, until_s=None):
+        """Classifies piped frames until the timestamp reaches until_s (None = end of video). Returns True at the end of the video."""
+        read = self.reader.read
+        detector = self.detector
+        metrics = self.metrics
+        base_name = self.base_name
+        raw_moments = self.raw_moments
+        sample_scores = self.sample_scores
+        features = self.features
+        shots = self.shots
+        perf_counter = time.perf_counter
+        try:
+            while until_s is None or self.last_processed_timestamp_sec < until_s:
+                t0 = perf_counter()
+                timestamp, frame = read()
+                self.decode_s += perf_counter() - t0
+                if frame is None:
+                    if self.frame_count == 0:
+                        raise IOError(f"Cannot read first frame of video: {base_name}")
+                    self.finished = True
+                    if metrics.media_duration_s: # Segments end at the last source frame, not the last sample
+                        self.last_processed_timestamp_sec = max(self.last_processed_timestamp_sec, metrics.media_duration_s - 1.0 / self.fps)
+                    break
+
+                if shots is not None:
+                    t0 = perf_counter()
+                    shots.add(timestamp, frame, rgb=True)
+                    self.shot_s += perf_counter() - t0
+                scores = score_frame_mediapipe(frame, detector, None, metrics, rgb=True, features=features)
+                label = segment_label(scores, self.current_segment_label)
+                if sample_scores is not None:
+                    sample_scores.append((base_name, timestamp, scores))
+                if features is not None and features.last is not None:
+                    self.sample_features.append((timestamp,) + features.last)
+                t0 = perf_counter()
+                if self.frame_count == 0:
+                    self.current_segment_label = label # First frame initializes the state
+                elif label != self.current_segment_label:
                     # Record the previous segment if it was NOT 'Other'
-                    if current_segment_label != 'Other' and current_segment_label is not None:
-                        if segment_end_time > current_segment_start_time:
-                            raw_moments.append((current_segment_start_time, segment_end_time, current_segment_label, base_name))
+                    if self.current_segment_label != 'Other' and self.current_segment_label is not None:
+                        if timestamp > self.current_segment_start_time:
+                            raw_moments.append((self.current_segment_start_time, timestamp, self.current_segment_label, base_name))
                     # Start a new segment
-                    current_segment_start_time = segment_end_time
-                    current_segment_label = label
-
-            last_processed_timestamp_sec = current_timestamp_sec
-            frame_count += 1
-
-        # Record the very last segment if it wasn't 'Other'
-        final_timestamp = last_processed_timestamp_sec
-        if current_segment_label != 'Other' and current_segment_label is not None:
-            if final_timestamp > current_segment_start_time:
-                raw_moments.append((current_segment_start_time, final_timestamp, current_segment_label, base_name))
-
+                    self.current_segment_start_time = timestamp
+                    self.current_segment_label = label
+                self.segmentation_s += perf_counter() - t0
+
+                self.last_processed_timestamp_sec = timestamp
+                self.frame_count += 1
+        except Exception:
+            self.release() # Surfaces ffmpeg's own error message if it failed to start
+            raise
+        return self.finished
+
+    def frames_done(self):
+        """Source frames covered so far (decoded inside ffmpeg)."""
+        return int(round(self.last_processed_timestamp_sec * self.fps)) + 1 if self.frame_count else 0
+
+    def _close_source(self):
+        self.metrics.count("frames_piped", self.frame_count)
+        self.reader.close()
+
+class _RingSceneScanner(_FfmpegSceneScanner):
+    """Sampled scan with OpenCV decoding in a separate process, frames are passed through a shared-memory ring (frame_ring.py)."""
+    reader_class = RingFrameReader
+
+def _open_scanner(video_path, detector, frame_check_interval_sec, inference_width, metrics, decode_backend=DEFAULT_DECODE_BACKEND,
+                  sample_scores=None):
+    """
+    Creates the scene scanner for a decode backend ('opencv', 'ffmpeg' or 'opencv_process', falls back to OpenCV if ffmpeg is missing).
+    If sample_scores is a list, (fname, time_s, score vector) of every classified sample is appended to it (see mediapipe_utils).
+    """
+    scanner_class = _SceneScanner
+    if decode_backend == "opencv_process":
+        scanner_class = _RingSceneScanner
+    elif decode_backend == "ffmpeg":
+        if ffmpeg_available():
+            scanner_class = _FfmpegSceneScanner
+        else:
+            print("Warning: ffmpeg not found, using the OpenCV decode backend.")
+    elif decode_backend != "opencv":
+        print(f"Warning: Unknown decode backend '{decode_backend}', using OpenCV.")
+    scanner = scanner_class(video_path, detector, frame_check_interval_sec, inference_width, metrics)
+    scanner.sample_scores = sample_scores
+    return scanner
+
+def _detect_scenes_mediapipe(video_path, detector, frame_check_interval_sec=MEDIAPIPE_FRAME_CHECK_INTERVAL_SEC, inference_width=None, metrics=None, on_progress=None,
+                             decode_backend=DEFAULT_DECODE_BACKEND, sample_scores=None, moment_features=None, shot_boundaries=None):
+    """
+    Internal helper: Detects scene segments using MediaPipe. Returns [(start, end, label, fname), ...].
+    If a RunMetrics is given, per-stage timings (open_probe, decode, preprocess, inference, segmentation, merge)
+    and 'frames_decoded' / 'frames_classified' counters are recorded into it.
+    on_progress(frames_decoded) is called every VIDEO_PROGRESS_INTERVAL_SEC of video, if given.
+    decode_backend selects OpenCV or ffmpeg decoding, per-sample score vectors are appended to sample_scores (see _open_scanner).
+    The visual features of the returned moments are added to the moment_features dict, if given.
+    Moment starts are snapped to camera cuts; the file's cut array is stored in shot_boundaries[fname], if given.
+    """
+    scanner = _open_scanner(video_path, detector, frame_check_interval_sec, inference_width, metrics, decode_backend, sample_scores)
+    try:
+        if on_progress is None:
+            scanner.scan()
+        else:
+            until_s = VIDEO_PROGRESS_INTERVAL_SEC
+            while not scanner.scan(until_s):
+                on_progress(scanner.frames_done())
+                until_s += VIDEO_PROGRESS_INTERVAL_SEC
+            on_progress(scanner.frames_done())
     finally:
-        # Ensure video capture is released
-        cap.release()
+        scanner.release() # Ensure video capture is released
+    moments = scanner.finish()
+    if moment_features is not None:
+        moment_features.update(scanner.features_for(moments))
+    if shot_boundaries is not None:
+        shot_boundaries[scanner.base_name] = scanner.shot_boundaries()
+    return moments
 
+
+def _merge_segments(raw_moments, merge_threshold_seconds):
+    """Merges adjacent segments of the same label whose gap is <= merge_threshold_seconds. Returns a new sorted list."""
     if not raw_moments:
-        return [] # Return empty list if no relevant segments found
+        return []
 
     # Merge adjacent segments of the same type if the gap between them is small
-    raw_moments.sort(key=lambda x: x[0]) # Sort by start time first
+    raw_moments = sorted(raw_moments, key=lambda x: x[0]) # Sort by start time first
     merged_segments = []
-    if raw_moments:
-        current_segment = list(raw_moments[0]) # Use a mutable list for the current segment being built
-        for i in range(1, len(raw_moments)):
-            next_start, next_end, next_label, _ = raw_moments[i]
-            last_start, last_end, last_label, _ = current_segment
-            gap = next_start - last_end # Time difference between segments
-
-            # Check if labels match and the gap is within the merging threshold
-            if next_label == last_label and gap >= 0 and gap <= merge_threshold_seconds:
-                # Merge: Extend the end time of the current segment to cover the next one
-                current_segment[1] = max(last_end, next_end)
-            else:
-                # Don't merge: Finalize the current segment and add it to the list
-                merged_segments.append(tuple(current_segment))
-                # Start a new current segment from the next raw moment
-                current_segment = list(raw_moments[i])
+    current_segment = list(raw_moments[0]) # Use a mutable list for the current segment being built
+    for i in range(1, len(raw_moments)):
+        next_start, next_end, next_label, _ = raw_moments[i]
+        last_start, last_end, last_label, _ = current_segment
+        gap = next_start - last_end # Time difference between segments
+
+        # Check if labels match and the gap is within the merging threshold
+        if next_label == last_label and gap >= 0 and gap <= merge_threshold_seconds:
+            # Merge: Extend the end time of the current segment to cover the next one
+            current_segment[1] = max(last_end, next_end)
+        else:
+            # Don't merge: Finalize the current segment and add it to the list
+            merged_segments.append(tuple(current_segment))
+            # Start a new current segment from the next raw moment
+            current_segment = list(raw_moments[i])
 
-        # Append the last processed segment after the loop finishes
-        merged_segments.append(tuple(current_segment))
+    # Append the last processed segment after the loop finishes
+    merged_segments.append(tuple(current_segment))
 
     return merged_segments
 
 
+def _split_moments(candidate_moments, min_required_duration_sec, metrics):
+    """Filters candidates by minimum duration and separates People vs Other. Returns (people, other, discarded_count)."""
+    people_moments = []
+    other_scene_moments = []
+    filter_start = time.perf_counter()
+    discarded_count = 0
+    for start, end, label, fname in candidate_moments:
+        duration = end - start
+        # Apply the minimum duration filter
+        if duration >= min_required_duration_sec:
+            if label == "People Scene":
+                # Standardize label to "People"
+                people_moments.append((start, end, "People", fname))
+            else:
+                # Keep other specific labels (e.g., 'Vehicle', 'Animal')
+                other_scene_moments.append((start, end, label, fname))
+        else:
+            # Clip is shorter than the minimum required duration
+            discarded_count += 1
+    metrics.add_time("filter", time.perf_counter() - filter_start)
+    metrics.count("moments_kept", len(people_moments) + len(other_scene_moments))
+    metrics.count("moments_discarded", discarded_count)
+    return people_moments, other_scene_moments, discarded_count
+
+
 # General Video Moment Detection Function
-def detect_video_moments(video_path, beat_duration_sec):
+def detect_video_moments(video_path, beat_duration_sec, preset_name=DEFAULT_ANALYSIS_PRESET, preset=None, metrics=None, on_progress=None,
+                         decode_backend=DEFAULT_DECODE_BACKEND, sample_scores=None, moment_features=None, shot_boundaries=None):
     """
     Detects moments using MediaPipe, merges them, and filters based on MINIMUM DURATION OF 2 BEATS.
 
     Args:
         video_path (str): Path to the video file.
         beat_duration_sec (float): The duration of a single beat in seconds.
+        preset_name (str): Analysis preset (sampling interval, inference resolution, model variant).
+        preset (dict): Optional explicit preset settings, overrides the preset_name lookup (used by benchmarks);
+            its optional 'name' labels the run in the log ('custom' without one).
+        metrics (RunMetrics): Optional per-stage timing/counter collector for this file.
+        on_progress (callable): Optional on_progress(frames_decoded), called periodically while decoding.
+        decode_backend (str): 'opencv', 'ffmpeg' (sampling and downscaling inside an ffmpeg subprocess) or
+            'opencv_process' (OpenCV decoding in a separate process, frames through shared memory).
+        sample_scores (list): Optional list to collect (fname, time_s, score vector) per classified sample, so other
+            categories can be queried without re-running detection (see mediapipe_utils.score_frame_mediapipe).
+        moment_features (dict): Optional dict to add {(fname, start, end): visual features and quality} of the
+            moments to (see frame_features.py), used to prefer the best clips when fitting the song length.
+        shot_boundaries (dict): Optional dict to store the file's sorted camera cut times at shot_boundaries[fname]
+            (see shot_detection.py). Moment starts are snapped to nearby cuts if SHOT_DETECTION_ENABLED.
 
     Returns:
         tuple: (list_of_people_moments, list_of_other_scene_moments)
@@ -221,45 +616,175 @@ def detect_video_moments(video_path, beat_duration_sec):
     # Calculate minimum required duration (2 beats)
     min_required_duration_sec = beat_duration_sec * 2.0 if beat_duration_sec and beat_duration_sec > 0 else 0
 
-    print(f"Processing video '{base_name}' using MediaPipe (Filtering for duration >= {min_required_duration_sec:.3f}s)")
+    if preset is None:
+        preset = get_analysis_preset(preset_name)
+        preset_label = preset_name
+    else:
+        preset_label = preset.get("name", "custom")
+
+    print(f"Processing video '{base_name}' using MediaPipe, preset '{preset_label}' (Filtering for duration >= {min_required_duration_sec:.3f}s)")
 
     if min_required_duration_sec <= 0:
            print("  Warning: Invalid beat duration or <= 0, cannot apply 2-beat minimum filter.")
            min_required_duration_sec = 0 # Effectively disable filter
 
+    if metrics is None:
+        metrics = RunMetrics(base_name)
+
     # Load MediaPipe detector instance
-    detector = load_object_detector()
+    if preset["model_filename"] in OBJECT_DETECTORS:
+        metrics.count("detector_cache_hits")
+    with metrics.stage("load_detector"):
+        detector = load_object_detector(model_filename=preset["model_filename"])
     if detector is None:
            raise RuntimeError("MediaPipe Object Detector could not be loaded.")
 
     try:
         # Get candidate moments
-        candidate_moments = _detect_scenes_mediapipe(video_path, detector)
+        candidate_moments = _detect_scenes_mediapipe(
+            video_path, detector,
+            frame_check_interval_sec=preset["frame_check_interval_sec"],
+            inference_width=preset["inference_width"],
+            metrics=metrics,
+            on_progress=on_progress,
+            decode_backend=decode_backend,
+            sample_scores=sample_scores,
+            moment_features=moment_features,
+            shot_boundaries=shot_boundaries
+        )
 
         # Filter candidates by minimum duration and separate into People vs Other - maybe in future let user choose which they want ...
-        filtered_people_count = 0
-        filtered_other_count = 0
-        discarded_count = 0
-        for start, end, label, fname in candidate_moments:
-            duration = end - start
-            # Apply the minimum duration filter
-            if duration >= min_required_duration_sec:
-                if label == "People Scene":
-                    # Standardize label to "People"
-                    people_moments.append((start, end, "People", fname))
-                    filtered_people_count += 1
-                else:
-                    # Keep other specific labels (e.g., 'Vehicle', 'Animal')
-                    other_scene_moments.append((start, end, label, fname))
-                    filtered_other_count += 1
-            else:
-                # Clip is shorter than the minimum required duration
-                discarded_count += 1
+        people_moments, other_scene_moments, discarded_count = _split_moments(candidate_moments, min_required_duration_sec, metrics)
+        filtered_people_count = len(people_moments)
+        filtered_other_count = len(other_scene_moments)
 
         print(f"  Found & Kept: {filtered_people_count} People, {filtered_other_count} Other moments (after >= {min_required_duration_sec:.3f}s filter). Discarded {discarded_count} short segments.")
 
     except Exception as e:
         print(f"ERROR processing video {base_name}: {e}")
         raise
+    finally:
+        metrics.finish()
 
     return people_moments, other_scene_moments
+
+
+def detect_video_moments_fill_budget(video_paths, beat_duration_sec, budget_s, style=None, preset_name=DEFAULT_ANALYSIS_PRESET,
+                                     preset=None, metrics_by_path=None, slice_sec=FILL_BUDGET_SLICE_SEC,
+                                     on_file_done=None, on_progress=None, should_stop=None, decode_backend=DEFAULT_DECODE_BACKEND,
+                                     sample_scores=None, moment_features=None, shot_boundaries=None):
+    """
+    Fill-budget mode: analyzes all files round-robin, slice_sec video seconds per file and turn, and stops once
+    the clips planned from the moments found so far (expected total for the style, see clip_planning.ClipPlanner)
+    reach budget_s. Taking turns keeps an early stop from favouring the first files. Moments use the same
+    2-beat filter as detect_video_moments; a file stopped early keeps the moments of its analyzed part.
+
+    Args:
+        metrics_by_path (dict): Optional path -> RunMetrics; missing entries are created (and added).
+        on_file_done (callable): on_file_done(path, people_moments, other_scene_moments, error) - once per file,
+            when it ends (end of video, error or budget reached). error is None or the exception.
+        on_progress (callable): on_progress(path, analyzed_until_s, usable_s) after each slice.
+        should_stop (callable): Polled before each slice, True cancels the run (open files are finished like at the budget).
+        decode_backend (str), sample_scores (list), moment_features (dict), shot_boundaries (dict): As in detect_video_moments.
+
+    Returns:
+        tuple: (usable_s, stopped_early) - expected planned duration of the moments found, True if the budget or a
+               cancel ended the run before all files were analyzed
+    """
+    min_required_duration_sec = beat_duration_sec * 2.0 if beat_duration_sec and beat_duration_sec > 0 else 0
+    if preset is None:
+        preset = get_analysis_preset(preset_name)
+    if metrics_by_path is None:
+        metrics_by_path = {}
+    for path in video_paths:
+        metrics_by_path.setdefault(path, RunMetrics(os.path.basename(path)))
+
+    print(f"Fill-budget analysis of {len(video_paths)} video(s): stopping at {budget_s:.1f}s of planned clips "
+          f"(style '{style or 'default'}', {slice_sec:g}s slices)")
+    first_metrics = metrics_by_path[video_paths[0]] if video_paths else RunMetrics("fill_budget")
+    if preset["model_filename"] in OBJECT_DETECTORS:
+        first_metrics.count("detector_cache_hits")
+    with first_metrics.stage("load_detector"):
+        detector = load_object_detector(model_filename=preset["model_filename"])
+    if detector is None:
+        raise RuntimeError("MediaPipe Object Detector could not be loaded.")
+
+    scanners = {} # path -> _SceneScanner of files in progress
+    finished = {} # path -> (people, other) of files that ended
+    active = list(video_paths)
+
+    def finish_file(path, error=None):
+        scanner = scanners.pop(path, None)
+        people, other = [], []
+        if scanner is not None:
+            try:
+                if error is None:
+                    people, other, _ = _split_moments(scanner.finish(), min_required_duration_sec, scanner.metrics)
+                    if moment_features is not None:
+                        moment_features.update(scanner.features_for(people + other))
+                    if shot_boundaries is not None:
+                        shot_boundaries[scanner.base_name] = scanner.shot_boundaries()
+            except Exception as e:
+                error = e
+            finally:
+                scanner.release()
+        metrics_by_path[path].finish()
+        finished[path] = (people, other)
+        if on_file_done:
+            on_file_done(path, people, other, error)
+
+    last_state = None
+    usable_s = 0.0
+    def current_usable_s():
+        nonlocal last_state, usable_s
+        state = (len(finished), sum(len(s.raw_moments) for s in scanners.values()))
+        if state == last_state: # No new closed segments since the last check
+            return usable_s
+        last_state = state
+        moments = [m for people, other in finished.values() for m in people + other]
+        for scanner in scanners.values():
+            moments.extend(m for m in scanner.moments_so_far() if m[1] - m[0] >= min_required_duration_sec)
+        source_durations = {os.path.basename(p): metrics_by_path[p].media_duration_s for p in video_paths}
+        usable_s = ClipPlanner(moments, beat_duration_sec, DEFAULT_FPS, source_durations).expected_total_s(style)
+        return usable_s
+
+    stopped_early = False
+    cancelled = False
+    analyzed_until_s = 0.0
+    try:
+        while active and not stopped_early:
+            analyzed_until_s += slice_sec
+            for path in list(active):
+                if should_stop and should_stop():
+                    cancelled = stopped_early = True
+                    break
+                try:
+                    if path not in scanners:
+                        scanners[path] = _open_scanner(path, detector, preset["frame_check_interval_sec"], preset["inference_width"],
+                                                       metrics_by_path[path], decode_backend, sample_scores)
+                    done = scanners[path].scan(analyzed_until_s)
+                except Exception as e:
+                    print(f"ERROR processing video {os.path.basename(path)}: {e}")
+                    active.remove(path)
+                    finish_file(path, e)
+                    continue
+                if done:
+                    active.remove(path)
+                    finish_file(path)
+                if on_progress:
+                    on_progress(path, analyzed_until_s, current_usable_s())
+                if current_usable_s() >= budget_s:
+                    stopped_early = bool(active)
+                    break
+
+        for path in list(active): # Budget reached or cancelled: keep what the remaining files produced so far
+            metrics_by_path[path].count("fill_budget_cancel" if cancelled else "fill_budget_stop")
+            finish_file(path)
+        usable_s = current_usable_s()
+        outcome = "cancelled" if cancelled else "stopped early" if stopped_early else "finished"
+        print(f"Fill-budget analysis {outcome} at {analyzed_until_s:.0f}s per file: "
+              f"{usable_s:.1f}s of planned clips (budget {budget_s:.1f}s)")
+        return usable_s, stopped_early
+    finally:
+        for scanner in scanners.values():
+            scanner.release()
@@ -1,16 +1,28 @@
 import os
+import time
 import requests
 import cv2
+import numpy as np
 import mediapipe as mp
 from mediapipe.tasks import python as mp_python
 from mediapipe.tasks.python import vision as mp_vision
 from tkinter import messagebox
 
 from config import (
-    MODEL_FILENAME, MODEL_URL, MEDIAPIPE_SCORE_THRESHOLD, MEDIAPIPE_MAX_RESULTS
+    MODEL_FILENAME, MODEL_URL, MODEL_URL_TEMPLATE, MEDIAPIPE_SCORE_THRESHOLD, MEDIAPIPE_MAX_RESULTS, SCENE_TAXONOMY,
+    SCENE_CATEGORY_MIN_SCORES, SCENE_KEEP_LABEL_WHILE_DETECTED
 )
+from thread_budget import current_thread_budget
 
-OBJECT_DETECTOR = None
+OBJECT_DETECTORS = {} # Cached detectors keyed by model filename (presets may use different variants)
+DETECTOR_THREADS = {} # Inference thread count each cached detector was created with
+
+def model_url_for(filename):
+    """Returns the download URL for an EfficientDet model filename (e.g. 'efficientdet_lite2.tflite')."""
+    if filename == MODEL_FILENAME:
+        return MODEL_URL
+    variant = os.path.splitext(filename)[0]
+    return MODEL_URL_TEMPLATE.format(variant=variant, filename=filename)
 
 def download_model(url=MODEL_URL, filename=MODEL_FILENAME):
     """Downloads the MediaPipe model if it doesn't exist. Returns True on success/exists, False on failure."""
@@ -34,28 +46,50 @@ def download_model(url=MODEL_URL, filename=MODEL_FILENAME):
         print(f"Model '{filename}' already exists.")
         return True
 
-def load_object_detector(force_reload=False):
-    """Loads or returns the cached MediaPipe Object Detector. Returns detector instance or None."""
-    global OBJECT_DETECTOR
-    if OBJECT_DETECTOR is not None and not force_reload:
-        return OBJECT_DETECTOR
+def _set_detector_threads(options, num_threads):
+    """
+    Sets the TFLite interpreter thread count on the detector options, where the installed MediaPipe exposes it
+    (older Tasks releases size the interpreter themselves). Returns True if it was set.
+    """
+    for target in (options, options.base_options):
+        if hasattr(target, "num_threads"):
+            target.num_threads = num_threads
+            return True
+    return False
 
-    if not download_model():
-        OBJECT_DETECTOR = None
+def load_object_detector(force_reload=False, model_filename=MODEL_FILENAME, num_threads=None):
+    """
+    Loads or returns the cached MediaPipe Object Detector for the given model. num_threads is the inference
+    thread count (default: the inference share of the applied thread budget). Returns detector instance or None.
+    """
+    if num_threads is None:
+        num_threads = current_thread_budget()["inference"]
+    cached = OBJECT_DETECTORS.get(model_filename)
+    if cached is not None and not force_reload and DETECTOR_THREADS.get(model_filename) == num_threads:
+        return cached
+    if cached is not None and hasattr(cached, 'close'):
+        cached.close() # Recreated with another thread count
+
+    if not download_model(url=model_url_for(model_filename), filename=model_filename):
+        OBJECT_DETECTORS.pop(model_filename, None)
         return None
 
     try:
-        print("Initializing MediaPipe Object Detector...")
-        base_options = mp_python.BaseOptions(model_asset_path=MODEL_FILENAME)
+        print(f"Initializing MediaPipe Object Detector ({model_filename})...")
+        base_options = mp_python.BaseOptions(model_asset_path=model_filename)
         options = mp_vision.ObjectDetectorOptions(
             base_options=base_options,
             running_mode=mp_vision.RunningMode.IMAGE,
             score_threshold=MEDIAPIPE_SCORE_THRESHOLD,
             max_results=MEDIAPIPE_MAX_RESULTS
         )
-        OBJECT_DETECTOR = mp_vision.ObjectDetector.create_from_options(options)
-        print("MediaPipe Object Detector loaded successfully.")
-        return OBJECT_DETECTOR
+        if not _set_detector_threads(options, num_threads):
+            print("  This MediaPipe version has no detector thread option, inference threads follow its defaults.")
+        detector = mp_vision.ObjectDetector.create_from_options(options)
+        OBJECT_DETECTORS[model_filename] = detector
+        DETECTOR_THREADS[model_filename] = num_threads
+        print(f"MediaPipe Object Detector loaded successfully ({num_threads} inference thread(s)).")
+        return detector
     except Exception as e:
         print(f"ERROR: Failed to initialize MediaPipe Object Detector: {e}")
         # Show error but allow app to continue - maybe another model choosable in future version
@@ -63,77 +97,140 @@ def load_object_detector(force_reload=False):
             "Detector Load Error",
             f"Failed to load MediaPipe Object Detector:\n{e}"
         )
-        OBJECT_DETECTOR = None
+        OBJECT_DETECTORS.pop(model_filename, None)
         return None
 
-def classify_frame_mediapipe(image_cv2, detector):
+def resize_for_inference(image_cv2, inference_width=None):
+    """Downscales a frame to inference_width (keeping aspect ratio). Returns the frame unchanged if not needed."""
+    if not inference_width:
+        return image_cv2
+    height, width = image_cv2.shape[:2]
+    if width <= inference_width:
+        return image_cv2
+    new_height = max(1, int(round(height * inference_width / width)))
+    return cv2.resize(image_cv2, (inference_width, new_height), interpolation=cv2.INTER_AREA)
+
+def _compile_taxonomy(taxonomy):
+    """Returns (category names, lowercase detector label -> category id). A label listed twice keeps its first category."""
+    categories = tuple(taxonomy)
+    lookup = {}
+    for category_id, category in enumerate(categories):
+        for label in taxonomy[category]:
+            lookup.setdefault(label.lower(), category_id)
+    return categories, lookup
+
+SCENE_CATEGORIES, LABEL_CATEGORY_IDS = _compile_taxonomy(SCENE_TAXONOMY)
+CATEGORY_IDS = {category: category_id for category_id, category in enumerate(SCENE_CATEGORIES)}
+CATEGORY_MIN_SCORES = np.array([max(MEDIAPIPE_SCORE_THRESHOLD, SCENE_CATEGORY_MIN_SCORES.get(category, 0.0))
+                                for category in SCENE_CATEGORIES], dtype=np.float32)
+SCORE_ROW, COUNT_ROW = 0, 1 # Rows of a score vector
+
+def empty_scores():
+    return np.zeros((2, len(SCENE_CATEGORIES)), dtype=np.float32)
+
+def score_frame_mediapipe(image_cv2, detector, inference_width=None, metrics=None, rgb=False, features=None):
     """
-    Classifies a single frame using the provided MediaPipe Object Detector.
-    Returns a scene category string ("People Scene", "Vehicle Scene", etc., or "Other").
+    Runs the detector once on a frame and returns its score vector: float32 array of shape (2, len(SCENE_CATEGORIES)),
+    row SCORE_ROW the max detection score and row COUNT_ROW the number of detections per category
+    (detections >= MEDIAPIPE_SCORE_THRESHOLD, labels outside SCENE_TAXONOMY are ignored).
+    Frame is downscaled to inference_width first if given (presets trade accuracy for speed).
+    rgb=True takes an RGB frame that is already model-sized (ffmpeg backend) and skips resize/conversion.
+    If a RunMetrics is given, 'preprocess' (resize/color conversion) and 'inference' time is recorded.
+    features (frame_features.FrameFeatures) is updated from the same prepared frame ('features' time), if given.
     """
+    scores = empty_scores()
+    if features is not None:
+        features.last = None
     if detector is None:
-        print("Warning: classify_frame_mediapipe called with no detector.")
-        return "Other" # Or raise an error?
+        print("Warning: score_frame_mediapipe called with no detector.")
+        return scores
 
     try:
-        image_rgb = cv2.cvtColor(image_cv2, cv2.COLOR_BGR2RGB)
+        t0 = time.perf_counter()
+        image_rgb = image_cv2 if rgb else cv2.cvtColor(resize_for_inference(image_cv2, inference_width), cv2.COLOR_BGR2RGB)
         # Use SRGB as format - colors fine
         mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=image_rgb)
+        t1 = time.perf_counter()
         detection_result = detector.detect(mp_image)
+        t2 = time.perf_counter()
+        if features is not None:
+            features.update(image_rgb)
+        if metrics is not None:
+            metrics.add_time("preprocess", t1 - t0)
+            metrics.add_time("inference", t2 - t1)
+            if features is not None:
+                metrics.add_time("features", time.perf_counter() - t2)
+            metrics.count("frames_classified")
 
         if not detection_result or not detection_result.detections:
-            return "Other"
-
-        best_category = "Other"
-        highest_score = 0.0
+            return scores
 
+        best_scores = scores[SCORE_ROW]
+        counts = scores[COUNT_ROW]
         for detection in detection_result.detections:
             if not detection.categories: continue # Skip if no categories found
 
             category = detection.categories[0]
-            score = category.score
-            label = category.category_name.lower() if category.category_name else ""
-
-            if score >= MEDIAPIPE_SCORE_THRESHOLD and score > highest_score:
-                mapped_category = "Other" # Default
-                #Categories for Mediapipe - add more later, and into config.py?
-                if label == 'person':
-                    mapped_category = "People Scene"
-                elif label in ['car','truck','bus','motorcycle','bicycle','airplane','boat','train']:
-                    mapped_category = "Vehicle Scene"
-                elif label in ['cat','dog','bird','horse','sheep','cow','bear','zebra','giraffe','elephant']:
-                    mapped_category = "Animal Scene"
-                elif label in ['chair','couch','potted plant','bed','dining table','toilet','tv','laptop',
-                               'mouse','remote','keyboard','cell phone','microwave','oven','toaster','sink',
-                               'refrigerator','book','clock','vase','scissors','teddy bear','hair drier',
-                               'toothbrush','cup','fork','knife','spoon','bowl']:
-                     mapped_category = "Indoor Scene"
-                elif label in ['bench','traffic light','fire hydrant','stop sign','parking meter','tree',
-                               'backpack','umbrella','handbag','tie','suitcase','frisbee','skis','snowboard',
-                               'sports ball','kite','baseball bat','baseball glove','skateboard','surfboard',
-                               'tennis racket','bottle','wine glass']:
-                     mapped_category = "Outdoor/Object Scene"
-                elif label in ['banana','apple','sandwich','orange','broccoli','carrot','hot dog','pizza','donut','cake']:
-                     mapped_category = "Food Scene"
-                # Else: remains "Other"
-
-                # If successfully mapped to a category and it's the best score so far
-                if mapped_category != "Other":
-                    highest_score = score
-                    best_category = mapped_category
-
-        return best_category
+            if category.score < MEDIAPIPE_SCORE_THRESHOLD or not category.category_name:
+                continue
+            category_id = LABEL_CATEGORY_IDS.get(category.category_name.lower())
+            if category_id is None:
+                continue # Not in the taxonomy
+            counts[category_id] += 1
+            if category.score > best_scores[category_id]:
+                best_scores[category_id] = category.score
+        return scores
 
     except Exception as e:
         print(f"Error during MediaPipe frame classification: {e}")
-        return "Other" # Return default on error
+        return empty_scores() # Return default on error
+
+def category_score(scores, category):
+    """(max score, count) of one category in a score vector."""
+    category_id = CATEGORY_IDS[category]
+    return float(scores[SCORE_ROW, category_id]), int(scores[COUNT_ROW, category_id])
+
+def category_detected(scores, category):
+    """True if a category was detected at or above its minimum score (SCENE_CATEGORY_MIN_SCORES)."""
+    score, count = category_score(scores, category)
+    return count > 0 and score >= CATEGORY_MIN_SCORES[CATEGORY_IDS[category]]
+
+def best_category(scores):
+    """Scene category with the highest score in a score vector (at its minimum score), "Other" if none qualifies."""
+    best_scores = np.where(scores[SCORE_ROW] >= CATEGORY_MIN_SCORES, scores[SCORE_ROW], 0.0)
+    category_id = int(best_scores.argmax())
+    return SCENE_CATEGORIES[category_id] if best_scores[category_id] > 0 else "Other"
+
+def segment_label(scores, current_label=None):
+    """
+    Label of a sample for segmentation: the current segment's label while its category is still detected
+    (a frame can match several categories, e.g. people next to a car; SCENE_KEEP_LABEL_WHILE_DETECTED),
+    else best_category. Avoids splitting a scene each time another category briefly scores higher.
+    """
+    if SCENE_KEEP_LABEL_WHILE_DETECTED and current_label in CATEGORY_IDS and category_detected(scores, current_label):
+        return current_label
+    return best_category(scores)
+
+def iter_score_labels(sample_scores):
+    """Expands (source_file, time_s, scores) samples into (source_file, time_s, category, max_score) rows for detected categories."""
+    for source_file, time_s, scores in sample_scores:
+        for category_id in np.flatnonzero(scores[COUNT_ROW]):
+            yield source_file, time_s, SCENE_CATEGORIES[category_id], round(float(scores[SCORE_ROW, category_id]), 4)
+
+def classify_frame_mediapipe(image_cv2, detector, inference_width=None, metrics=None, rgb=False):
+    """
+    Classifies a single frame using the provided MediaPipe Object Detector (best category of score_frame_mediapipe).
+    Returns a scene category string ("People Scene", "Vehicle Scene", etc., or "Other").
+    """
+    return best_category(score_frame_mediapipe(image_cv2, detector, inference_width, metrics, rgb))
 
 def release_detector():
-    """Releases the MediaPipe detector resources if loaded."""
-    global OBJECT_DETECTOR
-    if OBJECT_DETECTOR is not None:
+    """Releases all loaded MediaPipe detector resources."""
+    for model_filename in list(OBJECT_DETECTORS):
         try:
-            print("Releasing MediaPipe detector reference.")
-            OBJECT_DETECTOR = None
+            print(f"Releasing MediaPipe detector reference ({model_filename}).")
+            detector = OBJECT_DETECTORS.pop(model_filename)
+            DETECTOR_THREADS.pop(model_filename, None)
+            if hasattr(detector, 'close'): detector.close()
         except Exception as e:
             print(f"Error potentially releasing MediaPipe detector: {e}")
@@ -0,0 +1,298 @@
+"""
+Local stand-in for the DaVinci Resolve scripting objects used by generated scripts.
+
+Implements just enough of app.GetResolve() / ProjectManager / Project / MediaPool / Folder /
+MediaPoolItem / Timeline / TimelineItem to run the output of resolve_script_generator offline.
+Every API call is counted and can be slowed down by a configurable latency, so script-side
+changes can be measured on a plain Linux box (see benchmark_resolve_script.py).
+"""
+import io
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import redirect_stdout
+
+
+class MockAPI:
+    """Shared call recorder. latency_s applies to every call, per_call_latency_s overrides it per method name."""
+    def __init__(self, latency_s=0.0, per_call_latency_s=None):
+        self.latency_s = latency_s
+        self.per_call_latency_s = per_call_latency_s or {}
+        self.calls = Counter()
+
+    def call(self, name):
+        self.calls[name] += 1
+        delay = self.per_call_latency_s.get(name, self.latency_s)
+        if delay > 0: time.sleep(delay)
+
+    def total_calls(self):
+        return sum(self.calls.values())
+
+
+class MockMediaPoolItem:
+    def __init__(self, api, file_path, duration_frames=None, fps=24.0):
+        self._api = api
+        self.file_path = file_path
+        self.name = os.path.basename(file_path)
+        self.duration_frames = duration_frames
+        self.fps = fps
+
+    def GetName(self):
+        self._api.call("MediaPoolItem.GetName")
+        return self.name
+
+    def GetClipProperty(self, key=None):
+        self._api.call("MediaPoolItem.GetClipProperty")
+        props = {"File Path": self.file_path, "File Name": self.name,
+                 "Duration": str(self.duration_frames) if self.duration_frames is not None else ""}
+        return props if key is None else props.get(key)
+
+
+class MockFolder:
+    def __init__(self, api, name):
+        self._api = api
+        self.name = name
+        self.clips = []
+        self.subfolders = []
+
+    def GetName(self):
+        self._api.call("Folder.GetName")
+        return self.name
+
+    def GetClipList(self):
+        self._api.call("Folder.GetClipList")
+        return list(self.clips)
+
+    def GetSubFolderList(self):
+        self._api.call("Folder.GetSubFolderList")
+        return list(self.subfolders)
+
+
+class MockTimelineItem:
+    def __init__(self, api, media_pool_item, start, end):
+        self._api = api
+        self.media_pool_item = media_pool_item
+        self.start = start
+        self.end = end
+
+    def GetStart(self):
+        self._api.call("TimelineItem.GetStart")
+        return self.start
+
+    def GetEnd(self):
+        self._api.call("TimelineItem.GetEnd")
+        return self.end
+
+    def GetMediaPoolItem(self):
+        self._api.call("TimelineItem.GetMediaPoolItem")
+        return self.media_pool_item
+
+
+class MockTimeline:
+    def __init__(self, api, name, start_frame=86400):
+        self._api = api
+        self.name = name
+        self.start_frame = start_frame
+        self.tracks = {"video": [[]], "audio": [[]]} # One list of MockTimelineItems per track
+
+    def GetName(self):
+        self._api.call("Timeline.GetName")
+        return self.name
+
+    def GetStartFrame(self):
+        self._api.call("Timeline.GetStartFrame")
+        return self.start_frame
+
+    def GetTrackCount(self, track_type):
+        self._api.call("Timeline.GetTrackCount")
+        return len(self.tracks.get(track_type, []))
+
+    def AddTrack(self, track_type, sub_type=None):
+        self._api.call("Timeline.AddTrack")
+        self.tracks.setdefault(track_type, []).append([])
+        return True
+
+    def DeleteTrack(self, track_type, index):
+        self._api.call("Timeline.DeleteTrack")
+        tracks = self.tracks.get(track_type, [])
+        if not 1 <= index <= len(tracks): return False
+        tracks.pop(index - 1)
+        return True
+
+    def GetItemListInTrack(self, track_type, index):
+        self._api.call("Timeline.GetItemListInTrack")
+        tracks = self.tracks.get(track_type, [])
+        return list(tracks[index - 1]) if 1 <= index <= len(tracks) else None
+
+    def _append(self, track_type, index, media_pool_item, start_frame, end_frame):
+        tracks = self.tracks.setdefault(track_type, [])
+        while len(tracks) < index: tracks.append([])
+        track = tracks[index - 1]
+        record_start = track[-1].end if track else self.start_frame
+        if end_frame is None: # Whole clip from startFrame
+            end_frame = media_pool_item.duration_frames if media_pool_item.duration_frames else start_frame + 1
+        item = MockTimelineItem(self._api, media_pool_item, record_start, record_start + max(0, end_frame - start_frame))
+        track.append(item)
+        return item
+
+
+class MockMediaPool:
+    def __init__(self, api, project, import_returns_items=True):
+        self._api = api
+        self.project = project
+        self.root = MockFolder(api, "Master")
+        self.import_returns_items = import_returns_items # Real Resolve returns nothing for files already in the pool
+        self.default_duration_frames = 24 * 600
+
+    def _all_items(self):
+        folders = [self.root]
+        while folders:
+            folder = folders.pop()
+            yield from folder.clips
+            folders.extend(folder.subfolders)
+
+    def GetRootFolder(self):
+        self._api.call("MediaPool.GetRootFolder")
+        return self.root
+
+    def ImportMedia(self, paths):
+        self._api.call("MediaPool.ImportMedia")
+        existing = {item.file_path for item in self._all_items()}
+        new_items = []
+        for path in paths:
+            if path in existing: continue
+            item = MockMediaPoolItem(self._api, path, self.default_duration_frames)
+            self.root.clips.append(item)
+            existing.add(path)
+            new_items.append(item)
+        return new_items if self.import_returns_items else []
+
+    def CreateEmptyTimeline(self, name):
+        self._api.call("MediaPool.CreateEmptyTimeline")
+        timeline = MockTimeline(self._api, name)
+        self.project.timelines.append(timeline)
+        self.project.current_timeline = timeline
+        return timeline
+
+    def AppendToTimeline(self, clip_infos):
+        self._api.call("MediaPool.AppendToTimeline")
+        timeline = self.project.current_timeline
+        if timeline is None: return []
+        added = []
+        for info in clip_infos:
+            if not isinstance(info, dict) or "mediaPoolItem" not in info: continue
+            track_type = "audio" if info.get("mediaType") == 2 else "video"
+            added.append(timeline._append(track_type, info.get("trackIndex", 1), info["mediaPoolItem"],
+                                          info.get("startFrame", 0), info.get("endFrame")))
+        return added
+
+
+class MockProject:
+    def __init__(self, api, name="Mock Project", fps=24.0, import_returns_items=True):
+        self._api = api
+        self.name = name
+        self.settings = {"timelineFrameRate": f"{fps:g}"}
+        self.timelines = []
+        self.current_timeline = None
+        self.media_pool = MockMediaPool(api, self, import_returns_items)
+
+    def GetName(self):
+        self._api.call("Project.GetName")
+        return self.name
+
+    def GetSetting(self, key):
+        self._api.call("Project.GetSetting")
+        return self.settings.get(key)
+
+    def GetMediaPool(self):
+        self._api.call("Project.GetMediaPool")
+        return self.media_pool
+
+    def SetCurrentTimeline(self, timeline):
+        self._api.call("Project.SetCurrentTimeline")
+        self.current_timeline = timeline
+        return True
+
+
+class MockProjectManager:
+    def __init__(self, api, project):
+        self._api = api
+        self.project = project
+
+    def GetCurrentProject(self):
+        self._api.call("ProjectManager.GetCurrentProject")
+        return self.project
+
+
+class MockResolve:
+    def __init__(self, api, project):
+        self._api = api
+        self.project_manager = MockProjectManager(api, project)
+
+    def GetProjectManager(self):
+        self._api.call("Resolve.GetProjectManager")
+        return self.project_manager
+
+
+class MockApp:
+    """The 'app' global Resolve injects into scripts run from its console."""
+    def __init__(self, resolve):
+        self.resolve = resolve
+
+    def GetResolve(self):
+        self.resolve._api.call("app.GetResolve")
+        return self.resolve
+
+
+def build_mock_app(latency_s=0.0, fps=24.0, pool_items=0, pool_folders=10, preexisting_paths=None,
+                   import_returns_items=True, per_call_latency_s=None):
+    """
+    Builds a mock Resolve session. The media pool is filled with pool_items unrelated clips spread over
+    pool_folders subfolders, plus preexisting_paths (files the script will look for that are already in the pool).
+    Returns (app, api, project).
+    """
+    api = MockAPI(latency_s, per_call_latency_s)
+    project = MockProject(api, fps=fps, import_returns_items=import_returns_items)
+    pool = project.media_pool
+    folders = [pool.root]
+    for i in range(max(0, pool_folders)):
+        folder = MockFolder(api, f"Bin {i + 1}")
+        pool.root.subfolders.append(folder)
+        folders.append(folder)
+    for i in range(max(0, pool_items)):
+        folders[i % len(folders)].clips.append(MockMediaPoolItem(api, f"/mock/existing/clip_{i:06d}.mov", pool.default_duration_frames))
+    for path in preexisting_paths or []:
+        folders[-1].clips.append(MockMediaPoolItem(api, path, pool.default_duration_frames))
+    return MockApp(MockResolve(api, project)), api, project
+
+
+def run_generated_script(script_path, app, api, quiet=True):
+    """
+    Executes a generated Resolve script against a mock app. Returns a result dict with wall time,
+    API call counts and the script's printed output (exceptions are reported, not raised).
+    """
+    with open(script_path, "r", encoding="utf-8") as f:
+        code = compile(f.read(), script_path, "exec")
+    script_globals = {"__name__": "__main__", "__file__": os.path.abspath(script_path), "app": app}
+    api.calls.clear()
+    output = io.StringIO()
+    error = None
+    start = time.perf_counter()
+    try:
+        if quiet:
+            with redirect_stdout(output):
+                exec(code, script_globals)
+        else:
+            exec(code, script_globals)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        print(f"Generated script raised: {error}", file=sys.stderr)
+    wall_time_s = time.perf_counter() - start
+    return {
+        "wall_time_s": wall_time_s,
+        "total_api_calls": api.total_calls(),
+        "api_calls": dict(api.calls.most_common()),
+        "error": error,
+        "output": output.getvalue(),
+    }
@@ -0,0 +1,141 @@
+import os
+import sys
+import time
+import threading
+import cProfile
+import pstats
+import io
+import shutil
+import tempfile
+import functools
+from collections import Counter
+
+from config import PROFILE_ENV_VAR, PROFILE_DIR_ENV_VAR, PROFILE_DEFAULT_DIR, PROFILE_SAMPLE_INTERVAL_SEC
+
+# Profiling is opt-in: enabled by env var, --profile CLI flag or the hidden UI toggle (Ctrl+Shift+P).
+# The state is mirrored into os.environ so worker processes started later inherit it.
+# Profiles go next to the run report (<report dir>/profiles). Until a report is written they are staged in a
+# per-session temp directory and moved there by move_profiles_to_report; an explicit directory is used as is.
+
+def profiling_enabled():
+    """True if analysis runs should be profiled."""
+    return os.environ.get(PROFILE_ENV_VAR, "").strip().lower() in ("1", "true", "yes", "on")
+
+def set_profiling(enabled, output_dir=None):
+    """Turns profiling on/off for this process and any worker processes started afterwards."""
+    if enabled:
+        os.environ[PROFILE_ENV_VAR] = "1"
+    else:
+        os.environ.pop(PROFILE_ENV_VAR, None)
+    if output_dir:
+        os.environ[PROFILE_DIR_ENV_VAR] = os.path.abspath(output_dir)
+    elif enabled:
+        os.environ.setdefault(PROFILE_DIR_ENV_VAR, staging_profile_dir()) # Worker processes write to the same staging dir
+
+def staging_profile_dir():
+    """Temp directory holding this session's profiles until a run report is written."""
+    return os.path.join(tempfile.gettempdir(), f"recap_profiles_{os.getpid()}")
+
+def profile_dir_for_report(report_path):
+    """Profile directory that belongs to a run report file."""
+    return os.path.join(os.path.dirname(os.path.abspath(report_path)), PROFILE_DEFAULT_DIR)
+
+def profile_output_dir():
+    return os.environ.get(PROFILE_DIR_ENV_VAR) or staging_profile_dir()
+
+def move_profiles_to_report(report_path):
+    """
+    Moves staged profiles next to a run report. Returns the directory holding this session's profiles
+    (the explicit profile directory if one was set, which is left alone).
+    """
+    staging = staging_profile_dir()
+    if profile_output_dir() != staging:
+        return profile_output_dir()
+    target = profile_dir_for_report(report_path)
+    if os.path.isdir(staging):
+        os.makedirs(target, exist_ok=True)
+        for name in os.listdir(staging):
+            shutil.move(os.path.join(staging, name), os.path.join(target, name))
+        os.rmdir(staging)
+    return target
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval and counts collapsed (flamegraph-ready) stacks."""
+    def __init__(self, thread_id, interval_sec=PROFILE_SAMPLE_INTERVAL_SEC):
+        self.thread_id = thread_id
+        self.interval_sec = interval_sec
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="StackSampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+
+    def _run(self):
+        while not self._stop.wait(self.interval_sec):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None: continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+
+    def write_collapsed(self, file_path):
+        """Writes 'frame;frame;frame count' lines (input format for flamegraph.pl / speedscope)."""
+        with open(file_path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+def run_profiled(name, func, *args, **kwargs):
+    """
+    Runs func(*args, **kwargs). When profiling is enabled it is wrapped in cProfile plus a stack sampler,
+    and <name>_<timestamp>_<pid>.prof / .collapsed / .txt files are written to the profile directory.
+    Safe to call in worker threads and worker processes (pid in the file name keeps them apart).
+    Returns func's result; exceptions propagate after the profile is written.
+    """
+    if not profiling_enabled():
+        return func(*args, **kwargs)
+
+    profiler = cProfile.Profile()
+    sampler = StackSampler(threading.get_ident()).start()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        sampler.stop()
+        try:
+            write_profile(name, profiler, sampler)
+        except Exception as e:
+            print(f"Warning: Failed to write profile for '{name}': {e}")
+
+def write_profile(name, profiler, sampler=None):
+    """Writes the cProfile stats (.prof + readable .txt) and collapsed stacks. Returns the .prof path."""
+    output_dir = profile_output_dir()
+    os.makedirs(output_dir, exist_ok=True)
+    safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+    base = os.path.join(output_dir, f"{safe_name}_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}")
+
+    profiler.dump_stats(base + ".prof")
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(40)
+    with open(base + ".txt", "w", encoding="utf-8") as f:
+        f.write(text.getvalue())
+    if sampler is not None:
+        sampler.write_collapsed(base + ".collapsed")
+    print(f"Profile written: {base}.prof (+ .txt, .collapsed)")
+    return base + ".prof"
+
+def profiled(name):
+    """Decorator form of run_profiled, e.g. for functions used as process pool tasks."""
+    def decorator(func):
+        @functools.wraps(func) # Keeps the qualified name, so the wrapper pickles as a pool / process target
+        def wrapper(*args, **kwargs):
+            return run_profiled(name, func, *args, **kwargs)
+        return wrapper
+    return decorator
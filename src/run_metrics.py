@@ -0,0 +1,96 @@
+import time
+import json
+from collections import Counter
+from contextlib import contextmanager
+
+class RunMetrics:
+    """
+    Per-file stage timings and counters for one analysis run.
+    Stages accumulate wall time (seconds), counters are plain integers.
+    Hot loops should call add_time() with their own perf_counter readings instead of stage() to keep overhead low.
+    """
+    def __init__(self, name, kind="video"):
+        self.name = name
+        self.kind = kind # "video" or "audio"
+        self.stages = {} # stage name -> seconds (insertion order = pipeline order)
+        self.counters = Counter()
+        self.media_duration_s = None # Duration of the media file (container / probe)
+        self.analyzed_duration_s = None # Part of the media actually analyzed (less if stopped early), used for realtime factor
+        self.wall_time_s = None
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        """Times a block and adds it to the named stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def finish(self):
+        """Records the total wall time since creation (idempotent)."""
+        if self.wall_time_s is None:
+            self.wall_time_s = time.perf_counter() - self._start
+        return self
+
+    def dominant_stage(self):
+        """Returns the stage with the most time spent, or None."""
+        if not self.stages: return None
+        return max(self.stages, key=self.stages.get)
+
+    def derived(self):
+        """Throughput figures derived from stages/counters."""
+        wall = self.wall_time_s if self.wall_time_s is not None else time.perf_counter() - self._start
+        derived = {}
+        if wall > 0:
+            if self.counters.get("frames_decoded"):
+                derived["decoded_frames_per_s"] = self.counters["frames_decoded"] / wall
+            if self.counters.get("frames_classified"):
+                derived["classified_frames_per_s"] = self.counters["frames_classified"] / wall
+            analyzed_s = self.analyzed_duration_s or self.media_duration_s
+            if analyzed_s:
+                derived["realtime_factor"] = analyzed_s / wall
+        inference_s = self.stages.get("inference")
+        if inference_s and self.counters.get("frames_classified"):
+            derived["inference_ms_per_frame"] = 1000.0 * inference_s / self.counters["frames_classified"]
+        return derived
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "wall_time_s": self.wall_time_s,
+            "media_duration_s": self.media_duration_s,
+            "analyzed_duration_s": self.analyzed_duration_s,
+            "stages_s": dict(self.stages),
+            "counters": dict(self.counters),
+            "derived": self.derived(),
+        }
+
+    def summary_line(self):
+        """Short one-line description for the summary panel."""
+        wall = self.wall_time_s or 0.0
+        parts = []
+        if wall > 0 and self.stages:
+            top = sorted(self.stages.items(), key=lambda kv: kv[1], reverse=True)[:3]
+            parts.append(", ".join(f"{name} {100.0 * secs / wall:.0f}%" for name, secs in top))
+        derived = self.derived()
+        if "decoded_frames_per_s" in derived:
+            parts.append(f"{derived['decoded_frames_per_s']:.0f} fps")
+        if "realtime_factor" in derived:
+            parts.append(f"{derived['realtime_factor']:.1f}x realtime")
+        return " | ".join(parts) if parts else "no timing data"
+
+def export_metrics_json(file_path, run_info, metrics_list):
+    """Writes run info plus every RunMetrics (as dicts) to a JSON file."""
+    payload = dict(run_info)
+    payload["files"] = [m.to_dict() if isinstance(m, RunMetrics) else m for m in metrics_list]
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
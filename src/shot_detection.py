@@ -0,0 +1,76 @@
+"""
+Shot-boundary (camera cut) detection on the frames the analysis decodes anyway.
+
+Each checked frame is shrunk to SHOT_FRAME_WIDTH and reduced to a normalized HSV histogram (NumPy bincount);
+only the histogram distance to the previous checked frame is kept. A cut is a distance peak above
+SHOT_THRESHOLD, placed at the first frame of the new shot. Label-change segments start up to one sampling
+interval after the real cut, so their starts are snapped to the nearest boundary within a tolerance.
+"""
+import numpy as np
+import cv2
+
+from config import SHOT_FRAME_WIDTH, SHOT_HIST_BINS, SHOT_THRESHOLD, SHOT_MIN_LENGTH_SEC
+
+class ShotDetector:
+    """Collects histogram distances of consecutive checked frames of one video."""
+    def __init__(self):
+        self.hue_bins, self.sat_bins, self.val_bins = SHOT_HIST_BINS
+        self.num_bins = self.hue_bins * self.sat_bins * self.val_bins
+        self.prev_hist = None
+        self.times = [] # Timestamp of each checked frame after the first
+        self.distances = [] # Histogram distance (0..1) to the previous checked frame
+
+    def add(self, timestamp, image, rgb=False):
+        """Adds a checked frame (BGR, or RGB with rgb=True) at timestamp seconds."""
+        height, width = image.shape[:2]
+        if width > SHOT_FRAME_WIDTH:
+            image = cv2.resize(image, (SHOT_FRAME_WIDTH, max(1, int(round(height * SHOT_FRAME_WIDTH / width)))), interpolation=cv2.INTER_AREA)
+        hsv = cv2.cvtColor(image, cv2.COLOR_RGB2HSV if rgb else cv2.COLOR_BGR2HSV)
+        h = hsv[..., 0].astype(np.intp) * self.hue_bins // 180 # OpenCV hue is 0..179
+        s = hsv[..., 1].astype(np.intp) * self.sat_bins >> 8
+        v = hsv[..., 2].astype(np.intp) * self.val_bins >> 8
+        hist = np.bincount(((h * self.sat_bins + s) * self.val_bins + v).ravel(), minlength=self.num_bins).astype(np.float32)
+        hist /= hist.sum()
+        if self.prev_hist is not None:
+            self.times.append(timestamp)
+            self.distances.append(0.5 * float(np.abs(hist - self.prev_hist).sum()))
+        self.prev_hist = hist
+
+    def boundaries(self):
+        """Sorted array of cut timestamps (seconds)."""
+        if not self.distances:
+            return np.empty(0, dtype=np.float64)
+        times = np.asarray(self.times, dtype=np.float64)
+        dist = np.asarray(self.distances, dtype=np.float64)
+        padded = np.concatenate(([-1.0], dist, [-1.0]))
+        peaks = (dist >= SHOT_THRESHOLD) & (dist >= padded[:-2]) & (dist > padded[2:]) # Local maxima above the threshold
+        cuts = times[peaks]
+        if len(cuts) > 1 and SHOT_MIN_LENGTH_SEC > 0: # Drop cuts right after a cut (flashes, fast pans)
+            keep = [0]
+            for i in range(1, len(cuts)):
+                if cuts[i] - cuts[keep[-1]] >= SHOT_MIN_LENGTH_SEC:
+                    keep.append(i)
+            cuts = cuts[keep]
+        return cuts
+
+def snap_moment_starts(moments, boundaries, tolerance_s):
+    """
+    Moves each (start, end, label, fname) moment start to the nearest shot boundary within tolerance_s, if that
+    stays before its end and after the previous moment's end. Returns a new sorted list.
+    """
+    if not len(boundaries) or not moments or tolerance_s <= 0:
+        return list(moments)
+    moments = sorted(moments, key=lambda m: m[0])
+    starts = np.fromiter((m[0] for m in moments), dtype=np.float64, count=len(moments))
+    pos = np.clip(np.searchsorted(boundaries, starts), 1, max(1, len(boundaries) - 1))
+    before = boundaries[pos - 1]
+    after = boundaries[np.minimum(pos, len(boundaries) - 1)]
+    nearest = np.where(np.abs(starts - before) <= np.abs(after - starts), before, after)
+    snapped = []
+    prev_end = float("-inf")
+    for (start, end, label, fname), cut in zip(moments, nearest.tolist()):
+        if abs(cut - start) <= tolerance_s and prev_end <= cut < end:
+            start = cut
+        snapped.append((start, end, label, fname))
+        prev_end = end
+    return snapped
@@ -0,0 +1,114 @@
+import itertools
+import random
+
+import pytest
+
+import clip_planning
+from clip_planning import _subset_sum_counts, fit_clips_to_target
+
+FPS = 10.0
+
+
+def clip(source_file, duration_frames, quality=None, clip_id=None):
+    return {"source_file": source_file, "duration_frames": duration_frames, "quality": quality, "id": clip_id}
+
+
+def ids(clips):
+    return [c["id"] for c in clips]
+
+
+def brute_force_best(weight_counts, capacity):
+    """Highest reachable sum <= capacity by trying every count per weight."""
+    weights = sorted(weight_counts)
+    best = 0
+    for counts in itertools.product(*(range(weight_counts[w] + 1) for w in weights)):
+        total = sum(w * c for w, c in zip(weights, counts))
+        if total <= capacity:
+            best = max(best, total)
+    return best
+
+
+def test_subset_sum_exact_fit():
+    counts, best = _subset_sum_counts({3: 2, 5: 1}, 11)
+    assert best == 11
+    assert counts == {3: 2, 5: 1}
+
+
+def test_subset_sum_below_capacity():
+    counts, best = _subset_sum_counts({3: 2, 5: 1}, 7) # Reachable: 0, 3, 5, 6, 8, 11
+    assert best == 6
+    assert counts == {3: 2}
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_subset_sum_matches_brute_force(seed):
+    rng = random.Random(seed)
+    weight_counts = {rng.randint(1, 12): rng.randint(1, 9) for _ in range(rng.randint(1, 4))}
+    capacity = rng.randint(0, sum(w * c for w, c in weight_counts.items()))
+    counts, best = _subset_sum_counts(weight_counts, capacity)
+    assert best == brute_force_best(weight_counts, capacity)
+    assert sum(w * c for w, c in counts.items()) == best
+    assert all(0 < c <= weight_counts[w] for w, c in counts.items())
+
+
+def test_fit_keeps_everything_under_target():
+    clips = [clip("a.mp4", 10, clip_id=0), clip("b.mp4", 20, clip_id=1)]
+    selected, removed, duration_s = fit_clips_to_target(clips, 5.0, fps=FPS)
+    assert ids(selected) == [0, 1]
+    assert removed == 0
+    assert duration_s == pytest.approx(3.0)
+
+
+def test_fit_exact_target():
+    clips = [clip("a.mp4", 40, clip_id=0), clip("a.mp4", 30, clip_id=1), clip("b.mp4", 20, clip_id=2), clip("b.mp4", 20, clip_id=3)]
+    selected, removed, duration_s = fit_clips_to_target(clips, 7.0, fps=FPS, min_clips_per_file=0)
+    assert sum(c["duration_frames"] for c in selected) == 70
+    assert removed == len(clips) - len(selected)
+    assert duration_s == pytest.approx(7.0)
+    assert ids(selected) == sorted(ids(selected)) # Original order is kept
+
+
+def test_fit_greedy_fallback(monkeypatch):
+    monkeypatch.setattr(clip_planning, "FIT_DP_MAX_BIT_OPS", 0) # Force the largest-first greedy path
+    clips = [clip("a.mp4", 40, clip_id=0), clip("a.mp4", 30, clip_id=1), clip("b.mp4", 30, clip_id=2)]
+    selected, removed, duration_s = fit_clips_to_target(clips, 6.0, fps=FPS, min_clips_per_file=0)
+    # Greedy takes the 40 first and then nothing fits, the DP would have found 30 + 30
+    assert ids(selected) == [0]
+    assert removed == 2
+    assert duration_s == pytest.approx(4.0)
+
+
+def test_fit_reserves_a_clip_per_file():
+    clips = [clip("a.mp4", 30, clip_id=0), clip("a.mp4", 30, clip_id=1), clip("a.mp4", 30, clip_id=2),
+             clip("b.mp4", 10, clip_id=3), clip("c.mp4", 10, clip_id=4)]
+    selected, _, _ = fit_clips_to_target(clips, 5.0, fps=FPS, min_clips_per_file=1)
+    assert {c["source_file"] for c in selected} == {"a.mp4", "b.mp4", "c.mp4"}
+    assert sum(c["duration_frames"] for c in selected) == 50
+
+
+def test_fit_skips_reserve_that_exceeds_target():
+    clips = [clip("a.mp4", 30, clip_id=0), clip("b.mp4", 30, clip_id=1), clip("c.mp4", 30, clip_id=2)]
+    selected, removed, _ = fit_clips_to_target(clips, 6.0, fps=FPS, min_clips_per_file=1)
+    assert len(selected) == 2
+    assert removed == 1
+
+
+def test_fit_drops_lowest_quality_first():
+    clips = [clip("a.mp4", 60, quality=0.1, clip_id=0), clip("a.mp4", 30, quality=0.9, clip_id=1),
+             clip("b.mp4", 30, quality=0.8, clip_id=2), clip("b.mp4", 30, quality=0.05, clip_id=3)]
+    selected, removed, duration_s = fit_clips_to_target(clips, 6.0, fps=FPS, min_clips_per_file=0)
+    assert ids(selected) == [1, 2]
+    assert removed == 2
+    assert duration_s == pytest.approx(6.0)
+
+
+def test_fit_quality_never_worsens_the_fit():
+    rng = random.Random(7)
+    for _ in range(50):
+        clips = [clip(rng.choice("abc"), rng.choice([10, 20, 30, 45]), quality=rng.random(), clip_id=i)
+                 for i in range(rng.randint(1, 12))]
+        target_f = rng.randint(1, sum(c["duration_frames"] for c in clips))
+        unrated = [dict(c, quality=None) for c in clips]
+        with_quality, _, _ = fit_clips_to_target(clips, target_f / FPS, fps=FPS, min_clips_per_file=0)
+        without_quality, _, _ = fit_clips_to_target(unrated, target_f / FPS, fps=FPS, min_clips_per_file=0)
+        assert sum(c["duration_frames"] for c in with_quality) == sum(c["duration_frames"] for c in without_quality)
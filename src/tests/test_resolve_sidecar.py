@@ -0,0 +1,77 @@
+import json
+import os
+
+import pytest
+
+from resolve_script_generator import SIDECAR_FORMAT_VERSION, write_script_files
+
+FPS = 24.0
+
+
+def planned_clip(source_file, start_frame, end_frame, quality=None, features=None):
+    return {"source_file": source_file, "start_frame": start_frame, "end_frame": end_frame,
+            "duration_frames": end_frame - start_frame, "quality": quality, "features": features}
+
+
+@pytest.fixture
+def generated(tmp_path):
+    """Writes a script and its sidecar; returns (script globals, sidecar path, planned clips, video files)."""
+    clips = [planned_clip("a.mp4", 0, 48, 0.7, {"sharpness": 80.0, "motion": 0.05, "brightness": 0.4}),
+             planned_clip("b.mp4", 24, 96),
+             planned_clip("a.mp4", 120, 168, 0.2)]
+    video_files = ["/footage/a.mp4", "/footage/b.mp4"]
+    script_path, sidecar_path = write_script_files(str(tmp_path / "recap.py"), 120.0, 0.5, clips, video_files,
+                                                   "/footage/song.wav", 1.5, None, "Standard", FPS)
+    script_globals = {"__name__": "generated_script", "__file__": script_path}
+    with open(script_path, "r", encoding="utf-8") as f:
+        exec(compile(f.read(), script_path, "exec"), script_globals)
+    return script_globals, sidecar_path, clips, video_files
+
+
+def test_sidecar_round_trip(generated):
+    script, sidecar_path, clips, video_files = generated
+    loaded_videos, loaded_clips, audio_clip = script["load_analysis_data"](sidecar_path, script["ANALYSIS_DATA_SHA256"])
+    assert loaded_videos == video_files
+    assert loaded_clips == [(c["source_file"], c["start_frame"], c["end_frame"]) for c in clips]
+    assert audio_clip == (36, 36 + sum(c["duration_frames"] for c in clips)) # 1.5 s offset at 24 fps
+
+
+def test_sidecar_records_quality_and_features(generated):
+    _, sidecar_path, _, _ = generated
+    with open(sidecar_path, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert records[0]["format"] == "recap_edl"
+    assert records[0]["version"] == SIDECAR_FORMAT_VERSION
+    clip_records = [r for r in records[1:] if r[0] == "clip"]
+    assert clip_records[0] == ["clip", "a.mp4", 0, 48, 0.7, 80.0, 0.05, 0.4]
+    assert clip_records[1] == ["clip", "b.mp4", 24, 96, None, None, None, None]
+
+
+def test_sidecar_checksum_detects_changes(generated):
+    script, sidecar_path, _, _ = generated
+    with open(sidecar_path, "rb") as f:
+        data = f.read()
+    with open(sidecar_path, "wb") as f:
+        f.write(data.replace(b'"b.mp4",24,96', b'"b.mp4",24,97'))
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        script["load_analysis_data"](sidecar_path, script["ANALYSIS_DATA_SHA256"])
+
+
+def test_sidecar_checksum_detects_truncation(generated):
+    script, sidecar_path, _, _ = generated
+    with open(sidecar_path, "rb") as f:
+        lines = f.readlines()
+    with open(sidecar_path, "wb") as f:
+        f.writelines(lines[:-2])
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        script["load_analysis_data"](sidecar_path, script["ANALYSIS_DATA_SHA256"])
+
+
+def test_moved_sidecar_is_found_next_to_the_script(generated, tmp_path):
+    script, sidecar_path, _, _ = generated
+    moved_dir = tmp_path / "moved"
+    moved_dir.mkdir()
+    moved_script = moved_dir / "recap.py"
+    os.replace(sidecar_path, moved_dir / os.path.basename(sidecar_path))
+    script.update(__file__=str(moved_script))
+    assert script["find_data_file"]() == str(moved_dir / os.path.basename(sidecar_path))
@@ -0,0 +1,97 @@
+"""
+CPU thread budget governor.
+
+OpenCV, ffmpeg, the BLAS behind NumPy/librosa and the detector's TFLite runtime each size their thread pools
+to all cores by default; with several workers or a separate decoder process they oversubscribe the CPU.
+split_thread_budget divides one core budget between the workers and, inside each worker, between decoding
+and inference. apply_thread_budget applies a split to the current process and is called both at app startup
+and at the start of every worker / decoder process, so all processes follow the same split.
+benchmark_throughput --thread-sweep measures the splits on this machine and saves the fastest one per worker
+count (save_thread_split); the app loads the single-worker one at startup (load_thread_split).
+"""
+import json
+import os
+
+import cv2
+
+from config import THREAD_BUDGET_CORES, BLAS_THREAD_ENV_VARS, THREAD_SPLIT_FILENAME
+from video_index import app_cache_dir
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None # BLAS limits then only reach processes started after apply_thread_budget (via the env vars)
+
+CURRENT_BUDGET = None # Split applied in this process
+SPLIT_KEYS = ("total", "workers", "decoder", "inference", "blas")
+
+def split_thread_budget(total_cores=None, workers=1, separate_decoder=False):
+    """
+    Returns {'total', 'workers', 'decoder', 'inference', 'blas'} thread counts. Each worker gets total // workers
+    threads; a separate decoder process (ffmpeg / opencv_process backends) runs concurrently with inference
+    and gets half of them, otherwise decode and inference take turns and both may use the worker's share.
+    """
+    total = max(1, int(total_cores or THREAD_BUDGET_CORES or os.cpu_count() or 1))
+    workers = max(1, min(int(workers), total))
+    per_worker = max(1, total // workers)
+    if separate_decoder:
+        decoder = max(1, per_worker // 2)
+        inference = max(1, per_worker - decoder)
+    else:
+        decoder = inference = per_worker
+    return {"total": total, "workers": workers, "decoder": decoder, "inference": inference,
+            "blas": 1 if workers > 1 else inference} # NumPy work is light next to decode/inference
+
+def apply_thread_budget(budget, role="inference"):
+    """
+    Applies a split to this process: cv2.setNumThreads, BLAS env vars (inherited by child processes and read by
+    libraries loaded later) and, if threadpoolctl is installed, the already loaded BLAS pools.
+    role is 'inference' (analysis worker / app) or 'decoder' (decoder process). Returns the thread count used.
+    """
+    global CURRENT_BUDGET
+    threads = budget[role]
+    for name in BLAS_THREAD_ENV_VARS:
+        os.environ[name] = str(budget["blas"])
+    cv2.setNumThreads(threads)
+    if threadpool_limits is not None:
+        threadpool_limits(limits=budget["blas"], user_api="blas")
+    CURRENT_BUDGET = budget
+    return threads
+
+def current_thread_budget():
+    """The split applied in this process, or the default split if none was applied."""
+    return CURRENT_BUDGET if CURRENT_BUDGET is not None else split_thread_budget()
+
+def thread_split_path():
+    return os.path.join(app_cache_dir(), THREAD_SPLIT_FILENAME)
+
+def save_thread_split(budgets, path=None):
+    """
+    Saves measured splits for later runs, keyed by worker count: budgets is {workers: fastest split}.
+    Returns the file path.
+    """
+    path = path or thread_split_path()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    data = {str(workers): {key: int(budget[key]) for key in SPLIT_KEYS} for workers, budget in budgets.items()}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    return path
+
+def load_thread_split(path=None, workers=1):
+    """The saved split for a worker count, None if no split was saved for it (or the file is unreadable)."""
+    path = path or thread_split_path()
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            budget = json.load(f).get(str(workers))
+        if budget is None:
+            return None
+        return {key: max(1, int(budget[key])) for key in SPLIT_KEYS}
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        print(f"Warning: Ignoring saved thread split '{path}': {e}")
+        return None
+
+def format_thread_budget(budget):
+    return (f"{budget['total']} cores: {budget['workers']} worker(s) x (decoder {budget['decoder']}, "
+            f"inference {budget['inference']}, BLAS {budget['blas']})")
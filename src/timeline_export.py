@@ -0,0 +1,229 @@
+"""
+Timeline interchange export (FCPXML 1.8, OpenTimelineIO JSON, CMX3600 EDL).
+
+Writes the planned clip list (clip_planning.plan_clips, already in timeline order) plus the
+music track directly to a file Resolve can import in one go (File > Import > Timeline).
+Writers stream one clip at a time to the file, so very large timelines never exist as one
+string or DOM in memory.
+"""
+import os
+import json
+from fractions import Fraction
+from pathlib import Path
+from xml.sax.saxutils import quoteattr
+
+from config import DEFAULT_FPS
+from clip_planning import plan_audio_clip, s2f
+from video_probe import probe_video
+
+EDL_RECORD_START_HOURS = 1 # Record timecode starts at 01:00:00:00 (Resolve's default timeline start)
+FCPXML_DEFAULT_SIZE = (1920, 1080) # Sequence size if no source could be probed
+
+
+def _file_url(path):
+    try:
+        return Path(os.path.abspath(path)).as_uri()
+    except ValueError:
+        return path
+
+def _frame_duration(fps):
+    """Returns the frame duration as a Fraction of a second (1001-based for NTSC rates)."""
+    for nominal in (24, 30, 60):
+        if abs(fps - nominal * 1000 / 1001) < 0.01:
+            return Fraction(1001, nominal * 1000)
+    return 1 / Fraction(fps).limit_denominator(1000)
+
+def _fcpxml_time(frames, frame_duration):
+    value = frames * frame_duration
+    return f"{value.numerator}/{value.denominator}s" if value.denominator != 1 else f"{value.numerator}s"
+
+def _timecode(frames, fps):
+    """Non-drop-frame HH:MM:SS:FF using the nominal (integer) frame rate."""
+    tc_fps = max(1, int(round(fps)))
+    frames = max(0, int(frames))
+    ff = frames % tc_fps
+    total_s = frames // tc_fps
+    return f"{total_s // 3600:02d}:{(total_s // 60) % 60:02d}:{total_s % 60:02d}:{ff:02d}"
+
+def _prepare(planned_clips, video_files, audio_file_path, audio_start_offset, audio_duration_s, fps):
+    """Resolves source paths and the audio range. Returns (clips, video_frames, audio_range, source_paths)."""
+    source_paths = {}
+    for path in video_files:
+        source_paths.setdefault(os.path.basename(path), path)
+    clips = [c for c in planned_clips if c["end_frame"] > c["start_frame"]]
+    video_frames = sum(c["end_frame"] - c["start_frame"] for c in clips)
+    aud_s_f, aud_e_f = plan_audio_clip(audio_start_offset, video_frames, fps, audio_duration_s)
+    if aud_e_f is None: # No video - use the rest of the song
+        aud_e_f = s2f(audio_duration_s, fps) if audio_duration_s else aud_s_f
+    audio_range = (aud_s_f, aud_e_f) if audio_file_path and aud_e_f > aud_s_f else None
+    return clips, video_frames, audio_range, source_paths
+
+def _source_sizes(names, source_paths):
+    """Probes the frame size of each used source. Returns {name: (width, height)} for the files that could be read."""
+    sizes = {}
+    for name in names:
+        info = probe_video(source_paths.get(name, name))
+        if info["width"] and info["height"]:
+            sizes[name] = (info["width"], info["height"])
+    return sizes
+
+
+def write_fcpxml(file_path, planned_clips, video_files, audio_file_path, audio_start_offset,
+                 audio_duration_s=None, fps=DEFAULT_FPS, timeline_name="Recap Timeline"):
+    """
+    Writes an FCPXML 1.8 project: video clips on the primary storyline (video only),
+    the music as a connected audio clip under the first clip. The sequence format gets the frame size covering
+    most of the timeline; sources of another size get their own format.
+    """
+    clips, video_frames, audio_range, source_paths = _prepare(
+        planned_clips, video_files, audio_file_path, audio_start_offset, audio_duration_s, fps)
+    frame_duration = _frame_duration(fps)
+    t = lambda frames: _fcpxml_time(frames, frame_duration)
+
+    # Asset durations: known source durations are not passed here, the furthest planned frame is enough for import
+    asset_frames = {}
+    for clip in clips:
+        name = clip["source_file"]
+        asset_frames[name] = max(asset_frames.get(name, 0), clip["end_frame"])
+    sizes = _source_sizes(asset_frames, source_paths)
+    size_frames = {} # (width, height) -> timeline frames using that size
+    for clip in clips:
+        size = sizes.get(clip["source_file"])
+        if size:
+            size_frames[size] = size_frames.get(size, 0) + clip["end_frame"] - clip["start_frame"]
+    sequence_size = max(size_frames, key=size_frames.get) if size_frames else FCPXML_DEFAULT_SIZE
+    format_ids = {sequence_size: "r1"}
+    for size in sizes.values():
+        format_ids.setdefault(size, f"r{len(format_ids) + 1}")
+    asset_ids = {name: f"r{len(format_ids) + i + 1}" for i, name in enumerate(asset_frames)}
+    audio_id = f"r{len(format_ids) + len(asset_ids) + 1}"
+    sequence_frames = video_frames or (audio_range[1] - audio_range[0] if audio_range else 0)
+
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE fcpxml>\n<fcpxml version="1.8">\n  <resources>\n')
+        for (width, height), format_id in format_ids.items():
+            f.write(f'    <format id="{format_id}" frameDuration="{t(1)}" width="{width}" height="{height}"/>\n')
+        for name, asset_id in asset_ids.items():
+            src = source_paths.get(name, name)
+            f.write(f'    <asset id="{asset_id}" name={quoteattr(name)} start="0s" duration="{t(asset_frames[name])}" '
+                    f'hasVideo="1" format="{format_ids[sizes.get(name, sequence_size)]}">\n      <media-rep kind="original-media" src={quoteattr(_file_url(src))}/>\n    </asset>\n')
+        if audio_range:
+            f.write(f'    <asset id="{audio_id}" name={quoteattr(os.path.basename(audio_file_path))} start="0s" '
+                    f'duration="{t(max(audio_range[1], s2f(audio_duration_s or 0, fps)))}" hasAudio="1" audioSources="1" audioChannels="2">\n'
+                    f'      <media-rep kind="original-media" src={quoteattr(_file_url(audio_file_path))}/>\n    </asset>\n')
+        f.write('  </resources>\n  <library>\n')
+        f.write(f'    <event name={quoteattr(timeline_name)}>\n      <project name={quoteattr(timeline_name)}>\n')
+        f.write(f'        <sequence format="r1" duration="{t(sequence_frames)}" tcStart="0s" tcFormat="NDF">\n          <spine>\n')
+
+        def audio_xml(offset, lane=' lane="-1"'):
+            return (f'<asset-clip ref="{audio_id}"{lane} offset="{offset}" start="{t(audio_range[0])}" '
+                    f'duration="{t(audio_range[1] - audio_range[0])}" name={quoteattr(os.path.basename(audio_file_path))}/>')
+        offset = 0
+        for i, clip in enumerate(clips):
+            dur = clip["end_frame"] - clip["start_frame"]
+            attrs = (f'ref="{asset_ids[clip["source_file"]]}" offset="{t(offset)}" start="{t(clip["start_frame"])}" '
+                     f'duration="{t(dur)}" name={quoteattr(clip["source_file"])}')
+            if i == 0 and audio_range: # Connected clips use the parent's local time (its start)
+                f.write(f'            <asset-clip {attrs}>\n              {audio_xml(t(clip["start_frame"]))}\n            </asset-clip>\n')
+            else:
+                f.write(f'            <asset-clip {attrs}/>\n')
+            offset += dur
+        if not clips and audio_range: # No video - music alone on the storyline
+            f.write(f'            {audio_xml(t(0), lane="")}\n')
+        f.write('          </spine>\n        </sequence>\n      </project>\n    </event>\n  </library>\n</fcpxml>\n')
+    return file_path
+
+
+def _otio_time(value, fps):
+    return {"OTIO_SCHEMA": "RationalTime.1", "rate": float(fps), "value": float(value)}
+
+def _otio_clip(name, path, start_frame, duration_frames, fps):
+    return {
+        "OTIO_SCHEMA": "Clip.1",
+        "name": name,
+        "metadata": {},
+        "source_range": {"OTIO_SCHEMA": "TimeRange.1",
+                         "start_time": _otio_time(start_frame, fps),
+                         "duration": _otio_time(duration_frames, fps)},
+        "effects": [],
+        "markers": [],
+        "media_reference": {"OTIO_SCHEMA": "ExternalReference.1", "name": name, "metadata": {},
+                            "available_range": None, "target_url": _file_url(path)},
+    }
+
+def write_otio(file_path, planned_clips, video_files, audio_file_path, audio_start_offset,
+               audio_duration_s=None, fps=DEFAULT_FPS, timeline_name="Recap Timeline"):
+    """Writes an OpenTimelineIO JSON timeline (one video track, one audio track), one clip object at a time."""
+    clips, _, audio_range, source_paths = _prepare(
+        planned_clips, video_files, audio_file_path, audio_start_offset, audio_duration_s, fps)
+
+    def track_header(name, kind):
+        head = json.dumps({"OTIO_SCHEMA": "Track.1", "name": name, "kind": kind, "metadata": {},
+                           "source_range": None, "effects": [], "markers": [], "children": []})
+        return head[:-len("[]}")] + "[" # Open the children list, clips are streamed into it
+
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"OTIO_SCHEMA": "Timeline.1", "name": timeline_name, "metadata": {},
+                            "global_start_time": None})[:-1])
+        f.write(', "tracks": {"OTIO_SCHEMA": "Stack.1", "name": "tracks", "metadata": {}, '
+                '"source_range": null, "effects": [], "markers": [], "children": [\n')
+        f.write(track_header("V1", "Video"))
+        for i, clip in enumerate(clips):
+            path = source_paths.get(clip["source_file"], clip["source_file"])
+            f.write(("," if i else "") + "\n" + json.dumps(_otio_clip(
+                clip["source_file"], path, clip["start_frame"], clip["end_frame"] - clip["start_frame"], fps)))
+        f.write("\n]},\n")
+        f.write(track_header("A1", "Audio"))
+        if audio_range:
+            f.write("\n" + json.dumps(_otio_clip(os.path.basename(audio_file_path), audio_file_path,
+                                                 audio_range[0], audio_range[1] - audio_range[0], fps)))
+        f.write("\n]}\n]}}\n")
+    return file_path
+
+
+def write_edl(file_path, planned_clips, video_files, audio_file_path, audio_start_offset,
+              audio_duration_s=None, fps=DEFAULT_FPS, timeline_name="Recap Timeline"):
+    """
+    Writes a CMX3600 EDL (non-drop-frame). Video events use reel 'AX' with a FROM CLIP NAME comment,
+    the music is a final audio-only event on channels A/A2 starting at the record start.
+    """
+    clips, _, audio_range, _ = _prepare(
+        planned_clips, video_files, audio_file_path, audio_start_offset, audio_duration_s, fps)
+    record_start = EDL_RECORD_START_HOURS * 3600 * max(1, int(round(fps)))
+    record = record_start
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write(f"TITLE: {timeline_name}\nFCM: NON-DROP FRAME\n\n")
+        event = 0
+        for clip in clips:
+            event += 1
+            dur = clip["end_frame"] - clip["start_frame"]
+            f.write(f"{event:03d}  AX       V     C        "
+                    f"{_timecode(clip['start_frame'], fps)} {_timecode(clip['end_frame'], fps)} "
+                    f"{_timecode(record, fps)} {_timecode(record + dur, fps)}\n"
+                    f"* FROM CLIP NAME: {clip['source_file']}\n\n")
+            record += dur
+        if audio_range:
+            event += 1
+            dur = audio_range[1] - audio_range[0]
+            f.write(f"{event:03d}  AX       AA    C        "
+                    f"{_timecode(audio_range[0], fps)} {_timecode(audio_range[1], fps)} "
+                    f"{_timecode(record_start, fps)} {_timecode(record_start + dur, fps)}\n"
+                    f"* FROM CLIP NAME: {os.path.basename(audio_file_path)}\n\n")
+    return file_path
+
+
+EXPORT_FORMATS = {
+    ".fcpxml": write_fcpxml,
+    ".otio": write_otio,
+    ".edl": write_edl,
+}
+
+def write_timeline_export(file_path, planned_clips, video_files, audio_file_path, audio_start_offset,
+                          audio_duration_s=None, fps=DEFAULT_FPS, timeline_name="Recap Timeline"):
+    """Picks the writer from the file extension. Raises ValueError for unknown extensions."""
+    ext = os.path.splitext(file_path)[1].lower()
+    writer = EXPORT_FORMATS.get(ext)
+    if writer is None:
+        raise ValueError(f"Unsupported timeline export format '{ext}'. Use one of: {', '.join(EXPORT_FORMATS)}")
+    return writer(file_path, planned_clips, video_files, audio_file_path, audio_start_offset,
+                  audio_duration_s, fps, timeline_name)
@@ -0,0 +1,142 @@
+"""
+Per-file keyframe / presentation timestamp (PTS) index, persisted in the analysis cache directory.
+
+The index is built once per file (keyed by path, size and modification time) from ffprobe packet data,
+without decoding. Sampling code reads true per-frame timestamps from the index, which also fixes
+variable-frame-rate footage where CAP_PROP_POS_MSEC is unreliable, and uses seek_forward to jump to the
+nearest keyframe before the next sampled frame, so only the frames from there on are decoded.
+Without ffprobe there is no index: timestamps decoded by OpenCV are exactly the unreliable values the
+index replaces, so they are never cached.
+"""
+import os
+import json
+import shutil
+import hashlib
+import subprocess
+
+import sys
+
+import numpy as np
+import cv2
+
+from config import CACHE_DIR_ENV_VAR, CACHE_APP_NAME, SEEK_MIN_SKIP_FRAMES, FFPROBE_BINARY, FFPROBE_TIMEOUT_SEC
+
+INDEX_FORMAT_VERSION = 2 # 2: only ffprobe indexes (version 1 also cached OpenCV-decoded timestamps)
+INDEX_SUFFIX = ".index.npz"
+
+def app_cache_dir():
+    """The app's folder in the per-user cache directory (independent of the working directory)."""
+    if sys.platform == "win32":
+        root = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), "AppData", "Local")
+    elif sys.platform == "darwin":
+        root = os.path.join(os.path.expanduser("~"), "Library", "Caches")
+    else:
+        root = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(root, CACHE_APP_NAME)
+
+def cache_dir():
+    """Index cache directory: RECAP_CACHE_DIR, else video_index in the app's per-user cache directory."""
+    if os.environ.get(CACHE_DIR_ENV_VAR):
+        return os.path.abspath(os.environ[CACHE_DIR_ENV_VAR])
+    return os.path.join(app_cache_dir(), "video_index")
+
+class VideoIndex:
+    """Frame timestamps (seconds from the first frame, presentation order) and keyframe frame numbers of one video."""
+    def __init__(self, pts, keyframes=None, source="ffprobe"):
+        self.pts = np.asarray(pts, dtype=np.float64)
+        self.keyframes = np.asarray(keyframes if keyframes is not None else [], dtype=np.int64) # Sorted, empty = unknown
+        self.source = source
+
+    def __len__(self):
+        return len(self.pts)
+
+    def keyframe_before(self, frame):
+        """Nearest keyframe at or before a frame number, None if keyframes are unknown."""
+        if not len(self.keyframes):
+            return None
+        pos = int(np.searchsorted(self.keyframes, frame, side="right")) - 1
+        return int(self.keyframes[pos]) if pos >= 0 else None
+
+    def seek_forward(self, cap, position, frame, min_skip=SEEK_MIN_SKIP_FRAMES):
+        """
+        Prepares an open cv2.VideoCapture whose next frame is number position so the next grab() returns frame,
+        if a keyframe at least min_skip frames ahead lies at or before it: seeks to that keyframe (the frames in
+        between are never decoded). Returns the new position (unchanged if decoding forward is cheaper).
+        """
+        keyframe = self.keyframe_before(frame)
+        if keyframe is None or keyframe - position < min_skip:
+            return position
+        cap.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+        return keyframe
+
+def _cache_key(video_path):
+    stat = os.stat(video_path)
+    key = f"{os.path.abspath(video_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+def index_path_for(video_path):
+    return os.path.join(cache_dir(), _cache_key(video_path) + INDEX_SUFFIX)
+
+def load_index(video_path):
+    """Returns the cached VideoIndex of a file, or None (missing, outdated or unreadable)."""
+    try:
+        with np.load(index_path_for(video_path)) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("version") != INDEX_FORMAT_VERSION:
+                return None
+            return VideoIndex(data["pts"], data["keyframes"], meta.get("source", "unknown"))
+    except (OSError, ValueError, KeyError):
+        return None
+
+def save_index(video_path, index):
+    """Writes a VideoIndex to the cache directory (atomic replace). Returns the path or None on failure."""
+    try:
+        target = index_path_for(video_path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        meta = {"version": INDEX_FORMAT_VERSION, "source": index.source, "video": os.path.abspath(video_path)}
+        tmp = target + ".tmp.npz"
+        np.savez_compressed(tmp, pts=index.pts, keyframes=index.keyframes, meta=np.array(json.dumps(meta)))
+        os.replace(tmp, target)
+        return target
+    except OSError as e:
+        print(f"Warning: Could not save video index for {os.path.basename(video_path)}: {e}")
+        return None
+
+def build_index_ffprobe(video_path):
+    """Builds a VideoIndex from ffprobe packet timestamps and key flags (no decoding). Returns None if ffprobe is unavailable or fails."""
+    if not shutil.which(FFPROBE_BINARY):
+        return None
+    cmd = [FFPROBE_BINARY, "-v", "error", "-select_streams", "v:0",
+           "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", video_path]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=FFPROBE_TIMEOUT_SEC, check=True)
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"Warning: ffprobe failed for {os.path.basename(video_path)}: {e}")
+        return None
+    pts = []
+    key = []
+    for line in result.stdout.splitlines():
+        pts_time, _, flags = line.partition(",")
+        try:
+            pts.append(float(pts_time))
+        except ValueError:
+            continue # N/A (no timestamp)
+        key.append(flags.startswith("K"))
+    if not pts:
+        return None
+    pts = np.asarray(pts, dtype=np.float64)
+    order = np.argsort(pts, kind="stable") # Packets come in decode order, frames are numbered in presentation order
+    key = np.asarray(key, dtype=bool)[order]
+    pts = pts[order]
+    return VideoIndex(pts - pts[0], np.flatnonzero(key), "ffprobe")
+
+def load_or_build_index(video_path):
+    """Returns the cached index, or builds (and caches) one with ffprobe. None if neither is available."""
+    index = load_index(video_path)
+    if index is not None:
+        return index
+    index = build_index_ffprobe(video_path)
+    if index is not None:
+        save_index(video_path, index)
+        print(f"  Built video index for {os.path.basename(video_path)}: {len(index)} frames, {len(index.keyframes)} keyframes")
+    return index
@@ -0,0 +1,102 @@
+"""
+Fast metadata probe of video inputs and analysis scheduling.
+
+probe_video reads container properties only (fps, frame count, resolution) without decoding frames,
+so all inputs can be probed up front. The frame counts drive the file order (schedule_videos)
+and a frame-based progress/ETA estimate (FrameProgress).
+"""
+import os
+import time
+
+import cv2
+
+from config import SCHEDULE_POLICIES, DEFAULT_SCHEDULE_POLICY
+
+def probe_video(path):
+    """
+    Returns a dict {'path', 'name', 'fps', 'frame_count', 'duration_s', 'width', 'height', 'error'}.
+    Unknown values are None; 'error' is set if the file could not be opened.
+    """
+    info = {"path": path, "name": os.path.basename(path), "fps": None, "frame_count": None,
+            "duration_s": None, "width": None, "height": None, "error": None}
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            info["error"] = "Could not open video"
+            return info
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        width = cap.get(cv2.CAP_PROP_FRAME_WIDTH)
+        height = cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
+        if fps and fps > 0:
+            info["fps"] = fps
+        if frame_count and frame_count > 0:
+            info["frame_count"] = int(frame_count)
+            if info["fps"]:
+                info["duration_s"] = frame_count / fps
+        if width and height:
+            info["width"], info["height"] = int(width), int(height)
+    finally:
+        cap.release()
+    return info
+
+def sample_step_frames(fps, interval_sec):
+    """Frames between two samples taken every interval_sec (at least 1); shared by all frame-stepping decoders."""
+    return max(1, int(fps * interval_sec))
+
+def probe_videos(paths):
+    """Probes every path (in order). Returns a list of probe dicts."""
+    return [probe_video(path) for path in paths]
+
+def schedule_videos(probes, policy=DEFAULT_SCHEDULE_POLICY):
+    """
+    Orders probed files for analysis (one file at a time). 'input' keeps the given order, 'shortest_first'
+    gives early results for most files, 'longest_first' gets the longest files done first. Files of unknown
+    length go last. In fill-budget mode the order only sets the round-robin turn order.
+    Returns a new list of probe dicts.
+    """
+    if policy not in SCHEDULE_POLICIES:
+        print(f"Warning: Unknown schedule policy '{policy}', using '{DEFAULT_SCHEDULE_POLICY}'.")
+        policy = DEFAULT_SCHEDULE_POLICY
+    if policy == "input":
+        return list(probes)
+    known = [p for p in probes if p["frame_count"]]
+    unknown = [p for p in probes if not p["frame_count"]]
+    known.sort(key=lambda p: p["frame_count"], reverse=(policy == "longest_first"))
+    return known + unknown
+
+class FrameProgress:
+    """
+    Frame-based progress and ETA over a list of probed files. Files without a frame count
+    are estimated with the mean of the known ones.
+    """
+    def __init__(self, probes):
+        known = [p["frame_count"] for p in probes if p["frame_count"]]
+        fallback = sum(known) / len(known) if known else 0
+        self.expected = {p["path"]: p["frame_count"] or fallback for p in probes}
+        self.total_frames = sum(self.expected.values())
+        self.finished_frames = 0
+        self.current_frames = 0
+        self.start = time.perf_counter()
+
+    def update(self, current_file_frames):
+        """Frames decoded so far in the current file."""
+        self.current_frames = current_file_frames
+
+    def file_done(self, path):
+        """Counts a finished (or failed) file with its expected frame count."""
+        self.finished_frames += self.expected.get(path, self.current_frames)
+        self.current_frames = 0
+
+    def fraction(self):
+        if not self.total_frames:
+            return 0.0
+        return min(1.0, (self.finished_frames + self.current_frames) / self.total_frames)
+
+    def eta_s(self):
+        """Remaining seconds at the average frame rate so far, None until there is a rate."""
+        done = self.finished_frames + self.current_frames
+        elapsed = time.perf_counter() - self.start
+        if done <= 0 or elapsed <= 0 or not self.total_frames:
+            return None
+        return max(0.0, self.total_frames - done) * elapsed / done